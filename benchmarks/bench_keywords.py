@@ -0,0 +1,85 @@
+"""
+Compares the legacy keyword search (one regular expression per keyword, compiled and
+run per segment) against the compiled KeywordMatcher (one pass per segment).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_keywords --num_segments 20000 --keyword_rate 0.2
+"""
+import argparse
+import re
+import time
+from typing import List
+
+from benchmarks.synthetic_text import make_synthetic_segments
+from common.consts import ENGLISH_KEYWORDS, HEBREW_KEYWORDS
+from scripts.keywords import KeywordMatcher
+
+
+def legacy_find_keywords(text: str, keywords: List[str], lower: bool) -> List[str]:
+    """
+    The per-keyword loop the analyzers used before scripts/keywords.py.
+    """
+    found_keywords = []
+    for kw in keywords:
+        if lower:
+            pattern = rf"\b{re.escape(kw.lower())}\b"
+            if re.search(pattern, text.lower()):
+                found_keywords.append(kw)
+        else:
+            pattern = rf"\b{re.escape(kw)}\b"
+            if re.search(pattern, text):
+                found_keywords.append(kw)
+    return found_keywords
+
+
+def _time_call(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(num_segments: int, keyword_rate: float) -> dict:
+    results = {}
+    cases = [
+        ("hebrew", "he", HEBREW_KEYWORDS, False, KeywordMatcher(HEBREW_KEYWORDS, hebrew_prefixes=True)),
+        ("english", "en", ENGLISH_KEYWORDS, True, KeywordMatcher(ENGLISH_KEYWORDS)),
+    ]
+    for name, language, keywords, lower, matcher in cases:
+        texts = make_synthetic_segments(num_segments, language, keyword_rate=keyword_rate)
+
+        legacy_results, legacy_seconds = _time_call(
+            lambda: [legacy_find_keywords(t, keywords, lower) for t in texts]
+        )
+        matches, matcher_seconds = _time_call(lambda: [matcher.find(t) for t in texts])
+        matcher_results = [matcher.keywords_from_matches(m) for m in matches]
+
+        num_matches = sum(len(m) for m in matches)
+        # The matcher also finds prefixed/normalised forms, so it may report more; every
+        # keyword the legacy loop found must still be reported, as the same list entry.
+        missed = sum(len(set(old) - set(new)) for old, new in zip(legacy_results, matcher_results))
+        results[name] = {
+            "segments": len(texts),
+            "matches": num_matches,
+            "legacy_segments_per_second": len(texts) / legacy_seconds,
+            "matcher_segments_per_second": len(texts) / matcher_seconds,
+            "matcher_matches_per_second": num_matches / matcher_seconds,
+            "speedup": legacy_seconds / matcher_seconds,
+            "identical_fraction": sum(
+                old == new for old, new in zip(legacy_results, matcher_results)
+            ) / len(texts),
+            "missed_keywords": missed,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-keyword regex search vs the compiled matcher.")
+    parser.add_argument("--num_segments", type=int, default=20000)
+    parser.add_argument("--keyword_rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    for name, stats in run_benchmark(args.num_segments, args.keyword_rate).items():
+        print(f"{name}: {stats['legacy_segments_per_second']:.0f} seg/s legacy, "
+              f"{stats['matcher_segments_per_second']:.0f} seg/s compiled "
+              f"(x{stats['speedup']:.2f}, {stats['matcher_matches_per_second']:.0f} matches/s); "
+              f"{stats['identical_fraction']:.1%} identical, {stats['missed_keywords']} missed")
@@ -0,0 +1,126 @@
+"""
+Compares denoising against a stored room noise profile (scripts/noise_profile.py)
+with the current noise reduction: speed (x real time) against the whole-file
+`preprocess_audio`, SNR against the clean signal (synthetic recordings only), how
+much the noise floor drops, and how close the output is to `preprocess_audio`'s.
+
+The profile is estimated from a separate calibration recording of the same room,
+as it would be from an earlier day.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_noise_profile                      # synthetic 120 s recordings
+    python -m benchmarks.bench_noise_profile --audio room3_tuesday.wav --calibration room3_monday.wav
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from benchmarks.synthetic_audio import make_speech_like_audio, read_wav, write_wav
+from scripts.noise_profile import RoomNoiseReducer, estimate_noise_profile
+from scripts.preprocess import compare_audio_files, preprocess_audio, preprocess_audio_streaming
+
+# Frame length and share of quietest frames used to measure the noise floor
+FLOOR_FRAME_SECONDS = 0.05
+FLOOR_FRACTION = 0.1
+
+
+def noise_floor_db(y: np.ndarray, sr: int) -> float:
+    """
+    Mean power (dB) of the quietest FLOOR_FRACTION of the FLOOR_FRAME_SECONDS frames.
+    """
+    frame_len = int(FLOOR_FRAME_SECONDS * sr)
+    n_frames = len(y) // frame_len
+    power = np.mean(y[:n_frames * frame_len].reshape(n_frames, frame_len).astype(np.float64) ** 2, axis=1)
+    quietest = np.sort(power)[:max(1, int(n_frames * FLOOR_FRACTION))]
+    return float(10 * np.log10(np.mean(quietest) + 1e-12))
+
+
+def snr_db(clean: np.ndarray, y: np.ndarray) -> float:
+    n = min(len(clean), len(y))
+    error = np.sum((clean[:n].astype(np.float64) - y[:n]) ** 2)
+    return float(10 * np.log10(np.sum(clean[:n].astype(np.float64) ** 2) / max(error, 1e-12)))
+
+
+def run_benchmark(audio_file: str, calibration_file: str, work_dir: str, clean: Optional[np.ndarray] = None) -> Dict:
+    noisy, sr = read_wav(audio_file)
+    duration = len(noisy) / float(sr)
+    calibration, calibration_sr = read_wav(calibration_file)
+    # Profiles are on the int16 scale the preprocessing works in
+    profile = estimate_noise_profile(calibration * 32768.0, calibration_sr, source=calibration_file)
+    input_floor = noise_floor_db(noisy, sr)
+
+    reducer = RoomNoiseReducer(profile)
+    methods = {
+        "preprocess_audio": lambda out: preprocess_audio(audio_file, out),
+        "streaming": lambda out: preprocess_audio_streaming(audio_file, out),
+        "room_profile": lambda out: preprocess_audio_streaming(audio_file, out, denoiser=reducer),
+    }
+    results = {}
+    for name, method in methods.items():
+        output_file = os.path.join(work_dir, f"{name}.wav")
+        start = time.perf_counter()
+        method(output_file)
+        seconds = time.perf_counter() - start
+        y, _ = read_wav(output_file)
+        stats = {
+            "seconds": seconds,
+            "x_real_time": duration / seconds,
+            "noise_reduction_db": input_floor - noise_floor_db(y, sr),
+        }
+        if clean is not None:
+            stats["snr_db"] = snr_db(clean, y)
+        if name != "preprocess_audio":
+            stats["speedup"] = results["preprocess_audio"]["seconds"] / seconds
+            stats["sdr_vs_preprocess_audio_db"] = compare_audio_files(
+                os.path.join(work_dir, "preprocess_audio.wav"), output_file
+            )["snr_db"]
+        if name == "room_profile":
+            stats["used_profile"] = reducer.used_profile
+            stats["profile_drift_db"] = reducer.drift
+        results[name] = stats
+    if clean is not None:
+        results["input"] = {"snr_db": snr_db(clean, noisy)}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark stored-profile noise reduction against preprocess_audio.")
+    parser.add_argument("--audio", help="Recording to denoise (default: synthetic recording).")
+    parser.add_argument("--calibration", help="Earlier recording of the same room to estimate the profile from.")
+    parser.add_argument("--duration", type=float, default=120.0, help="Length of the synthetic recording (s).")
+    parser.add_argument("--sr", type=int, default=16000, help="Sample rate of the synthetic recording.")
+    parser.add_argument("--noise_level", type=float, default=0.01, help="Noise of the synthetic recording.")
+    args = parser.parse_args()
+    if bool(args.audio) != bool(args.calibration):
+        parser.error("--audio and --calibration go together")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        clean = None
+        if args.audio:
+            audio_file, calibration_file = args.audio, args.calibration
+        else:
+            # The same seed gives the same speech; noise_level=0 leaves it clean
+            clean, _ = make_speech_like_audio(args.duration, sr=args.sr, noise_level=0.0, seed=0)
+            noisy, _ = make_speech_like_audio(args.duration, sr=args.sr, noise_level=args.noise_level, seed=0)
+            calibration, _ = make_speech_like_audio(60.0, sr=args.sr, noise_level=args.noise_level, seed=1)
+            audio_file = write_wav(os.path.join(work_dir, "noisy.wav"), noisy, args.sr)
+            calibration_file = write_wav(os.path.join(work_dir, "calibration.wav"), calibration, args.sr)
+        results = run_benchmark(audio_file, calibration_file, work_dir, clean=clean)
+
+    if "input" in results:
+        print(f"{'input':>16}: SNR {results.pop('input')['snr_db']:.2f} dB")
+    for name, stats in results.items():
+        line = (f"{name:>16}: {stats['x_real_time']:7.1f}x real time | "
+                f"noise floor -{stats['noise_reduction_db']:.1f} dB")
+        if "snr_db" in stats:
+            line += f" | SNR {stats['snr_db']:.2f} dB"
+        if "speedup" in stats:
+            line += (f" | x{stats['speedup']:.2f} vs preprocess_audio"
+                     f" | SDR vs preprocess_audio {stats['sdr_vs_preprocess_audio_db']:.1f} dB")
+        if "used_profile" in stats:
+            line += f" | profile used: {stats['used_profile']} (drift {stats['profile_drift_db']:.1f} dB)"
+        print(line)
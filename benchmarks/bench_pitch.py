@@ -0,0 +1,74 @@
+"""
+Compares the pitch backends of scripts/pitch.py against the reference pyin output:
+speed (x real time), voicing agreement, f0 error in cents, and whether the
+tone_flags decisions (global and per window) stay the same.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pitch                       # synthetic 60 s recording
+    python -m benchmarks.bench_pitch --audio processed.wav
+"""
+import argparse
+import time
+
+import librosa
+import numpy as np
+
+from benchmarks.synthetic_audio import make_speech_like_audio
+from scripts.analyze_tone import compute_tone_features_from_array
+from scripts.pitch import PITCH_BACKENDS
+
+
+def compare_to_reference(reference, candidate, window_s: float) -> dict:
+    both_voiced = reference.voiced & candidate.voiced
+    cents = 1200 * np.abs(np.log2(candidate.f0[both_voiced] / reference.f0[both_voiced]))
+
+    windows = np.arange(0.0, reference.duration, window_s)
+    same_flags = [
+        reference.stats(start, start + window_s)["tone_flags"] == candidate.stats(start, start + window_s)["tone_flags"]
+        for start in windows
+    ]
+    return {
+        "voicing_agreement": float(np.mean(reference.voiced == candidate.voiced)),
+        "median_cents_error": float(np.median(cents)) if len(cents) else 0.0,
+        # Octave errors and other gross mistakes (> 1 semitone)
+        "gross_error_rate": float(np.mean(cents > 100)) if len(cents) else 0.0,
+        "global_flags_equal": reference.stats()["tone_flags"] == candidate.stats()["tone_flags"],
+        "window_flags_agreement": float(np.mean(same_flags)) if same_flags else 1.0,
+    }
+
+
+def run_benchmark(y: np.ndarray, sr: int, window_s: float = 5.0) -> dict:
+    duration = len(y) / sr
+    features = {}
+    results = {}
+    for backend in PITCH_BACKENDS:
+        start = time.perf_counter()
+        features[backend] = compute_tone_features_from_array(y, sr, pitch_backend=backend)
+        seconds = time.perf_counter() - start
+        results[backend] = {"seconds": seconds, "x_real_time": duration / seconds}
+    for backend in PITCH_BACKENDS:
+        results[backend].update(compare_to_reference(features["pyin"], features[backend], window_s))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pitch backends against pyin.")
+    parser.add_argument("--audio", help="Audio file to use (default: synthetic recording).")
+    parser.add_argument("--duration", type=float, default=60.0, help="Length of the synthetic recording (s).")
+    parser.add_argument("--sr", type=int, default=16000, help="Sample rate of the synthetic recording.")
+    parser.add_argument("--window", type=float, default=5.0, help="Window length for per-window tone flags (s).")
+    args = parser.parse_args()
+
+    if args.audio:
+        y, sr = librosa.load(args.audio, sr=None)
+    else:
+        y, _ = make_speech_like_audio(args.duration, sr=args.sr)
+        sr = args.sr
+
+    for backend, stats in run_benchmark(y, sr, args.window).items():
+        print(f"{backend:>10}: {stats['x_real_time']:7.1f}x real time | "
+              f"voicing agreement {stats['voicing_agreement']:.1%} | "
+              f"median error {stats['median_cents_error']:.1f} cents | "
+              f"gross errors {stats['gross_error_rate']:.1%} | "
+              f"global flags equal: {stats['global_flags_equal']} | "
+              f"window flags agreement {stats['window_flags_agreement']:.1%}")
@@ -0,0 +1,113 @@
+"""
+Compares the inference backends of the text classifiers (scripts/text_backends.py)
+against the fp32 PyTorch models: throughput, load time, size on disk, and accuracy
+drift (top-label agreement and the difference of the label probabilities).
+
+The first run of a converted backend includes the conversion in its load time;
+later runs load the cached conversion.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_text_backends --backends torch-int8 onnx onnx-int8 --num_segments 500
+"""
+import argparse
+import gc
+import os
+import time
+from typing import Dict, List
+
+from benchmarks.synthetic_text import make_synthetic_segments
+from scripts.batching import run_pipeline_batched, top_score
+from scripts.models import TEXT_CLASSIFIERS
+from scripts.text_backends import TEXT_BACKENDS, TEXT_MODEL_CACHE_DIR, converted_model_dir, load_text_model
+
+# Language of the texts each classifier is given
+_MODEL_LANGUAGES = {"hebrew_sentiment": "he", "english_sentiment": "en", "english_toxic": "en"}
+
+
+def _scores(output) -> Dict[str, float]:
+    """label -> probability of one pipeline output (only the top label for top-1 pipelines)."""
+    if isinstance(output, dict):
+        return {output["label"]: output["score"]}
+    return {item["label"]: item["score"] for item in output}
+
+
+def _dir_bytes(path: str) -> int:
+    if not os.path.isdir(path):
+        return 0
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def measure_drift(reference: List, outputs: List) -> Dict:
+    """
+    Top-label agreement and the mean/max absolute difference of the label
+    probabilities of `outputs` against the `reference` outputs.
+    """
+    agree = 0
+    diffs = []
+    for ref, out in zip(reference, outputs):
+        agree += top_score(ref)[0] == top_score(out)[0]
+        ref_scores, out_scores = _scores(ref), _scores(out)
+        diffs.extend(abs(score - out_scores.get(label, 0.0)) for label, score in ref_scores.items())
+    return {
+        "label_agreement": agree / len(reference) if reference else 1.0,
+        "mean_abs_score_diff": sum(diffs) / len(diffs) if diffs else 0.0,
+        "max_abs_score_diff": max(diffs) if diffs else 0.0,
+    }
+
+
+def _run_backend(name: str, backend: str, texts: List[str], batch_size: int) -> Dict:
+    start = time.perf_counter()
+    pipe = load_text_model(name, backend)
+    load_seconds = time.perf_counter() - start
+    # Warm up, so one-time allocations are not measured
+    run_pipeline_batched(pipe, texts[:batch_size], batch_size=batch_size)
+    start = time.perf_counter()
+    outputs = run_pipeline_batched(pipe, texts, batch_size=batch_size)
+    seconds = time.perf_counter() - start
+    del pipe
+    gc.collect()
+    return {"outputs": outputs, "seconds": seconds, "load_seconds": load_seconds}
+
+
+def run_benchmark(models: List[str], backends: List[str], num_segments: int, batch_size: int) -> Dict:
+    results = {}
+    for name in models:
+        texts = make_synthetic_segments(num_segments, _MODEL_LANGUAGES[name])
+        model_name = TEXT_CLASSIFIERS[name][0]
+        reference = _run_backend(name, "torch", texts, batch_size)
+        results[name] = {"torch": {
+            "segments_per_second": len(texts) / reference["seconds"],
+            "load_seconds": reference["load_seconds"],
+        }}
+        for backend in backends:
+            if backend == "torch":
+                continue
+            run = _run_backend(name, backend, texts, batch_size)
+            stats = {
+                "segments_per_second": len(texts) / run["seconds"],
+                "speedup": reference["seconds"] / run["seconds"],
+                "load_seconds": run["load_seconds"],
+                "disk_mb": _dir_bytes(converted_model_dir(model_name, backend, TEXT_MODEL_CACHE_DIR)) / 1024 ** 2,
+            }
+            stats.update(measure_drift(reference["outputs"], run["outputs"]))
+            results[name][backend] = stats
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the text classifier backends against fp32 PyTorch.")
+    parser.add_argument("--models", nargs="+", choices=list(TEXT_CLASSIFIERS), default=list(TEXT_CLASSIFIERS))
+    parser.add_argument("--backends", nargs="+", choices=TEXT_BACKENDS, default=["torch-int8", "onnx", "onnx-int8"])
+    parser.add_argument("--num_segments", type=int, default=500)
+    parser.add_argument("--batch_size", type=int, default=32)
+    args = parser.parse_args()
+
+    for name, backends in run_benchmark(args.models, args.backends, args.num_segments, args.batch_size).items():
+        print(f"{name}:")
+        for backend, stats in backends.items():
+            line = f"  {backend}: {stats['segments_per_second']:.1f} seg/s, load {stats['load_seconds']:.1f}s"
+            if backend != "torch":
+                line += (f", x{stats['speedup']:.2f} vs torch, {stats['disk_mb']:.0f} MB on disk, "
+                         f"label agreement {stats['label_agreement']:.1%}, "
+                         f"score diff mean {stats['mean_abs_score_diff']:.4f} / max {stats['max_abs_score_diff']:.4f}")
+            print(line)
@@ -0,0 +1,63 @@
+"""
+Compares segments/second of the per-call text analysis path against the
+batched, length-grouped path.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_text_batching --num_segments 500 --batch_size 32
+"""
+import argparse
+import time
+
+from benchmarks.synthetic_text import make_synthetic_segments
+from scripts.analyze_text_english import analyze_english_text, analyze_english_texts
+from scripts.analyze_text_hebrew import analyze_hebrew_text, analyze_hebrew_texts
+
+
+def _time_call(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _labels_agree(single_results, batch_results, keys):
+    return sum(
+        all(a[k] == b[k] for k in keys)
+        for a, b in zip(single_results, batch_results)
+    )
+
+
+def run_benchmark(num_segments: int, batch_size: int) -> dict:
+    results = {}
+    cases = [
+        ("hebrew", make_synthetic_segments(num_segments, "he"), analyze_hebrew_text, analyze_hebrew_texts,
+         ["sentiment_label", "found_keywords"]),
+        ("english", make_synthetic_segments(num_segments, "en"), analyze_english_text, analyze_english_texts,
+         ["sentiment_label", "toxicity_label", "found_keywords"]),
+    ]
+    for name, texts, single_fn, batch_fn, keys in cases:
+        # Warm up both paths so one-time costs are not measured
+        single_fn(texts[0])
+        batch_fn(texts[:batch_size], batch_size=batch_size)
+
+        single_results, single_seconds = _time_call(lambda: [single_fn(t) for t in texts])
+        batch_results, batch_seconds = _time_call(lambda: batch_fn(texts, batch_size=batch_size))
+        results[name] = {
+            "segments": len(texts),
+            "per_call_segments_per_second": len(texts) / single_seconds,
+            "batched_segments_per_second": len(texts) / batch_seconds,
+            "speedup": single_seconds / batch_seconds,
+            "label_agreement": _labels_agree(single_results, batch_results, keys) / len(texts),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched vs per-call text analysis.")
+    parser.add_argument("--num_segments", type=int, default=500)
+    parser.add_argument("--batch_size", type=int, default=32)
+    args = parser.parse_args()
+
+    for name, stats in run_benchmark(args.num_segments, args.batch_size).items():
+        print(f"{name}: {stats['per_call_segments_per_second']:.1f} seg/s per-call, "
+              f"{stats['batched_segments_per_second']:.1f} seg/s batched "
+              f"(x{stats['speedup']:.2f}, label agreement {stats['label_agreement']:.1%})")
@@ -0,0 +1,147 @@
+"""
+Compares the transcription engines (scripts/transcribe.py) against the reference
+openai-whisper engine on fixture recordings: speed (x real time), word error rate
+of each engine's transcript against the reference transcript, and how closely the
+segment start times agree.
+
+Synthetic audio has no words, so point --fixtures_dir at real recordings (a few
+minutes of speech each) for a meaningful WER; without it a synthetic recording is
+used, which only checks that the engines run and line up in time.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_transcription_engines --fixtures_dir /path/to/wavs --model_size small
+    python -m benchmarks.bench_transcription_engines --engines faster-whisper chunked --transcribe_workers 4
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+from typing import Dict, List
+
+from scripts.keywords import normalize
+from scripts.transcribe import TRANSCRIPTION_ENGINES, load_transcription_engine
+
+# A reference segment start counts as matched if an engine segment starts this close to it.
+TIMESTAMP_TOLERANCE_SECONDS = 1.0
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"\w+", normalize(text))
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    (substitutions + deletions + insertions) / reference words, after normalisation
+    (lower case, no niqqud or punctuation).
+    """
+    ref = _words(reference)
+    hyp = _words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    # Levenshtein distance over words, one row at a time
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def timestamp_agreement(reference: List[Dict], segments: List[Dict]) -> Dict:
+    """
+    For every reference segment, the distance from its start to the nearest segment
+    start of the other engine.
+    """
+    if not reference:
+        return {"mean_start_offset": 0.0, "within_tolerance": 1.0}
+    starts = [seg["start"] for seg in segments]
+    offsets = [min((abs(seg["start"] - start) for start in starts), default=float("inf")) for seg in reference]
+    finite = [offset for offset in offsets if offset != float("inf")]
+    return {
+        "mean_start_offset": sum(finite) / len(finite) if finite else float("inf"),
+        "within_tolerance": sum(offset <= TIMESTAMP_TOLERANCE_SECONDS for offset in offsets) / len(offsets),
+    }
+
+
+def _transcribe(engine: str, audio, model_size: str, language_code: str, num_workers: int) -> Dict:
+    model = load_transcription_engine(engine, model_size, num_workers=num_workers)
+    # Warm up, and start the chunked engine's workers so their model loading is not timed
+    model.transcribe(audio[:16000 * 5], language=language_code)
+    if hasattr(model, "warm_up"):
+        model.warm_up()
+    start = time.perf_counter()
+    result = model.transcribe(audio, language=language_code)
+    return {"result": result, "seconds": time.perf_counter() - start}
+
+
+def run_benchmark(
+    audio_files: List[str],
+    engines: List[str],
+    model_size: str,
+    language_code: str,
+    num_workers: int
+) -> Dict:
+    import whisper
+    results = {}
+    for audio_file in audio_files:
+        audio = whisper.load_audio(audio_file)
+        audio_seconds = len(audio) / float(whisper.audio.SAMPLE_RATE)
+        reference = _transcribe("openai", audio, model_size, language_code, num_workers)
+        name = os.path.basename(audio_file)
+        results[name] = {"openai": {
+            "x_real_time": audio_seconds / reference["seconds"],
+            "segments": len(reference["result"]["segments"]),
+        }}
+        for engine in engines:
+            if engine == "openai":
+                continue
+            run = _transcribe(engine, audio, model_size, language_code, num_workers)
+            stats = {
+                "x_real_time": audio_seconds / run["seconds"],
+                "speedup": reference["seconds"] / run["seconds"],
+                "segments": len(run["result"]["segments"]),
+                "wer": word_error_rate(reference["result"]["text"], run["result"]["text"]),
+            }
+            stats.update(timestamp_agreement(reference["result"]["segments"], run["result"]["segments"]))
+            results[name][engine] = stats
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the transcription engines against openai-whisper.")
+    parser.add_argument("--engines", nargs="+", choices=TRANSCRIPTION_ENGINES, default=["faster-whisper", "chunked"])
+    parser.add_argument("--fixtures_dir", default=None, help="Directory of recordings to transcribe.")
+    parser.add_argument("--duration", type=float, default=120.0, help="Length of the synthetic recording (s).")
+    parser.add_argument("--model_size", default="tiny", help="Whisper model size. Default=tiny.")
+    parser.add_argument("--language_code", default="he")
+    parser.add_argument("--transcribe_workers", type=int, default=None, help="Workers of the chunked engine.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.fixtures_dir:
+            from benchmarks.run import list_fixture_files
+            audio_files = list_fixture_files(args.fixtures_dir)
+        else:
+            from benchmarks.run import make_fixture
+            print("No --fixtures_dir given: using synthetic audio (WER is not meaningful on it).")
+            audio_files = [make_fixture(work_dir, args.duration, seed=0)]
+
+        results = run_benchmark(
+            audio_files, args.engines, args.model_size, args.language_code, args.transcribe_workers
+        )
+
+    for name, engines in results.items():
+        print(f"{name}:")
+        for engine, stats in engines.items():
+            line = f"  {engine}: {stats['x_real_time']:.2f}x real time, {stats['segments']} segments"
+            if engine != "openai":
+                line += (f", x{stats['speedup']:.2f} vs openai, WER {stats['wer']:.1%}, "
+                         f"start offset {stats['mean_start_offset']:.2f}s, "
+                         f"{stats['within_tolerance']:.1%} of starts within {TIMESTAMP_TOLERANCE_SECONDS:.0f}s")
+            print(line)
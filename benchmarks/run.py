@@ -0,0 +1,293 @@
+"""
+End-to-end benchmark suite: times every pipeline stage on deterministic synthetic
+recordings (or on pre-recorded fixture files) and appends the results, tagged with
+the git commit, to a JSON-lines history so regressions show up per commit.
+
+Every stage runs in a fresh process, so its peak RSS is its own and models are
+loaded cold (the load time is reported separately from the stage time).
+Everything runs offline on CPU once the tiny Whisper model and the text models
+are in the local caches.
+
+Usage (from the repository root):
+    python -m benchmarks.run                                  # 60 s synthetic recording
+    python -m benchmarks.run --duration 600 --stages preprocess tone
+    python -m benchmarks.run --fixtures_dir /path/to/wavs     # also time real recordings
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.jsonl")
+# A stage this much slower than in the previous comparable run is reported as a regression.
+REGRESSION_THRESHOLD = 0.10
+
+STAGES = ("preprocess", "preprocess_streaming", "transcribe", "tone", "keywords", "text_models")
+
+
+# --- Stages (run in a child process; each returns extra fields for its result) ---
+
+def _stage_preprocess(audio_file: str, work_dir: str, **_) -> Dict:
+    from scripts.preprocess import preprocess_audio
+    preprocess_audio(audio_file, os.path.join(work_dir, "processed.wav"))
+    return {}
+
+
+def _stage_preprocess_streaming(audio_file: str, work_dir: str, **_) -> Dict:
+    from scripts.preprocess import preprocess_audio_streaming
+    preprocess_audio_streaming(audio_file, os.path.join(work_dir, "processed_streaming.wav"))
+    return {}
+
+
+def _stage_transcribe(audio_file: str, work_dir: str, model_size: str, **_) -> Dict:
+    from scripts.transcribe import load_whisper_model, transcribe_audio_file
+    start = time.perf_counter()
+    load_whisper_model(model_size)
+    load_seconds = time.perf_counter() - start
+    result = transcribe_audio_file(
+        audio_file, language_code="he", model_size=model_size, output_path=work_dir, force_transcription=True
+    )
+    return {"load_seconds": load_seconds, "items": len(result["segments"])}
+
+
+def _stage_tone(audio_file: str, pitch_backend: str, **_) -> Dict:
+    from scripts.analyze_tone import analyze_audio_tone
+    analyze_audio_tone(audio_file, pitch_backend=pitch_backend)
+    return {}
+
+
+def _stage_keywords(num_segments: int, **_) -> Dict:
+    from benchmarks.synthetic_text import make_synthetic_segments
+    from scripts.keywords import get_english_matcher, get_hebrew_matcher
+    texts = {
+        "he": make_synthetic_segments(num_segments, "he"),
+        "en": make_synthetic_segments(num_segments, "en"),
+    }
+    start = time.perf_counter()
+    get_hebrew_matcher()
+    get_english_matcher()
+    load_seconds = time.perf_counter() - start
+    matches = sum(len(get_hebrew_matcher().find(text)) for text in texts["he"])
+    matches += sum(len(get_english_matcher().find(text)) for text in texts["en"])
+    return {"load_seconds": load_seconds, "items": 2 * num_segments, "matches": matches}
+
+
+def _stage_text_models(num_segments: int, batch_size: int, text_backend: str = "torch", **_) -> Dict:
+    from benchmarks.synthetic_text import make_synthetic_segments
+    from scripts.analyze_text_english import analyze_english_texts
+    from scripts.analyze_text_hebrew import analyze_hebrew_texts
+    from scripts.text_backends import get_text_model
+    hebrew_texts = make_synthetic_segments(num_segments, "he")
+    english_texts = make_synthetic_segments(num_segments, "en")
+    start = time.perf_counter()
+    for name in ("hebrew_sentiment", "english_sentiment", "english_toxic"):
+        get_text_model(name, text_backend)
+    load_seconds = time.perf_counter() - start
+    analyze_hebrew_texts(hebrew_texts, batch_size=batch_size, backend=text_backend)
+    analyze_english_texts(english_texts, batch_size=batch_size, backend=text_backend)
+    return {"load_seconds": load_seconds, "items": 2 * num_segments}
+
+
+_STAGE_FUNCTIONS = {
+    "preprocess": _stage_preprocess,
+    "preprocess_streaming": _stage_preprocess_streaming,
+    "transcribe": _stage_transcribe,
+    "tone": _stage_tone,
+    "keywords": _stage_keywords,
+    "text_models": _stage_text_models,
+}
+# Stages whose work scales with the audio (reported as x real time)
+_AUDIO_STAGES = ("preprocess", "preprocess_streaming", "transcribe", "tone")
+
+
+def _run_stage(stage: str, kwargs: Dict) -> Dict:
+    from scripts.models import peak_rss_bytes
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    extra = _STAGE_FUNCTIONS[stage](**kwargs)
+    seconds = time.perf_counter() - wall_start - extra.get("load_seconds", 0.0)
+    result = {
+        "seconds": seconds,
+        "cpu_seconds": time.process_time() - cpu_start,
+        "peak_rss_mb": peak_rss_bytes() / 1024 ** 2,
+    }
+    result.update(extra)
+    if "items" in result and seconds > 0:
+        result["items_per_second"] = result["items"] / seconds
+    return result
+
+
+def run_stage_isolated(stage: str, **kwargs) -> Dict:
+    """
+    Runs one stage in a fresh (spawned) process and returns its measurements.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(_run_stage, stage, kwargs).result()
+
+
+# --- Fixtures ---
+
+def make_fixture(work_dir: str, duration: float, seed: int, sr: int = 16000) -> str:
+    """
+    Writes a deterministic synthetic daycare recording (noise, hum, speech-like bursts
+    and non-speech tones) and returns its path.
+    """
+    from benchmarks.synthetic_audio import add_tones, make_speech_like_audio, write_wav
+    y, _ = make_speech_like_audio(duration, sr=sr, seed=seed)
+    add_tones(y, sr=sr, seed=seed)
+    return write_wav(os.path.join(work_dir, f"synthetic_{int(duration)}s_seed{seed}.wav"), y, sr)
+
+
+def list_fixture_files(fixtures_dir: Optional[str]) -> List[str]:
+    if not fixtures_dir:
+        return []
+    return sorted(
+        os.path.join(fixtures_dir, name) for name in os.listdir(fixtures_dir)
+        if name.lower().endswith((".wav", ".mp3", ".flac", ".m4a"))
+    )
+
+
+# --- History ---
+
+def git_commit() -> Dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, capture_output=True, text=True
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def previous_run(history_file: str, config: Dict) -> Optional[Dict]:
+    """
+    Returns the latest run in the history with the same configuration, if any.
+    """
+    if not os.path.exists(history_file):
+        return None
+    previous = None
+    with open(history_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry.get("config") == config:
+                previous = entry
+    return previous
+
+
+def format_comparison(current: Dict, previous: Optional[Dict]) -> List[str]:
+    lines = []
+    for name, result in current["results"].items():
+        line = (f"  {name}: {result['seconds']:.2f}s"
+                + (f" ({result['x_real_time']:.1f}x real time)" if "x_real_time" in result else "")
+                + (f", {result['items_per_second']:.1f} items/s" if "items_per_second" in result else "")
+                + (f", load {result['load_seconds']:.1f}s" if "load_seconds" in result else "")
+                + f", peak RSS {result['peak_rss_mb']:.0f} MB")
+        old = (previous or {}).get("results", {}).get(name)
+        if old and old.get("seconds"):
+            change = result["seconds"] / old["seconds"] - 1
+            line += f", {change:+.1%} vs {previous['git']['commit'][:8] if previous['git']['commit'] else 'previous'}"
+            if change > REGRESSION_THRESHOLD:
+                line += "  <-- REGRESSION"
+        lines.append(line)
+    return lines
+
+
+def run_suite(
+    stages: List[str],
+    duration: float,
+    seed: int,
+    model_size: str,
+    pitch_backend: str,
+    num_segments: int,
+    batch_size: int,
+    fixtures_dir: Optional[str] = None,
+    text_backend: str = "torch"
+) -> Dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        audio_files = [("synthetic", make_fixture(work_dir, duration, seed))]
+        audio_files += [(os.path.basename(path), path) for path in list_fixture_files(fixtures_dir)]
+
+        for stage in stages:
+            if stage in _AUDIO_STAGES:
+                from scripts.preprocess import get_audio_duration
+                for fixture_name, audio_file in audio_files:
+                    name = stage if fixture_name == "synthetic" else f"{stage}[{fixture_name}]"
+                    print(f"Running {name}...")
+                    result = run_stage_isolated(
+                        stage, audio_file=audio_file, work_dir=work_dir,
+                        model_size=model_size, pitch_backend=pitch_backend
+                    )
+                    audio_seconds = get_audio_duration(audio_file)
+                    result["audio_seconds"] = audio_seconds
+                    result["x_real_time"] = audio_seconds / result["seconds"] if result["seconds"] > 0 else 0.0
+                    results[name] = result
+            else:
+                print(f"Running {stage}...")
+                results[stage] = run_stage_isolated(
+                    stage, num_segments=num_segments, batch_size=batch_size, text_backend=text_backend
+                )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage and record the results.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--duration", type=float, default=60.0, help="Length of the synthetic recording (s).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic recording.")
+    parser.add_argument("--model_size", default="tiny", help="Whisper model size. Default=tiny.")
+    parser.add_argument("--pitch_backend", default="pyin", help="Pitch backend for the tone stage. Default=pyin.")
+    parser.add_argument("--num_segments", type=int, default=200, help="Synthetic segments for the text stages.")
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--text_backend", default="torch", help="Backend of the text_models stage. Default=torch.")
+    parser.add_argument("--fixtures_dir", default=None, help="Directory of pre-recorded fixture files to time as well.")
+    parser.add_argument("--history", default=HISTORY_FILE, help="JSON-lines history file to append to.")
+    parser.add_argument("--no_history", action="store_true", help="Do not record this run.")
+    args = parser.parse_args()
+
+    config = {
+        "duration": args.duration,
+        "seed": args.seed,
+        "model_size": args.model_size,
+        "pitch_backend": args.pitch_backend,
+        "num_segments": args.num_segments,
+        "batch_size": args.batch_size,
+        "fixtures": [os.path.basename(path) for path in list_fixture_files(args.fixtures_dir)],
+    }
+    # Only recorded when not the default, so older history entries stay comparable
+    if args.text_backend != "torch":
+        config["text_backend"] = args.text_backend
+    entry = {
+        "timestamp": time.time(),
+        "git": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "results": run_suite(
+            args.stages, args.duration, args.seed, args.model_size, args.pitch_backend,
+            args.num_segments, args.batch_size, fixtures_dir=args.fixtures_dir,
+            text_backend=args.text_backend
+        ),
+    }
+
+    print(f"\nCommit {entry['git']['commit'] or 'unknown'}{' (dirty)' if entry['git']['dirty'] else ''}:")
+    print("\n".join(format_comparison(entry, previous_run(args.history, config))))
+    if not args.no_history:
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        print(f"Appended to {args.history}")
@@ -0,0 +1,107 @@
+import wave
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def make_speech_like_audio(
+    duration_s: float,
+    sr: int = 16000,
+    speech_fraction: float = 0.3,
+    noise_level: float = 0.01,
+    seed: int = 0
+) -> Tuple[np.ndarray, List[Dict]]:
+    """
+    Generates a deterministic daycare-like recording: background noise with a hum,
+    plus speech-like bursts (harmonic voices with a drifting pitch and a syllable-rate
+    envelope) from adult and child "speakers".
+
+    :param duration_s: Length of the recording in seconds.
+    :param sr: Sample rate.
+    :param speech_fraction: Approximate fraction of the recording covered by bursts.
+    :param noise_level: Standard deviation of the background noise (full scale = 1.0).
+    :param seed: Random seed (the same seed always gives the same audio).
+    :return: (samples as float32 in [-1, 1], list of bursts
+             {"start": s, "end": s, "f0": Hz, "speaker": "adult"|"child", "loud": bool}).
+    """
+    rng = np.random.default_rng(seed)
+    num_samples = int(duration_s * sr)
+    t = np.arange(num_samples) / sr
+    y = noise_level * rng.standard_normal(num_samples)
+    y += 0.5 * noise_level * np.sin(2 * np.pi * 50.0 * t)     # mains / air-conditioning hum
+
+    bursts = []
+    position = rng.uniform(0.2, 1.0)
+    mean_gap = 1.5 * (1 - speech_fraction) / max(speech_fraction, 1e-3)
+    while position < duration_s - 0.5:
+        length = rng.uniform(0.6, 3.0)
+        end = min(duration_s, position + length)
+        speaker = "child" if rng.random() < 0.6 else "adult"
+        f0 = rng.uniform(250.0, 400.0) if speaker == "child" else rng.uniform(110.0, 220.0)
+        loud = rng.random() < 0.15
+        amplitude = rng.uniform(0.3, 0.6) if loud else rng.uniform(0.05, 0.2)
+
+        start_index, end_index = int(position * sr), int(end * sr)
+        tb = t[start_index:end_index] - position
+        # Pitch drifts by up to +-10% over the burst
+        pitch = f0 * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(0.2, 0.8) * tb))
+        phase = 2 * np.pi * np.cumsum(pitch) / sr
+        voice = sum((0.7 ** k) * np.sin(k * phase) for k in range(1, 6))
+        envelope = 0.5 * (1 - np.cos(2 * np.pi * 4.0 * tb)) * np.hanning(len(tb))
+        y[start_index:end_index] += amplitude * envelope * voice / 2.0
+
+        bursts.append({"start": position, "end": end, "f0": f0, "speaker": speaker, "loud": loud})
+        position = end + rng.exponential(mean_gap)
+
+    return np.clip(y, -1.0, 1.0).astype(np.float32), bursts
+
+
+def add_tones(
+    y: np.ndarray,
+    sr: int = 16000,
+    tones_per_minute: float = 2.0,
+    amplitude: float = 0.1,
+    seed: int = 0
+) -> List[Dict]:
+    """
+    Adds steady non-speech tones (toys, alarms, a piano) to `y` in place, so that
+    fixtures also contain loud harmonic sound that is not speech.
+
+    :return: The tones added, as {"start": s, "end": s, "freq": Hz}.
+    """
+    rng = np.random.default_rng(seed + 1)
+    duration_s = len(y) / float(sr)
+    tones = []
+    for _ in range(int(round(tones_per_minute * duration_s / 60.0))):
+        length = rng.uniform(0.3, 2.0)
+        start = rng.uniform(0.0, max(0.0, duration_s - length))
+        freq = float(rng.choice([440.0, 523.25, 880.0, 1000.0, 2000.0]))
+        start_index, end_index = int(start * sr), int(min(duration_s, start + length) * sr)
+        tb = np.arange(end_index - start_index) / sr
+        y[start_index:end_index] += (amplitude * np.hanning(len(tb)) * np.sin(2 * np.pi * freq * tb)).astype(y.dtype)
+        tones.append({"start": start, "end": start + length, "freq": freq})
+    np.clip(y, -1.0, 1.0, out=y)
+    return tones
+
+
+def write_wav(path: str, y: np.ndarray, sr: int) -> str:
+    """
+    Writes mono float samples in [-1, 1] as a 16-bit WAV file.
+    """
+    pcm = np.clip(np.round(y * 32767), -32768, 32767).astype(np.int16)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sr)
+        wf.writeframes(pcm.tobytes())
+    return path
+
+
+def read_wav(path: str) -> Tuple[np.ndarray, int]:
+    """
+    Reads a mono 16-bit WAV file as float samples in [-1, 1] (the inverse of `write_wav`).
+    """
+    with wave.open(path, "rb") as wf:
+        sr = wf.getframerate()
+        pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    return pcm.astype(np.float32) / 32767.0, sr
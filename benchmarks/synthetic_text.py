@@ -0,0 +1,47 @@
+import random
+from typing import List
+
+from common.consts import ENGLISH_KEYWORDS, HEBREW_KEYWORDS
+
+# Everyday daycare phrases used as filler around the keywords.
+HEBREW_FILLER = [
+    "בוא", "נלך", "לגן", "עכשיו", "תאכל", "את", "הארוחה", "שלך", "יופי", "איזה",
+    "ציור", "יפה", "מי", "רוצה", "לשחק", "בחוץ", "שב", "בבקשה", "על", "הכיסא",
+    "תודה", "רבה", "הגיע", "הזמן", "לישון", "אמא", "תבוא", "אחר", "כך", "שתה", "מים",
+]
+ENGLISH_FILLER = [
+    "come", "here", "let's", "go", "to", "the", "garden", "now", "eat", "your",
+    "lunch", "what", "a", "nice", "drawing", "who", "wants", "to", "play", "outside",
+    "sit", "down", "please", "on", "chair", "thank", "you", "it's", "time", "sleep",
+]
+
+
+def make_synthetic_segments(
+    num_segments: int,
+    language: str = "he",
+    keyword_rate: float = 0.1,
+    min_words: int = 2,
+    max_words: int = 40,
+    seed: int = 0
+) -> List[str]:
+    """
+    Generates deterministic transcript-like segments of varying length.
+
+    :param num_segments: Number of segments to generate.
+    :param language: "he" or "en".
+    :param keyword_rate: Probability that a segment contains a keyword from common.consts.
+    :param min_words: Minimum number of words per segment.
+    :param max_words: Maximum number of words per segment.
+    :param seed: Random seed (the same seed always gives the same segments).
+    :return: A list of segment texts.
+    """
+    rng = random.Random(seed)
+    filler = HEBREW_FILLER if language == "he" else ENGLISH_FILLER
+    keywords = HEBREW_KEYWORDS if language == "he" else ENGLISH_KEYWORDS
+    segments = []
+    for _ in range(num_segments):
+        words = [rng.choice(filler) for _ in range(rng.randint(min_words, max_words))]
+        if rng.random() < keyword_rate:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        segments.append(" ".join(words))
+    return segments
@@ -215,3 +215,8 @@ HEBREW_KEYWORDS = [
     "מתחבא", "מסתתר",
 ]
 
+
+# Thresholds used by `is_segment_problematic` in scripts/decision.py.
+# These only affect the final decision, so changing them reuses every cached
+# preprocessing/transcription/tone artifact.
+TOXICITY_THRESHOLD = 0.5
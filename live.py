@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Near-real-time monitoring of a recording that is still being made.
+
+Audio is read from a growing WAV file or from raw 16-bit PCM on stdin into a ring
+buffer. Every few seconds the latest window is run through the usual stages (VAD,
+Whisper, tone features, keyword/sentiment checks) and problematic segments are
+written as JSON lines as soon as they are found.
+
+Usage:
+    python live.py --input /path/to/recording_in_progress.wav
+    arecord -f S16_LE -c 1 -r 16000 | python live.py --input - --sample_rate 16000
+"""
+import argparse
+import json
+import queue
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from main import analyze_segment, analyze_segments_text, create_translator
+from scripts.analyze_tone import compute_tone_features_from_array
+from scripts.batching import DEFAULT_BATCH_SIZE
+from scripts.pitch import PITCH_BACKENDS
+from scripts.text_backends import DEFAULT_TEXT_BACKEND, TEXT_BACKENDS
+from scripts.tone_baseline import ToneBaseline
+from scripts.transcribe import DEFAULT_TRANSCRIPTION_ENGINE, PROMPT_CARRYOVER_CHARS, load_transcription_engine
+from scripts.translate import DEFAULT_TRANSLATION_BACKEND, TRANSLATION_BACKENDS
+from scripts.vad import detect_speech_regions_from_array
+from common.consts import TOXICITY_THRESHOLD
+
+# Whisper's input rate; other input rates are resampled to it as they arrive.
+LIVE_SAMPLE_RATE = 16000
+# Each analysis covers the last LIVE_WINDOW_SECONDS and runs every LIVE_HOP_SECONDS of new audio.
+LIVE_WINDOW_SECONDS = 15.0
+LIVE_HOP_SECONDS = 5.0
+LIVE_BUFFER_SECONDS = 120.0
+# Segments ending this close to the end of a window may be cut off; a later window emits them.
+LIVE_COMMIT_GUARD_SECONDS = 1.0
+# Alerts slower than this (from the segment's last sample arriving to the event) are counted.
+LIVE_LATENCY_BUDGET_SECONDS = 10.0
+LIVE_PITCH_BACKEND = "yin"
+
+READ_BLOCK_SECONDS = 0.5
+FILE_POLL_SECONDS = 0.25
+
+
+def log(message: str):
+    # Events go to stdout by default, so progress messages go to stderr
+    print(message, file=sys.stderr, flush=True)
+
+
+class RingBuffer:
+    """
+    Keeps the last `capacity` samples of a stream. Positions are absolute sample
+    indices since the start of the stream; the wall-clock arrival time of each
+    appended block is remembered to measure alert latency.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total = 0
+        self._data = np.zeros(capacity, dtype=np.float32)
+        # (stream position after the block, wall-clock time the block arrived)
+        self._arrivals = deque()
+
+    @property
+    def first_position(self) -> int:
+        """Position of the oldest sample still in the buffer."""
+        return max(0, self.total - self.capacity)
+
+    def append(self, samples: np.ndarray, arrival_time: Optional[float] = None):
+        count = len(samples)
+        kept = samples[-self.capacity:]
+        start = (self.total + count - len(kept)) % self.capacity
+        first = min(len(kept), self.capacity - start)
+        self._data[start:start + first] = kept[:first]
+        self._data[:len(kept) - first] = kept[first:]
+        self.total += count
+        self._arrivals.append((self.total, arrival_time if arrival_time is not None else time.time()))
+        while len(self._arrivals) > 1 and self._arrivals[1][0] <= self.first_position:
+            self._arrivals.popleft()
+
+    def read(self, start: int, end: int) -> Tuple[np.ndarray, int]:
+        """
+        Returns (samples, actual start) for positions [start, end), clipped to what
+        is still in the buffer.
+        """
+        start = max(start, self.first_position)
+        end = min(end, self.total)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32), start
+        return self._data[np.arange(start, end) % self.capacity], start
+
+    def arrival_time(self, position: int) -> float:
+        """Wall-clock time at which the sample at `position` was received."""
+        for end, arrived in self._arrivals:
+            if end > position:
+                return arrived
+        return self._arrivals[-1][1] if self._arrivals else time.time()
+
+
+# --- Audio sources: each yields float32 mono blocks at their own sample rate ---
+
+def _pcm16_to_float(data: bytes, channels: int) -> np.ndarray:
+    samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def _read_wav_header(f) -> Optional[Tuple[int, int, int]]:
+    """
+    Parses a WAV header up to the start of the data chunk.
+    The data size is ignored, since a file that is still being written does not know it yet.
+
+    :return: (sample rate, channels, data offset), or None if the header is not complete yet.
+    """
+    f.seek(0)
+    riff = f.read(12)
+    if len(riff) < 12:
+        return None
+    if riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+    sr = channels = bits = None
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            return None
+        chunk_id, size = chunk_header[:4], struct.unpack("<I", chunk_header[4:])[0]
+        if chunk_id == b"data":
+            if sr is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            if bits != 16:
+                raise ValueError(f"Only 16-bit PCM WAV is supported (got {bits}-bit)")
+            return sr, channels, f.tell()
+        if chunk_id == b"fmt ":
+            fmt = f.read(size)
+            if len(fmt) < 16:
+                return None
+            _, channels, sr, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+            if size & 1:
+                f.seek(1, 1)
+        else:
+            f.seek(size + (size & 1), 1)
+
+
+def iter_growing_wav(
+    path: str,
+    idle_timeout: Optional[float] = None,
+    simulate_realtime: bool = False
+) -> Iterator[Tuple[np.ndarray, int]]:
+    """
+    Yields (samples, sample_rate) blocks from a 16-bit PCM WAV file that may still be
+    growing, waiting for new data as it is written.
+
+    :param path: Path to the WAV file.
+    :param idle_timeout: Stop after this many seconds without new data (None waits forever).
+    :param simulate_realtime: Release blocks no faster than real time (to replay a finished
+                              recording as if it were live).
+    """
+    with open(path, "rb") as f:
+        header = _read_wav_header(f)
+        while header is None:
+            time.sleep(FILE_POLL_SECONDS)
+            header = _read_wav_header(f)
+        sr, channels, data_offset = header
+        f.seek(data_offset)
+
+        frame_bytes = 2 * channels
+        block_bytes = int(READ_BLOCK_SECONDS * sr) * frame_bytes
+        pending = b""
+        last_data_time = start_time = time.time()
+        samples_read = 0
+        while True:
+            data = f.read(block_bytes)
+            if not data:
+                if idle_timeout is not None and time.time() - last_data_time > idle_timeout:
+                    return
+                time.sleep(FILE_POLL_SECONDS)
+                continue
+            last_data_time = time.time()
+            pending += data
+            usable = len(pending) // frame_bytes * frame_bytes
+            samples = _pcm16_to_float(pending[:usable], channels)
+            pending = pending[usable:]
+            if simulate_realtime:
+                samples_read += len(samples)
+                delay = start_time + samples_read / float(sr) - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            yield samples, sr
+
+
+def iter_stdin_pcm(sample_rate: int, channels: int = 1) -> Iterator[Tuple[np.ndarray, int]]:
+    """
+    Yields (samples, sample_rate) blocks of raw little-endian 16-bit PCM read from stdin.
+    """
+    stream = sys.stdin.buffer
+    frame_bytes = 2 * channels
+    block_bytes = int(READ_BLOCK_SECONDS * sample_rate) * frame_bytes
+    pending = b""
+    while True:
+        data = stream.read(block_bytes)
+        if not data:
+            return
+        pending += data
+        usable = len(pending) // frame_bytes * frame_bytes
+        yield _pcm16_to_float(pending[:usable], channels), sample_rate
+        pending = pending[usable:]
+
+
+def resample_blocks(blocks: Iterator[Tuple[np.ndarray, int]], target_sr: int = LIVE_SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """
+    Resamples a stream of blocks to `target_sr` without discontinuities at block edges.
+    """
+    resampler = None
+    for samples, sr in blocks:
+        if sr == target_sr:
+            yield samples
+            continue
+        if resampler is None:
+            import soxr
+            resampler = soxr.ResampleStream(sr, target_sr, 1, dtype="float32")
+        yield resampler.resample_chunk(samples)
+    if resampler is not None:
+        yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+
+def start_reader(blocks: Iterator[np.ndarray]) -> queue.Queue:
+    """
+    Reads `blocks` in a background thread into a queue of (samples, arrival time),
+    ended by None, so that audio keeps arriving while a window is being analyzed.
+    """
+    blocks_queue = queue.Queue()
+
+    def read():
+        try:
+            for samples in blocks:
+                blocks_queue.put((samples, time.time()))
+        finally:
+            blocks_queue.put(None)
+
+    threading.Thread(target=read, name="live-reader", daemon=True).start()
+    return blocks_queue
+
+
+def latency_percentiles(latencies: List[float]) -> Dict:
+    if not latencies:
+        return {"count": 0, "p50": None, "p95": None}
+    return {
+        "count": len(latencies),
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+    }
+
+
+class LiveMonitor:
+    """
+    Analyzes a live stream window by window and turns new segments into events.
+
+    Each analysis covers the last `window_seconds` of audio, so consecutive windows
+    overlap; a segment is emitted once, from the first window in which it ends before
+    the commit guard. When analysis cannot keep up, the monitor jumps to the latest
+    audio (keeping latency bounded) and counts the skipped seconds.
+    """
+
+    def __init__(
+        self,
+        language_code: str = "he",
+        model_size: str = "small",
+        translator=None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        toxicity_threshold: float = TOXICITY_THRESHOLD,
+        pitch_backend: str = LIVE_PITCH_BACKEND,
+        window_seconds: float = LIVE_WINDOW_SECONDS,
+        hop_seconds: float = LIVE_HOP_SECONDS,
+        latency_budget: float = LIVE_LATENCY_BUDGET_SECONDS,
+        emit_all_segments: bool = False,
+        text_backend: str = DEFAULT_TEXT_BACKEND,
+        transcription_engine: str = DEFAULT_TRANSCRIPTION_ENGINE,
+        tone_baseline: bool = False
+    ):
+        self.language_code = language_code
+        self.model = load_transcription_engine(transcription_engine, model_size)
+        self.translator = translator
+        self.batch_size = batch_size
+        self.toxicity_threshold = toxicity_threshold
+        self.pitch_backend = pitch_backend
+        self.text_backend = text_backend
+        self.window = int(window_seconds * LIVE_SAMPLE_RATE)
+        self.hop = int(hop_seconds * LIVE_SAMPLE_RATE)
+        self.latency_budget = latency_budget
+        self.emit_all_segments = emit_all_segments
+        # Running loudness/pitch baseline of the stream (scripts/tone_baseline.py); only
+        # its quantile sketches are kept, however long the stream runs
+        self.tone_baseline = ToneBaseline() if tone_baseline else None
+
+        self.buffer = RingBuffer(int(max(LIVE_BUFFER_SECONDS, 2 * window_seconds) * LIVE_SAMPLE_RATE))
+        self.processed_until = 0      # stream position up to which audio has been analyzed
+        self.emitted_until = 0.0      # stream time (s) up to which segments have been emitted
+        self.prompt = None
+        self.alert_latencies: List[float] = []
+        self.window_seconds_taken: List[float] = []
+        self.over_budget = 0
+        self.skipped_seconds = 0.0
+
+    def ready(self) -> bool:
+        return self.buffer.total - self.processed_until >= self.hop
+
+    def process_window(self, final: bool = False) -> List[Dict]:
+        """
+        Analyzes the latest window and returns the events of its new segments.
+
+        :param final: The stream has ended; emit segments up to its very end.
+        """
+        started = time.time()
+        end = self.buffer.total
+        start = max(0, end - self.window)
+        if start > self.processed_until:
+            self.skipped_seconds += (start - self.processed_until) / float(LIVE_SAMPLE_RATE)
+            log(f"Falling behind: skipped {(start - self.processed_until) / LIVE_SAMPLE_RATE:.1f}s of audio.")
+        audio, start = self.buffer.read(start, end)
+        previous_until = self.processed_until
+        self.processed_until = end
+        offset = start / float(LIVE_SAMPLE_RATE)
+
+        # 1) Speech regions of the window; nothing to do on silence
+        speech_index = detect_speech_regions_from_array(audio, LIVE_SAMPLE_RATE)
+        if not speech_index.regions:
+            self.window_seconds_taken.append(time.time() - started)
+            return []
+
+        # 2) Transcribe the speech of the window, keeping only segments not emitted yet
+        result = self.model.transcribe(
+            speech_index.slice_audio(audio, LIVE_SAMPLE_RATE),
+            language=self.language_code,
+            initial_prompt=self.prompt
+        )
+        commit_limit = end / float(LIVE_SAMPLE_RATE) - (0.0 if final else LIVE_COMMIT_GUARD_SECONDS)
+        segments = []
+        for seg in result["segments"]:
+            seg_start = offset + speech_index.compact_to_original(seg["start"])
+            seg_end = offset + speech_index.compact_to_original(seg["end"], is_end=True)
+            # Emitted already (mostly before emitted_until), or possibly cut off at the window end
+            if (seg_start + seg_end) / 2 <= self.emitted_until or seg_end > commit_limit:
+                continue
+            segments.append({
+                "start": seg_start,
+                "end": seg_end,
+                "text": seg["text"].strip(),
+                "avg_logprob": seg.get("avg_logprob"),
+                "no_speech_prob": seg.get("no_speech_prob"),
+            })
+        if not segments:
+            self.window_seconds_taken.append(time.time() - started)
+            return []
+        self.emitted_until = segments[-1]["end"]
+        self.prompt = " ".join(seg["text"] for seg in segments)[-PROMPT_CARRYOVER_CHARS:]
+
+        # 3) Tone features of the window and text analysis of the new segments
+        tone_features = compute_tone_features_from_array(
+            audio, LIVE_SAMPLE_RATE, pitch_backend=self.pitch_backend, speech_index=speech_index
+        )
+        if self.tone_baseline is not None:
+            # Add only the frames no earlier window added, then judge against the stream so far
+            first_new = max(0, previous_until - start) // tone_features.hop_length
+            self.tone_baseline.update(tone_features, slice(first_new, None))
+            tone_features.baseline = self.tone_baseline if self.tone_baseline.is_ready else None
+        analyses = analyze_segments_text(
+            [seg["text"] for seg in segments], translator=self.translator, batch_size=self.batch_size,
+            text_backend=self.text_backend
+        )
+
+        # 4) Same per-segment decision as main.py, on window-relative times
+        events = []
+        now = time.time()
+        for seg, seg_analysis in zip(segments, analyses):
+            relative = dict(seg, start=seg["start"] - offset, end=seg["end"] - offset)
+            analyzed = analyze_segment(relative, seg_analysis, tone_features, toxicity_threshold=self.toxicity_threshold)
+            analyzed["start"], analyzed["end"] = seg["start"], seg["end"]
+
+            latency = now - self.buffer.arrival_time(int(seg["end"] * LIVE_SAMPLE_RATE) - 1)
+            if analyzed["problematic"]:
+                self.alert_latencies.append(latency)
+                if latency > self.latency_budget:
+                    self.over_budget += 1
+            if analyzed["problematic"] or self.emit_all_segments:
+                events.append({
+                    "type": "problematic_segment" if analyzed["problematic"] else "segment",
+                    "detected_at": now,
+                    "latency_seconds": latency,
+                    **analyzed
+                })
+        self.window_seconds_taken.append(time.time() - started)
+        return events
+
+    def latency_report(self) -> Dict:
+        return {
+            "alert_latency_seconds": latency_percentiles(self.alert_latencies),
+            "window_processing_seconds": latency_percentiles(self.window_seconds_taken),
+            "alerts_over_budget": self.over_budget,
+            "latency_budget_seconds": self.latency_budget,
+            "skipped_audio_seconds": self.skipped_seconds,
+            "stream_seconds": self.buffer.total / float(LIVE_SAMPLE_RATE),
+        }
+
+
+def format_latency_report(report: Dict) -> str:
+    alert = report["alert_latency_seconds"]
+    window = report["window_processing_seconds"]
+    lines = [f"Stream: {report['stream_seconds']:.1f}s, skipped {report['skipped_audio_seconds']:.1f}s"]
+    if window["count"]:
+        lines.append(f"Window processing: p50 {window['p50']:.2f}s, p95 {window['p95']:.2f}s ({window['count']} windows)")
+    if alert["count"]:
+        lines.append(f"Alert latency: p50 {alert['p50']:.2f}s, p95 {alert['p95']:.2f}s ({alert['count']} alerts, "
+                     f"{report['alerts_over_budget']} over the {report['latency_budget_seconds']:.0f}s budget)")
+    else:
+        lines.append("Alert latency: no alerts")
+    return "\n".join(lines)
+
+
+def run_live(monitor: LiveMonitor, blocks: Iterator[np.ndarray], events_file) -> Dict:
+    """
+    Feeds audio blocks to the monitor and writes its events as JSON lines.
+
+    :return: The monitor's latency report.
+    """
+    blocks_queue = start_reader(blocks)
+    finished = False
+    try:
+        while not finished:
+            # Wait for audio, then take everything that arrived meanwhile
+            item = blocks_queue.get()
+            while item is not None:
+                samples, arrived = item
+                monitor.buffer.append(samples, arrival_time=arrived)
+                try:
+                    item = blocks_queue.get_nowait()
+                except queue.Empty:
+                    break
+            finished = item is None
+
+            if monitor.ready() or (finished and monitor.buffer.total > monitor.processed_until):
+                for event in monitor.process_window(final=finished):
+                    events_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+                    events_file.flush()
+                    if event["type"] == "problematic_segment":
+                        log(f"[{event['start']:.1f}s-{event['end']:.1f}s] problematic "
+                            f"(latency {event['latency_seconds']:.1f}s): {event['text']}")
+    except KeyboardInterrupt:
+        log("Stopped.")
+    return monitor.latency_report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor a live daycare recording in near real time.")
+    parser.add_argument(
+        "--input", "-i",
+        required=True,
+        help="A WAV file that is being recorded (16-bit PCM), or '-' for raw 16-bit PCM on stdin."
+    )
+    parser.add_argument("--sample_rate", type=int, default=LIVE_SAMPLE_RATE, help="Sample rate of stdin PCM.")
+    parser.add_argument("--channels", type=int, default=1, help="Channels of stdin PCM.")
+    parser.add_argument("--events", default="-", help="JSON-lines file to append events to. Default: stdout.")
+    parser.add_argument("--language_code", default="he", help="Language code for transcription. Default: he.")
+    parser.add_argument("--model_size", default="small", help="Whisper model size. Default=small.")
+    parser.add_argument("--use_translation", action="store_true", help="Also translate to English and analyze it.")
+    parser.add_argument("--translation_backend", choices=TRANSLATION_BACKENDS, default=DEFAULT_TRANSLATION_BACKEND)
+    parser.add_argument("--translation_cache", default=None, help="SQLite file caching translations.")
+    parser.add_argument("--toxicity_threshold", type=float, default=TOXICITY_THRESHOLD)
+    parser.add_argument("--pitch_backend", choices=PITCH_BACKENDS, default=LIVE_PITCH_BACKEND)
+    # A window is shorter than a chunk of the "chunked" engine, so only the single-process engines apply
+    parser.add_argument("--whisper_engine", choices=("openai", "faster-whisper"), default=DEFAULT_TRANSCRIPTION_ENGINE,
+                        help="Transcription engine (faster-whisper needs `pip install faster-whisper`).")
+    parser.add_argument("--text_backend", choices=TEXT_BACKENDS, default=DEFAULT_TEXT_BACKEND,
+                        help="Inference backend of the text classifiers (torch-int8/onnx cut per-window latency).")
+    parser.add_argument("--window_seconds", type=float, default=LIVE_WINDOW_SECONDS,
+                        help=f"Audio analyzed per step. Default={LIVE_WINDOW_SECONDS}.")
+    parser.add_argument("--hop_seconds", type=float, default=LIVE_HOP_SECONDS,
+                        help=f"New audio between analysis steps. Default={LIVE_HOP_SECONDS}.")
+    parser.add_argument("--latency_budget", type=float, default=LIVE_LATENCY_BUDGET_SECONDS,
+                        help=f"Alert latency target in seconds. Default={LIVE_LATENCY_BUDGET_SECONDS}.")
+    parser.add_argument("--idle_timeout", type=float, default=None,
+                        help="Stop when the WAV file has not grown for this many seconds.")
+    parser.add_argument("--simulate_realtime", action="store_true",
+                        help="Replay a finished WAV file at real-time speed (for latency measurements).")
+    parser.add_argument("--tone_baseline", choices=("fixed", "recording"), default="fixed",
+                        help="Judge loud/high-pitch tone by fixed thresholds or against the stream's own running baseline.")
+    parser.add_argument("--all_segments", action="store_true", help="Emit an event for every segment, not only problematic ones.")
+    args = parser.parse_args()
+
+    if args.input == "-":
+        blocks = iter_stdin_pcm(args.sample_rate, channels=args.channels)
+    else:
+        blocks = iter_growing_wav(args.input, idle_timeout=args.idle_timeout, simulate_realtime=args.simulate_realtime)
+
+    log(f"Loading Whisper '{args.model_size}'...")
+    monitor = LiveMonitor(
+        language_code=args.language_code,
+        model_size=args.model_size,
+        translator=create_translator(
+            args.use_translation, backend=args.translation_backend, cache_path=args.translation_cache
+        ),
+        toxicity_threshold=args.toxicity_threshold,
+        pitch_backend=args.pitch_backend,
+        window_seconds=args.window_seconds,
+        hop_seconds=args.hop_seconds,
+        latency_budget=args.latency_budget,
+        emit_all_segments=args.all_segments,
+        text_backend=args.text_backend,
+        transcription_engine=args.whisper_engine,
+        tone_baseline=args.tone_baseline == "recording"
+    )
+    log("Listening...")
+
+    events_file = sys.stdout if args.events == "-" else open(args.events, "a", encoding="utf-8")
+    try:
+        report = run_live(monitor, resample_blocks(blocks), events_file)
+    finally:
+        if events_file is not sys.stdout:
+            events_file.close()
+    log(format_latency_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,23 +5,51 @@ import json
 import os
 from pathlib import Path
 import tempfile
-from typing import List, Dict
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, List, Dict, Optional
 
 # --- Import your modules/functions ---
 # Adjust these imports to match your actual file/module names:
-from scripts.preprocess import maybe_preprocess_audio, preprocess_audio
-from scripts.analyze_text_english import analyze_english_text
-from scripts.analyze_text_hebrew import analyze_hebrew_text
-from scripts.transcribe import transcribe_audio_file
-from scripts.analyze_tone import analyze_audio_tone
-
-# For translation to English, if you want to also analyze the text in English
-# (You can also do direct Hebrew-only analysis if you prefer)
-try:
-    from googletrans import Translator
-except ImportError:
-    print("Please install googletrans if you need translation: pip install googletrans==4.0.0-rc1")
-    Translator = None
+from scripts.preprocess import ensure_audio_buffer, maybe_preprocess_audio, preprocess_audio, get_audio_duration
+from scripts.analyze_text_english import analyze_english_texts
+from scripts.analyze_text_hebrew import analyze_hebrew_texts
+from scripts.batching import DEFAULT_BATCH_SIZE
+from scripts.transcribe import (
+    DEFAULT_TRANSCRIPTION_ENGINE, TRANSCRIPTION_ENGINES, iter_transcribed_segments, transcribe_audio_file
+)
+from scripts.analyze_tone import maybe_compute_tone_features
+from scripts.pitch import DEFAULT_PITCH_BACKEND, PITCH_BACKENDS
+from scripts.text_backends import DEFAULT_TEXT_BACKEND, TEXT_BACKENDS
+from scripts.vad import SpeechIndex, detect_speech_regions
+from scripts.cache import ArtifactCache
+from scripts.noise_profile import NOISE_PROFILE_FILE, NoiseProfileStore
+from scripts.decision import is_segment_problematic
+from scripts.cascade import (
+    CASCADE_POLICIES, DEFAULT_CASCADE_POLICY, add_cascade_stats, analyze_segments_cascade,
+    complete_deferred_analyses, format_cascade_stats, new_cascade_stats
+)
+from scripts.metrics import (
+    METRICS_FILE, PROFILERS, MetricsCollector, format_metrics, get_collector, merge_metrics, set_collector
+)
+from scripts.models import format_model_stats, model_stats
+from scripts.pipeline import PipelineStage
+from scripts.reanalyze import analysis_fingerprints, reanalyze_results
+from scripts.scheduler import STAGE_TASKS_BY_NAME, enqueue_recording, format_queue_counts
+from scripts.task_queue import SQLiteTaskQueue
+from scripts.search_index import INDEX_FILE, SearchIndex, iter_results_files, recording_room
+from scripts.results import (
+    ANALYSIS_CHUNK_SEGMENTS, LEGACY_RESULTS_FILE, RESULTS_FILE,
+    ResultsWriter, export_legacy_json, read_results_header, results_fingerprint
+)
+from scripts.translate import (
+    DEFAULT_TRANSLATION_BACKEND, TRANSLATION_BACKENDS, TRANSLATION_CACHE_FILE,
+    create_text_translator, format_translation_stats
+)
+from scripts.tone_baseline import (
+    DEFAULT_TONE_BASELINE_MODE, TONE_BASELINE_FILE, TONE_BASELINE_MODES, ToneBaselineStore, resolve_tone_baseline
+)
+from common.consts import TOXICITY_THRESHOLD
 
 
 def chunk_transcript_with_timestamps(transcript_data: Dict) -> List[Dict]:
@@ -29,24 +57,65 @@ def chunk_transcript_with_timestamps(transcript_data: Dict) -> List[Dict]:
     Given Whisper's transcription output, return a list of segments with
     start/end timestamps and text for each segment.
     
-    :param transcript_data: The full dictionary returned by Whisper,
-                           which usually contains a "segments" list.
+    :param transcript_data: The dictionary returned by `transcribe_audio_file` (or Whisper),
+                           which contains a "segments" list or SegmentStore.
     :return: A list of dicts like [
-              { "start": float, "end": float, "text": str },
+              { "start": float, "end": float, "text": str,
+                "avg_logprob": float, "no_speech_prob": float },
               ...
             ]
     """
     segments = transcript_data.get("segments", [])
     results = []
     for seg in segments:
-        results.append({
+        result = {
             "start": seg["start"],
             "end": seg["end"],
             "text": seg["text"].strip()
-        })
+        }
+        # Whisper's confidence for the segment, when available
+        for field in ("avg_logprob", "no_speech_prob"):
+            if field in seg:
+                result[field] = seg[field]
+        results.append(result)
     return results
 
 
+def analyze_segments_text(
+    texts: List[str],
+    translator=None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    text_backend: str = DEFAULT_TEXT_BACKEND
+) -> List[Dict]:
+    """
+    Analyze the Hebrew text of many segments at once. Optionally translate to English
+    and analyze again. The text models run in batches rather than once per segment.
+    
+    :param texts: The Hebrew texts to analyze (one per segment).
+    :param translator: An optional TextTranslator (scripts/translate.py) for translating to English.
+    :param batch_size: Number of segments per model forward pass.
+    :param text_backend: Inference backend of the text models (see scripts/text_backends.py).
+    :return: One dict per text with results from Hebrew analysis and (optionally) English analysis.
+    """
+    # 1) Hebrew analysis
+    hebrew_results = analyze_hebrew_texts(texts, batch_size=batch_size, backend=text_backend)
+
+    # 2) Optional: If we want English-based analysis as well, we can translate:
+    english_results = [{} for _ in texts]
+    if translator:
+        english_texts = translator.translate_texts(texts, batch_size=batch_size)
+        english_results = analyze_english_texts(english_texts, batch_size=batch_size, backend=text_backend)
+
+    # Combine results
+    return [
+        {
+            "hebrew_analysis": hebrew_result,
+            "english_analysis": english_result,
+        }
+        for hebrew_result, english_result in zip(hebrew_results, english_results)
+    ]
+
+
 def analyze_segment_text(
     text: str, 
     translator=None
@@ -56,73 +125,959 @@ def analyze_segment_text(
     Returns a dictionary with Hebrew + English analysis results.
     
     :param text: The Hebrew text to analyze.
-    :param translator: An optional Translator instance for translating to English.
+    :param translator: An optional TextTranslator (scripts/translate.py) for translating to English.
     :return: A dict with results from Hebrew analysis and (optionally) English analysis.
     """
-    # 1) Hebrew analysis
-    hebrew_result = analyze_hebrew_text(text)
+    return analyze_segments_text([text], translator=translator)[0]
 
-    # 2) Optional: If we want English-based analysis as well, we can translate:
-    english_result = {}
-    if translator:
-        translation_obj = translator.translate(text, src="he", dest="en")
-        english_text = translation_obj.text
-        english_result = analyze_english_text(english_text)
 
-    # Combine results
+def analyze_segment(
+    seg: Dict,
+    seg_analysis: Dict,
+    tone_features,
+    toxicity_threshold: float = TOXICITY_THRESHOLD
+) -> Dict:
+    """
+    Combines a segment with its text analysis and the tone over its time range,
+    and decides whether it is problematic.
+
+    :param seg: A segment from `chunk_transcript_with_timestamps`.
+    :param seg_analysis: The segment's entry from `analyze_segments_text`.
+    :param tone_features: The recording's ToneFeatures (scripts/analyze_tone.py).
+    :param toxicity_threshold: Threshold passed to `is_segment_problematic`.
+    :return: The segment's record in results.jsonl (see scripts/results.py).
+    """
+    # Tone over the segment's own time range (whole recording for the untimed fallback)
+    seg_end = seg["end"] if seg["end"] > seg["start"] else None
+    seg_tone = tone_features.stats(seg["start"], seg_end)
+
+    # Decide if the segment is "problematic"
+    problem_flag = is_segment_problematic(seg_analysis, seg_tone, toxicity_threshold=toxicity_threshold)
+
     return {
-        "hebrew_analysis": hebrew_result,
-        "english_analysis": english_result,
+        "start": seg["start"],
+        "end": seg["end"],
+        "text": seg["text"],
+        "avg_logprob": seg.get("avg_logprob"),
+        "no_speech_prob": seg.get("no_speech_prob"),
+        "text_analysis": seg_analysis,
+        "tone_analysis": seg_tone,
+        "problematic": problem_flag
     }
 
 
-def is_segment_problematic(seg_analysis: Dict, tone_analysis: Dict) -> bool:
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".aac", ".wma")
+
+
+def collect_input_files(input_dir: Optional[str] = None, manifest: Optional[str] = None) -> List[str]:
     """
-    Decide if a segment is "problematic" based on text or tone features.
-    This is a simple example. You can refine your conditions/thresholds.
-    
-    :param seg_analysis: Dict from analyze_segment_text.
-    :param tone_analysis: Dict from analyze_audio_tone (for the chunk).
-    :return: True if flagged as problematic, else False.
-    """
-    # 1) Check Hebrew keywords
-    if seg_analysis["hebrew_analysis"]["found_keywords"]:
-        return True
-
-    # 3) Check English (if used)
-    if "english_analysis" in seg_analysis:
-        # Found keywords?
-        if seg_analysis["english_analysis"].get("found_keywords"):
-            return True
-        # Toxic?
-        if (seg_analysis["english_analysis"].get("toxicity_label") == "toxic" and
-            seg_analysis["english_analysis"].get("toxicity_score", 0) > 0.5):
-            return True
-
-    # 4) Check volume/pitch from tone analysis
-    # Example thresholds for "loud" or "high pitch"
-    if tone_analysis["tone_flags"]["loud"] or tone_analysis["tone_flags"]["high_pitch"]:
-        # This might or might not be considered problematic. 
-        # You can refine the logic as needed.
-        return True
-    
-    # If none of the above conditions are triggered, consider it not problematic
-    return False
+    Collect the recordings to process in batch mode.
+
+    :param input_dir: A directory scanned (recursively) for audio files.
+    :param manifest: A text file with one recording path per line. Relative paths are
+                     resolved against the manifest's directory; blank lines and lines
+                     starting with '#' are ignored.
+    :return: A de-duplicated list of recording paths.
+    """
+    input_files = []
+    if input_dir:
+        for root, _, files in os.walk(input_dir):
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    input_files.append(os.path.join(root, name))
+    if manifest:
+        manifest_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if not os.path.isabs(line):
+                    line = os.path.join(manifest_dir, line)
+                input_files.append(line)
+
+    # Keep the first occurrence of each file
+    seen = set()
+    unique_files = []
+    for path in input_files:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique_files.append(path)
+    return unique_files
+
+
+def get_recording_output_path(input_file: str, output_root: str) -> str:
+    """
+    Returns the per-recording output directory: <output_root>/<input file name without extension>.
+    """
+    input_file_name = os.path.basename(input_file)
+    stripped_input_file_name = input_file_name[:input_file_name.find('.')] if input_file_name.find('.') != -1 else input_file_name
+    return os.path.join(output_root, stripped_input_file_name)
+
+
+def create_translator(
+    use_translation: bool,
+    backend: str = DEFAULT_TRANSLATION_BACKEND,
+    cache_path: Optional[str] = None
+):
+    """
+    Returns a TextTranslator if translation is requested, else None.
+
+    :param use_translation: Whether to translate Hebrew to English.
+    :param backend: Translation backend (see scripts/translate.py).
+    :param cache_path: SQLite file of the persistent translation cache (None disables it).
+    """
+    if not use_translation:
+        return None
+    return create_text_translator(backend, cache_path=cache_path)
+
+
+def transcribe_and_analyze_pipelined(
+    processed_path: str,
+    output_path: str,
+    language_code: str = "he",
+    model_size: str = "medium",
+    translator=None,
+    cache: Optional[ArtifactCache] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    pitch_backend: str = DEFAULT_PITCH_BACKEND,
+    speech_index=None,
+    audio_seconds: Optional[float] = None,
+    text_backend: str = DEFAULT_TEXT_BACKEND,
+    transcription_engine: str = DEFAULT_TRANSCRIPTION_ENGINE,
+    transcribe_workers: Optional[int] = None,
+    cascade_policy: str = DEFAULT_CASCADE_POLICY,
+    cascade_stats: Optional[Dict] = None,
+    audio_buffer=None
+):
+    """
+    Pipeline mode of the transcription, tone and text steps of `process_recording`.
+
+    Whisper transcribes the audio one 30-second window at a time; the segments of each
+    window flow through a bounded queue into a text-analysis thread, while a third
+    thread computes the tone features. The wall-clock time is then roughly that of
+    the slowest stage rather than the sum of all of them.
+
+    :param audio_seconds: Duration of the recording, for the stage metrics (scripts/metrics.py).
+    :param text_backend: Inference backend of the text models (see scripts/text_backends.py).
+    :param transcription_engine: Whisper engine (see scripts/transcribe.py).
+    :param transcribe_workers: Worker processes of the "chunked" engine.
+    :param cascade_policy: See scripts/cascade.py. The tone is computed concurrently, so here
+                           only keywords let the cascade skip models.
+    :param cascade_stats: Counters (scripts/cascade.py) to add the model invocations to.
+    :param audio_buffer: The canonical AudioBuffer of `processed_path` (scripts/audio_buffer.py),
+                         shared by the transcription and tone threads instead of each decoding the file.
+    :return: (segments, segment_analyses, tone_features), as produced by the sequential steps.
+    """
+    metrics = get_collector()
+
+    def analyze_window(window_segments):
+        segs = chunk_transcript_with_timestamps({"segments": window_segments})
+        with metrics.stage("text", items=len(segs)):
+            return segs, analyze_segments_cascade(
+                segs, translator=translator, batch_size=batch_size, text_backend=text_backend,
+                policy=cascade_policy, stats=cascade_stats
+            )
+
+    def compute_tone(path):
+        with metrics.stage("tone", audio_seconds=audio_seconds):
+            return maybe_compute_tone_features(
+                path, os.path.join(output_path, "tone_features.npz"), cache=cache,
+                pitch_backend=pitch_backend,
+                speech_index=speech_index,
+                audio_buffer=audio_buffer
+            )
+
+    start_time = time.perf_counter()
+    tone_stage = PipelineStage("tone", [processed_path], fn=compute_tone)
+    transcribe_stage = PipelineStage("transcribe", iter_transcribed_segments(
+        processed_path,
+        language_code=language_code,
+        model_size=model_size,
+        output_path=output_path,
+        cache=cache,
+        speech_index=speech_index,
+        engine=transcription_engine,
+        num_workers=transcribe_workers,
+        audio_buffer=audio_buffer
+    ))
+    text_stage = PipelineStage("text", transcribe_stage, fn=analyze_window)
+    stages = [tone_stage, transcribe_stage, text_stage]
+    for stage in stages:
+        stage.start()
+
+    segments = []
+    segment_analyses = []
+    for window_segments, window_analyses in text_stage.results():
+        segments.extend(window_segments)
+        segment_analyses.extend(window_analyses)
+        print(f"Analyzed {len(segments)} segments so far...")
+    tone_features = list(tone_stage.results())[0]
+
+    wall_seconds = time.perf_counter() - start_time
+    # Whisper's share of the pipeline (its busy time, not the pipeline's wall-clock time)
+    metrics.record("transcribe", transcribe_stage.busy_seconds, audio_seconds=audio_seconds, items=len(segments))
+    print("Pipeline stage times: "
+          + ", ".join(f"{stage.name} {stage.busy_seconds:.1f}s" for stage in stages)
+          + f"; wall-clock {wall_seconds:.1f}s")
+    return segments, segment_analyses, tone_features
+
+
+def preprocess_recording(
+    input_file: str,
+    output_root: str,
+    cache: Optional[ArtifactCache] = None,
+    use_vad: bool = False,
+    noise_profile: bool = False,
+    noise_profile_path: Optional[str] = None,
+    audio_seconds: Optional[float] = None
+):
+    """
+    Step 1 of `process_recording`: preprocesses the recording into its output directory
+    (processed.wav and its canonical buffer) and, with `use_vad`, saves its speech regions
+    to vad.json.
+
+    :return: (processed_path, audio_buffer, speech_index); speech_index is None without VAD.
+    """
+    output_path = get_recording_output_path(input_file, output_root)
+    metrics = get_collector()
+
+    # 1) Preprocess audio (noise reduction, mono, etc.). Later stages read the canonical
+    #    16 kHz buffer written next to processed.wav, memory-mapped, instead of decoding it.
+    print("Preprocessing audio...")
+    processed_path = os.path.join(output_path, f"processed.wav")
+    noise_profiles = None
+    room = recording_room(input_file)
+    if noise_profile and room is None:
+        # A shared "unknown" profile would gate unrelated microphones against each other
+        print(f"The room of '{input_file}' is unknown; using adaptive noise reduction without a stored profile.")
+    elif noise_profile:
+        noise_profiles = NoiseProfileStore(noise_profile_path or os.path.join(output_root, NOISE_PROFILE_FILE))
+    with metrics.stage("preprocess", audio_seconds=audio_seconds):
+        try:
+            _ = maybe_preprocess_audio(
+                input_file, processed_path, cache=cache, noise_profiles=noise_profiles, room=room
+            )
+        finally:
+            if noise_profiles is not None:
+                noise_profiles.close()
+        audio_buffer = ensure_audio_buffer(processed_path)
+
+    # 1b) Optional: find the speech regions, so later stages can skip silence and noise
+    speech_index = None
+    if use_vad:
+        print("Detecting speech regions...")
+        with metrics.stage("vad", audio_seconds=audio_seconds):
+            speech_index = detect_speech_regions(
+                processed_path, os.path.join(output_path, "vad.json"), audio_buffer=audio_buffer
+            )
+        print(f"Found {len(speech_index.regions)} speech regions; "
+              f"skipping {speech_index.skipped_fraction:.1%} of the audio.")
+    return processed_path, audio_buffer, speech_index
+
+
+def load_preprocessed_recording(output_path: str, use_vad: bool = False):
+    """
+    The result of `preprocess_recording` from a recording's output directory, for
+    stages that run after it in another process (see scripts/scheduler.py).
+
+    :return: (processed_path, audio_buffer, speech_index), as from `preprocess_recording`.
+    """
+    processed_path = os.path.join(output_path, "processed.wav")
+    audio_buffer = ensure_audio_buffer(processed_path)
+    speech_index = SpeechIndex.load(os.path.join(output_path, "vad.json")) if use_vad else None
+    return processed_path, audio_buffer, speech_index
+
+
+def process_recording(
+    input_file: str,
+    output_root: str,
+    language_code: str = "he",
+    model_size: str = "medium",
+    translator=None,
+    cache: Optional[ArtifactCache] = None,
+    toxicity_threshold: float = TOXICITY_THRESHOLD,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    pitch_backend: str = DEFAULT_PITCH_BACKEND,
+    use_vad: bool = False,
+    pipeline: bool = False,
+    resume: bool = False,
+    legacy_json: bool = False,
+    text_backend: str = DEFAULT_TEXT_BACKEND,
+    transcription_engine: str = DEFAULT_TRANSCRIPTION_ENGINE,
+    transcribe_workers: Optional[int] = None,
+    cascade_policy: str = DEFAULT_CASCADE_POLICY,
+    tone_baseline: str = DEFAULT_TONE_BASELINE_MODE,
+    tone_baseline_path: Optional[str] = None,
+    noise_profile: bool = False,
+    noise_profile_path: Optional[str] = None,
+    preprocessed: bool = False
+) -> Dict:
+    """
+    Run the full pipeline (preprocess, transcribe, tone and text analysis) on one recording
+    and save the results to <output_root>/<recording name>/results.jsonl, one line per
+    segment, flushed as each segment is analyzed (see scripts/results.py).
+
+    :param input_file: Path to the input recording.
+    :param output_root: Directory under which the per-recording output directory is created.
+    :param language_code: Language code for transcription.
+    :param model_size: Whisper model size.
+    :param translator: An optional TextTranslator (scripts/translate.py) for translating to English.
+    :param cache: Artifact cache for the preprocess/transcribe/tone stages. When the input
+                  audio and stage settings are unchanged, those stages are skipped.
+    :param toxicity_threshold: Threshold passed to `is_segment_problematic`.
+    :param batch_size: Number of segments per text-model forward pass.
+    :param pitch_backend: Pitch tracker used for tone analysis (see scripts/pitch.py).
+    :param use_vad: Detect speech regions after preprocessing and run transcription and
+                    pitch tracking only over them (see scripts/vad.py).
+    :param pipeline: Run transcription, tone and text analysis concurrently
+                     (see `transcribe_and_analyze_pipelined`).
+    :param resume: Keep the segments of a partial results.jsonl from an interrupted run
+                   with the same transcript and settings, and only analyze the rest.
+                   (In pipeline mode the text is analyzed before writing, so there is
+                   nothing to skip and the file is rewritten.)
+    :param legacy_json: Also export the segments as an indented results.json array.
+    :param text_backend: Inference backend of the text models: fp32 PyTorch, INT8 PyTorch
+                         or ONNX Runtime (see scripts/text_backends.py).
+    :param transcription_engine: Whisper engine: openai-whisper, faster-whisper, or chunks
+                                 transcribed in parallel processes (see scripts/transcribe.py).
+    :param transcribe_workers: Worker processes of the "chunked" engine (default: half the cores).
+    :param cascade_policy: Whether the text models (and translation) still run on segments that
+                           keywords or tone already flag: "full", "skip" or "defer" (see scripts/cascade.py).
+    :param tone_baseline: What tone flags are relative to: "fixed" thresholds, the recording's own
+                          RMS/pitch distribution, or its room's, persisted across days (see scripts/tone_baseline.py).
+                          "room" falls back to "recording" when the room cannot be told from the path.
+    :param tone_baseline_path: SQLite file of the room baselines (default: <output_root>/tone_baselines.sqlite).
+    :param noise_profile: Denoise with the room's stored stationary noise profile (vectorised spectral
+                          gating), falling back to adaptive noise reduction when it is missing or stale,
+                          or when the recording's room cannot be told from its path (see scripts/noise_profile.py).
+    :param noise_profile_path: SQLite file of the noise profiles (default: <output_root>/noise_profiles.sqlite).
+    :param preprocessed: Step 1 already ran, e.g. as a separate task (see scripts/scheduler.py):
+                         reuse processed.wav, its buffer and vad.json from the output directory.
+    :return: A summary dict with the output path, segment counts and audio duration.
+    """
+    output_path = get_recording_output_path(input_file, output_root)
+    Path(output_path).mkdir(parents=True, exist_ok=True)
+    print(f"Saving files to {output_path}")
+    audio_seconds = get_audio_duration(input_file)
+    cascade_stats = new_cascade_stats()
+    # Per-stage timings, when enabled (see scripts/metrics.py)
+    metrics = get_collector()
+
+    # 1) Preprocess audio (noise reduction, mono, etc.), and optionally find the speech regions
+    if preprocessed:
+        processed_path, audio_buffer, speech_index = load_preprocessed_recording(output_path, use_vad=use_vad)
+    else:
+        processed_path, audio_buffer, speech_index = preprocess_recording(
+            input_file, output_root, cache=cache, use_vad=use_vad, noise_profile=noise_profile,
+            noise_profile_path=noise_profile_path, audio_seconds=audio_seconds
+        )
+
+    if pipeline:
+        # 2-5) Transcription, tone and text analysis, overlapped
+        print("Transcribing, analyzing tone and analyzing text concurrently...")
+        segments, segment_analyses, tone_features = transcribe_and_analyze_pipelined(
+            processed_path,
+            output_path,
+            language_code=language_code,
+            model_size=model_size,
+            translator=translator,
+            cache=cache,
+            batch_size=batch_size,
+            pitch_backend=pitch_backend,
+            speech_index=speech_index,
+            audio_seconds=audio_seconds,
+            text_backend=text_backend,
+            transcription_engine=transcription_engine,
+            transcribe_workers=transcribe_workers,
+            cascade_policy=cascade_policy,
+            cascade_stats=cascade_stats,
+            audio_buffer=audio_buffer
+        )
+    else:
+        # 2) Transcribe the processed audio with Whisper
+        print("Transcribing audio with Whisper...")
+        with metrics.stage("transcribe", audio_seconds=audio_seconds) as transcribe_info:
+            transcript_data = transcribe_audio_file(
+                processed_path, 
+                language_code=language_code, 
+                model_size=model_size,
+                output_path=output_path,
+                cache=cache,
+                speech_index=speech_index,
+                engine=transcription_engine,
+                num_workers=transcribe_workers,
+                audio_buffer=audio_buffer
+            )
+        # transcript_data is a dict with {"text": "...", "segments": SegmentStore},
+        # where the segments are loaded from segments.npz on first use.
+
+        # 3) Break down transcript into segments (with timestamps)
+        segments = []
+        if isinstance(transcript_data, dict) and "segments" in transcript_data:
+            # Whisper's timed segments, persisted by transcribe_audio_file
+            segments = chunk_transcript_with_timestamps(transcript_data)
+        else:
+            # Fallback: if you only got text, treat everything as one segment with no timestamps
+            segments = [{"start": 0.0, "end": 0.0, "text": transcript_data}]
+        transcribe_info["items"] = len(segments)
+
+        # 4) Analyze TONE: frame-level loudness and pitch are computed once for the whole
+        #    audio; per-segment tone is then a cheap slice of those frames.
+        print("Analyzing tone...")
+        with metrics.stage("tone", audio_seconds=audio_seconds):
+            tone_features = maybe_compute_tone_features(
+                processed_path, os.path.join(output_path, "tone_features.npz"), cache=cache,
+                pitch_backend=pitch_backend,
+                speech_index=speech_index,
+                audio_buffer=audio_buffer
+            )
+
+        segment_analyses = None
+
+    # 4b) Optional: judge the tone against what is usual for this recording (or room)
+    #     instead of fixed thresholds. The baseline is set before any segment is judged.
+    baseline = None
+    if tone_baseline != "fixed":
+        mode = tone_baseline
+        room = None
+        store = None
+        if tone_baseline == "room":
+            room = recording_room(input_file)
+            if room is None:
+                # A shared "unknown" baseline would mix unrelated rooms across days
+                print(f"The room of '{input_file}' is unknown; judging its tone against the recording itself.")
+                mode = "recording"
+            else:
+                store = ToneBaselineStore(tone_baseline_path or os.path.join(output_root, TONE_BASELINE_FILE))
+        try:
+            baseline = resolve_tone_baseline(
+                tone_features, mode, room=room, store=store, recording=os.path.abspath(input_file)
+            )
+        finally:
+            if store is not None:
+                store.close()
+        if baseline is None:
+            print("Too little audio for a tone baseline; using the fixed tone thresholds.")
+        tone_features.baseline = baseline
+
+    # 5) Open the results file. The global tone is stored once, in its header; each
+    #    segment line only holds the tone of its own time range.
+    settings = {
+        "language_code": language_code,
+        "model_size": model_size,
+        "transcription_engine": transcription_engine,
+        "pitch_backend": pitch_backend,
+        "text_backend": text_backend,
+        "use_vad": use_vad,
+        "noise_profile": noise_profile,
+        "toxicity_threshold": toxicity_threshold,
+        "cascade_policy": cascade_policy,
+        "tone_baseline": tone_baseline,
+        "translation": getattr(translator, "backend", "custom") if translator else None,
+    }
+    results_path = os.path.join(output_path, RESULTS_FILE)
+    writer = ResultsWriter(
+        results_path,
+        header={
+            "input": input_file,
+            "fingerprint": results_fingerprint(segments, settings),
+            "settings": settings,
+            "num_segments": len(segments),
+            "global_tone": tone_features.stats(),
+            "tone_baseline": baseline.summary() if baseline is not None else None,
+            "analysis_fingerprints": analysis_fingerprints(toxicity_threshold),
+        },
+        resume=resume and not pipeline
+    )
+    if writer.num_written:
+        print(f"Resuming: {writer.num_written} of {len(segments)} segments were already analyzed.")
+
+    # 6) Analyze each segment's text (Hebrew, plus English if translation is used) and
+    #    write the segments as they are done
+    print(f"Analyzing segments for text-based problems (writing {results_path})...")
+    num_deferred = 0
+    for chunk_start in range(writer.num_written, len(segments), ANALYSIS_CHUNK_SEGMENTS):
+        chunk = segments[chunk_start:chunk_start + ANALYSIS_CHUNK_SEGMENTS]
+        if segment_analyses is not None:
+            chunk_analyses = segment_analyses[chunk_start:chunk_start + ANALYSIS_CHUNK_SEGMENTS]
+        else:
+            with metrics.stage("text", items=len(chunk)):
+                chunk_analyses = analyze_segments_cascade(
+                    chunk, tone_features, translator=translator, batch_size=batch_size,
+                    text_backend=text_backend, policy=cascade_policy, stats=cascade_stats
+                )
+        num_deferred += sum(1 for analysis in chunk_analyses if analysis.get("cascade", {}).get("deferred"))
+        with metrics.stage("write_results", items=len(chunk)):
+            for seg, seg_analysis in zip(chunk, chunk_analyses):
+                writer.write_segment(
+                    analyze_segment(seg, seg_analysis, tone_features, toxicity_threshold=toxicity_threshold)
+                )
+    writer.close({"cascade": cascade_stats, "num_deferred": num_deferred})
+    num_problems = writer.num_problematic
+
+    # 7) Print summary
+    print(f"\nTotal segments: {writer.num_written}")
+    print(f"Problematic segments: {num_problems}")
+    print(f"Model invocations ({cascade_policy}): {format_cascade_stats(cascade_stats)}")
+    if num_problems > 0:
+        print("First problematic segment example:")
+        first_problem = writer.first_problematic
+        print(json.dumps(first_problem, indent=2, ensure_ascii=False))
+
+    # 8) Optional: the single indented JSON array of older versions
+    if legacy_json:
+        print(f"\nExporting results to {output_path}/{LEGACY_RESULTS_FILE}...")
+        with metrics.stage("export_legacy_json", items=writer.num_written):
+            export_legacy_json(results_path, os.path.join(output_path, LEGACY_RESULTS_FILE))
+
+    print("Done.")
+    return {
+        "input": input_file,
+        "output_path": output_path,
+        "results_path": results_path,
+        "audio_seconds": audio_seconds,
+        "num_segments": writer.num_written,
+        "num_problematic": num_problems,
+        "vad_skipped_fraction": speech_index.skipped_fraction if speech_index is not None else 0.0,
+        "cascade_stats": cascade_stats,
+    }
+
+
+# Per-process state for batch workers. Each worker loads its models once in
+# `_init_batch_worker` and reuses them for every recording it is given.
+_WORKER_STATE = {}
+
+
+def _init_batch_worker(
+    use_translation: bool,
+    translation_backend: str = DEFAULT_TRANSLATION_BACKEND,
+    translation_cache_path: Optional[str] = None,
+    metrics: Optional[Dict] = None
+):
+    # Models are loaded lazily through scripts/models.py on first use, once per
+    # worker, so spawning a worker is cheap and unused models are never loaded.
+    _WORKER_STATE["translator"] = create_translator(
+        use_translation, backend=translation_backend, cache_path=translation_cache_path
+    )
+    _WORKER_STATE["metrics"] = metrics
+
+
+def _run_batch_item(input_file: str, output_root: str, options: Dict) -> Dict:
+    # With metrics enabled, every recording gets its own collector and metrics.json
+    metrics_options = _WORKER_STATE.get("metrics")
+    collector = None
+    if metrics_options is not None:
+        collector = set_collector(MetricsCollector(
+            profile_dir=get_recording_output_path(input_file, output_root), **metrics_options
+        ))
+    try:
+        summary = process_recording(
+            input_file,
+            output_root,
+            translator=_WORKER_STATE.get("translator"),
+            **options
+        )
+    finally:
+        set_collector(None)
+    summary["worker_pid"] = os.getpid()
+    summary["model_stats"] = model_stats()
+    translator = _WORKER_STATE.get("translator")
+    summary["translation_stats"] = dict(translator.stats) if translator is not None else None
+    if collector is not None:
+        summary["metrics"] = collector.to_dict()
+        collector.save(
+            os.path.join(summary["output_path"], METRICS_FILE),
+            extra={"input": input_file, "audio_seconds": summary["audio_seconds"]}
+        )
+    return summary
+
+
+def format_throughput(audio_seconds: float, wall_seconds: float) -> str:
+    """
+    Formats batch throughput as recording-hours processed per wall-clock hour.
+    """
+    if wall_seconds <= 0:
+        return "n/a"
+    return f"{audio_seconds / wall_seconds:.2f} recording-hours per wall-clock hour"
+
+
+def run_batch(
+    input_files: List[str],
+    output_root: str,
+    use_translation: bool = False,
+    num_workers: int = 1,
+    translation_backend: str = DEFAULT_TRANSLATION_BACKEND,
+    translation_cache_path: Optional[str] = None,
+    on_recording_done: Optional[Callable[[Dict], None]] = None,
+    metrics: Optional[Dict] = None,
+    **options
+) -> List[Dict]:
+    """
+    Process many recordings, loading each model once per worker process.
+
+    Files are scheduled longest-first so that a long recording does not end up
+    running alone at the end of the batch. A failing recording is reported and
+    skipped; it does not stop the rest of the batch.
+
+    :param input_files: Recordings to process.
+    :param output_root: Directory under which one output directory per recording is created.
+    :param use_translation: Whether to translate Hebrew to English and analyze it too.
+    :param num_workers: Number of worker processes (1 runs everything in this process).
+    :param translation_backend: Translation backend (see scripts/translate.py).
+    :param translation_cache_path: SQLite file of the translation cache shared by the workers.
+    :param on_recording_done: Called in this process with the summary of every recording
+                              as soon as it finishes (e.g. to update the search index).
+    :param metrics: Options of a MetricsCollector (scripts/metrics.py), e.g. {"profile_stage": None,
+                    "profiler": "cprofile"}, to write per-stage metrics for every recording and
+                    their totals to <output_root>/metrics.json. None disables metrics.
+    :param options: Keyword arguments passed to `process_recording` for every recording
+                    (language_code, model_size, cache, ...).
+    :return: The summaries of the recordings that were processed successfully.
+    """
+    input_files = sorted(input_files, key=lambda p: os.path.getsize(p) if os.path.exists(p) else 0, reverse=True)
+    summaries = []
+    failures = []
+    start_time = time.perf_counter()
+
+    if num_workers <= 1:
+        _init_batch_worker(use_translation, translation_backend, translation_cache_path, metrics)
+        for input_file in input_files:
+            try:
+                summaries.append(_run_batch_item(input_file, output_root, options))
+            except Exception as e:
+                print(f"Failed to process '{input_file}': {e}")
+                failures.append(input_file)
+                continue
+            if on_recording_done is not None:
+                on_recording_done(summaries[-1])
+    else:
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_batch_worker,
+            initargs=(use_translation, translation_backend, translation_cache_path, metrics)
+        ) as executor:
+            futures = {
+                executor.submit(_run_batch_item, input_file, output_root, options): input_file
+                for input_file in input_files
+            }
+            for future in as_completed(futures):
+                input_file = futures[future]
+                try:
+                    summaries.append(future.result())
+                except Exception as e:
+                    print(f"Failed to process '{input_file}': {e}")
+                    failures.append(input_file)
+                    continue
+                print(f"[{len(summaries) + len(failures)}/{len(input_files)}] Finished '{input_file}'")
+                if on_recording_done is not None:
+                    on_recording_done(summaries[-1])
+
+    wall_seconds = time.perf_counter() - start_time
+    audio_seconds = sum(s["audio_seconds"] for s in summaries)
+    print(f"\nProcessed {len(summaries)}/{len(input_files)} recordings "
+          f"({audio_seconds / 3600:.2f} recording-hours) in {wall_seconds / 3600:.2f} hours.")
+    print(f"Throughput: {format_throughput(audio_seconds, wall_seconds)}")
+    if options.get("use_vad") and audio_seconds > 0:
+        skipped_seconds = sum(s["vad_skipped_fraction"] * s["audio_seconds"] for s in summaries)
+        print(f"VAD skipped {skipped_seconds / audio_seconds:.1%} of the audio.")
+    if summaries:
+        cascade_totals = {}
+        for summary in summaries:
+            add_cascade_stats(cascade_totals, summary["cascade_stats"])
+        print(f"Model invocations: {format_cascade_stats(cascade_totals)}")
+    # Each worker loaded its models once; show what that cost
+    latest_stats = {}
+    latest_translation_stats = {}
+    for summary in summaries:
+        latest_stats[summary["worker_pid"]] = summary["model_stats"]
+        latest_translation_stats[summary["worker_pid"]] = summary["translation_stats"]
+    for pid, stats in latest_stats.items():
+        total_seconds = sum(s["load_seconds"] for s in stats.values())
+        print(f"Worker {pid}: {len(stats)} models loaded in {total_seconds:.1f}s")
+    # Translation counters accumulate per worker; add up the workers' latest values
+    worker_translation_stats = [s for s in latest_translation_stats.values() if s]
+    if worker_translation_stats:
+        totals = {key: sum(s[key] for s in worker_translation_stats) for key in worker_translation_stats[0]}
+        print(f"Translation: {format_translation_stats(totals)}")
+    if metrics is not None and summaries:
+        batch_metrics = merge_metrics(s["metrics"] for s in summaries)
+        batch_metrics.update({"wall_seconds": wall_seconds, "audio_seconds": audio_seconds,
+                              "num_recordings": len(summaries)})
+        metrics_path = os.path.join(output_root, METRICS_FILE)
+        with open(metrics_path, "w", encoding="utf-8") as f:
+            json.dump(batch_metrics, f, indent=2)
+        print(f"Stage metrics (all recordings, written to {metrics_path}):")
+        print(format_metrics(batch_metrics))
+    if failures:
+        print(f"Failed recordings ({len(failures)}):")
+        for input_file in failures:
+            print(f"  {input_file}")
+    return summaries
+
+
+def complete_deferred(
+    output_root: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    translation_cache_path: Optional[str] = None,
+    on_recording_done: Optional[Callable[[Dict], None]] = None
+) -> int:
+    """
+    Runs the model invocations deferred by the "defer" cascade policy (or by `reanalyze`)
+    in every results file under `output_root`, with the translation and text backends each recording
+    was analyzed with (from its header).
+
+    :param on_recording_done: Called with {"results_path": ...} for every updated file.
+    :return: The number of segments completed.
+    """
+    total = 0
+    for results_path in iter_results_files(output_root):
+        if not results_path.endswith(RESULTS_FILE):
+            continue
+        settings = read_results_header(results_path).get("settings", {})
+        # "skip" files too: --reanalyze defers the invocations a re-decision needs
+        if settings.get("cascade_policy") not in ("skip", "defer"):
+            continue
+        translation = settings.get("translation")
+        translator = create_translator(
+            translation in TRANSLATION_BACKENDS,
+            backend=translation if translation in TRANSLATION_BACKENDS else DEFAULT_TRANSLATION_BACKEND,
+            cache_path=translation_cache_path
+        )
+        try:
+            completed = complete_deferred_analyses(
+                results_path, translator=translator, batch_size=batch_size,
+                text_backend=settings.get("text_backend", DEFAULT_TEXT_BACKEND)
+            )
+        except ValueError as e:
+            print(f"Skipping: {e}")
+            continue
+        if completed:
+            print(f"Completed {completed} deferred segments in '{results_path}'.")
+            total += completed
+            if on_recording_done is not None:
+                on_recording_done({"results_path": results_path})
+    print(f"Completed {total} deferred segments in total.")
+    return total
+
+
+def reanalyze(
+    output_root: str,
+    toxicity_threshold: float = TOXICITY_THRESHOLD,
+    on_recording_done: Optional[Callable[[Dict], None]] = None
+) -> Dict:
+    """
+    Re-scores every results file under `output_root` after the keyword lists or
+    thresholds changed, from the stored segments, model outputs and tone stats
+    (see scripts/reanalyze.py). Files already up to date are skipped after reading
+    their header.
+
+    :param toxicity_threshold: Threshold passed to `is_segment_problematic`.
+    :param on_recording_done: Called with {"results_path": ...} for every updated file.
+    :return: Totals over all updated files.
+    """
+    fingerprints = analysis_fingerprints(toxicity_threshold)
+
+    def is_problematic(seg_analysis: Dict, tone_analysis: Dict) -> bool:
+        return is_segment_problematic(seg_analysis, tone_analysis, toxicity_threshold=toxicity_threshold)
+
+    totals = {"recordings": 0, "newly_problematic": 0, "no_longer_problematic": 0, "pending": 0}
+    for results_path in iter_results_files(output_root):
+        if not results_path.endswith(RESULTS_FILE):
+            continue
+        try:
+            stats = reanalyze_results(results_path, is_problematic, fingerprints,
+                                      toxicity_threshold=toxicity_threshold)
+        except ValueError as e:
+            print(f"Skipping: {e}")
+            continue
+        if stats is None:
+            continue
+        print(f"Reanalyzed '{results_path}' ({', '.join(stats['changed_parts']) or 'pending segments'}): "
+              f"+{stats['newly_problematic']} / -{stats['no_longer_problematic']} problematic")
+        totals["recordings"] += 1
+        for key in ("newly_problematic", "no_longer_problematic", "pending"):
+            totals[key] += stats[key]
+        if on_recording_done is not None:
+            on_recording_done({"results_path": results_path})
+    print(f"Reanalyzed {totals['recordings']} recordings: {totals['newly_problematic']} segments newly "
+          f"problematic, {totals['no_longer_problematic']} no longer problematic.")
+    if totals["pending"]:
+        print(f"{totals['pending']} segments lost an early cascade decision and need model invocations that "
+              f"were left out: run --complete_deferred, then --reanalyze again.")
+    return totals
+
+
+def enqueue_recordings(
+    queue,
+    input_files: List[str],
+    output_root: str,
+    cache: Optional[ArtifactCache],
+    use_translation: bool = False,
+    translation_backend: str = DEFAULT_TRANSLATION_BACKEND,
+    translation_cache_path: Optional[str] = None,
+    update_index: bool = False,
+    legacy_json: bool = False,
+    **options
+) -> int:
+    """
+    Adds the stages of every recording to a task queue (scripts/task_queue.py) instead of
+    processing them here; worker.py processes, on this or other machines, run them.
+    Enqueueing the same recordings with the same settings again adds nothing.
+
+    :param queue: A QueueBackend.
+    :param cache: The artifact cache, through which the stage tasks hand over their results
+                  (required; its directory must be visible to every worker under the same path).
+    :param update_index: Add each recording to <output_root>/search_index.sqlite when its report task runs.
+    :param options: Keyword arguments of `process_recording` (language_code, model_size, ...).
+                    Pipeline mode does not apply: the stages are separate tasks.
+    :return: The number of tasks added.
+    """
+    if cache is None:
+        raise ValueError("Queued stages hand their results over through the artifact cache; it cannot be disabled")
+    output_root = os.path.abspath(output_root)
+    options = {key: value for key, value in options.items() if key != "pipeline"}
+    # Workers may run in other directories (or on other machines): store absolute paths
+    options["cache_dir"] = os.path.abspath(cache.root)
+    for key in ("tone_baseline_path", "noise_profile_path"):
+        if options.get(key):
+            options[key] = os.path.abspath(options[key])
+    added = 0
+    for input_file in input_files:
+        input_file = os.path.abspath(input_file)
+        payload = {
+            "input": input_file,
+            "output_root": output_root,
+            "output_path": get_recording_output_path(input_file, output_root),
+            "options": options,
+            "translation": {
+                "use_translation": use_translation,
+                "translation_backend": translation_backend,
+                "translation_cache_path": os.path.abspath(translation_cache_path) if translation_cache_path else None,
+            },
+            "legacy_json": legacy_json,
+            "update_index": update_index,
+        }
+        # Longest first, as in run_batch
+        added += enqueue_recording(queue, payload, priority=os.path.getsize(input_file))
+    return added
+
+
+def run_stage_task(task) -> Dict:
+    """
+    Runs one stage task of a recording (see scripts/scheduler.py); the handler of worker.py.
+
+    Every stage is safe to run again: preprocess, transcribe and tone reuse their
+    artifact-cache entries, text rewrites results.jsonl from them, and report only exports
+    and indexes. So a retry after a crash, or a second worker finishing a task whose lease
+    expired, costs time but never corrupts the results.
+
+    :return: A small summary, stored as the task's result.
+    """
+    payload = task.payload
+    stage = STAGE_TASKS_BY_NAME[task.kind]
+    input_file, output_root, output_path = payload["input"], payload["output_root"], payload["output_path"]
+    options = dict(payload["options"])
+    cache = ArtifactCache(options.pop("cache_dir"))
+    missing = stage.missing(output_path, stage.inputs)
+    if missing:
+        raise FileNotFoundError(f"The {task.kind} stage of '{input_file}' is missing {', '.join(missing)}")
+    Path(output_path).mkdir(parents=True, exist_ok=True)
+
+    result = {}
+    if task.kind == "preprocess":
+        preprocess_recording(
+            input_file, output_root, cache=cache, use_vad=options["use_vad"],
+            noise_profile=options["noise_profile"], noise_profile_path=options["noise_profile_path"]
+        )
+    elif task.kind == "transcribe":
+        processed_path, audio_buffer, speech_index = load_preprocessed_recording(output_path, options["use_vad"])
+        transcribe_audio_file(
+            processed_path,
+            language_code=options["language_code"],
+            model_size=options["model_size"],
+            output_path=output_path,
+            cache=cache,
+            speech_index=speech_index,
+            engine=options["transcription_engine"],
+            num_workers=options["transcribe_workers"],
+            audio_buffer=audio_buffer
+        )
+    elif task.kind == "tone":
+        processed_path, audio_buffer, speech_index = load_preprocessed_recording(output_path, options["use_vad"])
+        maybe_compute_tone_features(
+            processed_path, os.path.join(output_path, "tone_features.npz"), cache=cache,
+            pitch_backend=options["pitch_backend"], speech_index=speech_index, audio_buffer=audio_buffer
+        )
+    elif task.kind == "text":
+        # Transcript and tone come from the cache entries of the tasks before
+        translation = payload["translation"]
+        if _WORKER_STATE.get("translation") != translation:
+            _init_batch_worker(**translation)
+            _WORKER_STATE["translation"] = translation
+        summary = process_recording(
+            input_file, output_root, translator=_WORKER_STATE["translator"], cache=cache, preprocessed=True, **options
+        )
+        result = {key: summary[key] for key in ("results_path", "audio_seconds", "num_segments", "num_problematic")}
+    elif task.kind == "report":
+        results_path = os.path.join(output_path, RESULTS_FILE)
+        if payload["legacy_json"]:
+            export_legacy_json(results_path, os.path.join(output_path, LEGACY_RESULTS_FILE))
+        if payload["update_index"]:
+            search_index = SearchIndex(os.path.join(output_root, INDEX_FILE))
+            try:
+                search_index.index_recording(results_path)
+            finally:
+                search_index.close()
+        result = {"results_path": results_path}
+
+    missing = stage.missing(output_path, stage.outputs)
+    if missing:
+        raise RuntimeError(f"The {task.kind} stage of '{input_file}' did not write {', '.join(missing)}")
+    return result
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Process and analyze a daycare audio recording."
+        description="Process and analyze daycare audio recordings."
     )
-    parser.add_argument(
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument(
         "--input", "-i",
-        required=True,
         help="Path to the input recording (e.g. recording.wav or recording.mp3)."
     )
+    input_group.add_argument(
+        "--input-dir",
+        dest="input_dir",
+        help="Directory of recordings to process in batch mode (searched recursively)."
+    )
+    input_group.add_argument(
+        "--manifest",
+        help="Text file listing one recording path per line, processed in batch mode."
+    )
+    input_group.add_argument(
+        "--complete_deferred",
+        action="store_true",
+        help="Instead of processing recordings, run the model invocations deferred by --cascade defer "
+             "in every results.jsonl under --output."
+    )
+    input_group.add_argument(
+        "--reanalyze",
+        action="store_true",
+        help="Instead of processing recordings, re-score every results.jsonl under --output with the current "
+             "keyword lists and thresholds (incl. --toxicity_threshold), from the stored model outputs."
+    )
+    parser.add_argument(
+        "--queue",
+        default=None,
+        help="Instead of processing the recordings here, add their stages (preprocess, transcribe, tone, text, "
+             "report) as tasks to this queue file (SQLite) for worker.py processes on this or other machines."
+    )
     parser.add_argument(
         "--output", "-o",
         required=True,
-        help="Path to the output JSON file where results will be saved."
+        help="Directory under which one output directory per recording is created."
     )
     parser.add_argument(
         "--language_code",
@@ -134,102 +1089,278 @@ def main():
         default="medium",
         help="Whisper model size to load (tiny, base, small, medium, large). Default=medium."
     )
+    parser.add_argument(
+        "--whisper_engine",
+        choices=TRANSCRIPTION_ENGINES,
+        default=DEFAULT_TRANSCRIPTION_ENGINE,
+        help="Transcription engine: openai (openai-whisper), faster-whisper (CTranslate2 INT8, needs "
+             "`pip install faster-whisper`) or chunked (split at silences, chunks transcribed in parallel "
+             f"processes). Default={DEFAULT_TRANSCRIPTION_ENGINE}."
+    )
+    parser.add_argument(
+        "--transcribe_workers",
+        type=int,
+        default=None,
+        help="Worker processes of the chunked engine, each with its own model. Default: half the CPU cores. "
+             "With --workers > 1, keep workers x transcribe_workers within the cores and memory available."
+    )
     parser.add_argument(
         "--use_translation",
         action="store_true",
         help="If specified, we also translate Hebrew to English and analyze the English text."
     )
+    parser.add_argument(
+        "--translation_backend",
+        choices=TRANSLATION_BACKENDS,
+        default=DEFAULT_TRANSLATION_BACKEND,
+        help="Translation backend: google (online, googletrans) or marian (offline MarianMT he->en model). "
+             f"Default={DEFAULT_TRANSLATION_BACKEND}."
+    )
+    parser.add_argument(
+        "--translation_cache",
+        default=None,
+        help=f"SQLite file caching translations across runs. Default: <cache_dir>/{TRANSLATION_CACHE_FILE} "
+             "(disabled by --no_cache)."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes in batch mode. Each worker loads the models once. Default=1."
+    )
+    parser.add_argument(
+        "--toxicity_threshold",
+        type=float,
+        default=TOXICITY_THRESHOLD,
+        help=f"English toxicity score above which a segment is flagged. Default={TOXICITY_THRESHOLD}."
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Number of segments per text-model forward pass. Default={DEFAULT_BATCH_SIZE}."
+    )
+    parser.add_argument(
+        "--pitch_backend",
+        choices=PITCH_BACKENDS,
+        default=DEFAULT_PITCH_BACKEND,
+        help="Pitch tracker for tone analysis: pyin (reference), pyin_gated (pyin on loud regions only) "
+             f"or yin (vectorised YIN on downsampled audio). Default={DEFAULT_PITCH_BACKEND}."
+    )
+    parser.add_argument(
+        "--text_backend",
+        choices=TEXT_BACKENDS,
+        default=DEFAULT_TEXT_BACKEND,
+        help="Inference backend of the text classifiers: torch (fp32), torch-int8 (dynamic quantisation), "
+             "onnx or onnx-int8 (ONNX Runtime, needs `pip install optimum[onnxruntime]`). Converted models are "
+             f"cached on disk. Default={DEFAULT_TEXT_BACKEND}."
+    )
+    parser.add_argument(
+        "--cascade",
+        choices=CASCADE_POLICIES,
+        default=DEFAULT_CASCADE_POLICY,
+        help="Text models on segments that keywords or tone already flag: full (run everything), skip "
+             "(run only what can still change the decision) or defer (like skip, and run the rest later "
+             f"with --complete_deferred). Default={DEFAULT_CASCADE_POLICY}."
+    )
+    parser.add_argument(
+        "--tone_baseline",
+        choices=TONE_BASELINE_MODES,
+        default=DEFAULT_TONE_BASELINE_MODE,
+        help="What loud/high-pitch tone is relative to: fixed thresholds, the recording's own loudness and "
+             "pitch distribution, or the room's, learned across recordings and days. "
+             f"Default={DEFAULT_TONE_BASELINE_MODE}."
+    )
+    parser.add_argument(
+        "--tone_baseline_db",
+        default=None,
+        help=f"SQLite file of the per-room tone baselines. Default: <output>/{TONE_BASELINE_FILE}."
+    )
+    parser.add_argument(
+        "--noise_profile",
+        action="store_true",
+        help="Denoise with the room's stored noise profile (fast stationary spectral gating) instead of "
+             "adaptive noise reduction; a missing or stale profile is re-estimated from the recording."
+    )
+    parser.add_argument(
+        "--noise_profile_db",
+        default=None,
+        help=f"SQLite file of the per-room noise profiles. Default: <output>/{NOISE_PROFILE_FILE}."
+    )
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="Detect speech regions after preprocessing and only transcribe/analyze those."
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Transcribe in 30-second windows and run tone and text analysis concurrently with transcription."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue a partially written results.jsonl of an interrupted run instead of starting over."
+    )
+    parser.add_argument(
+        "--legacy_json",
+        action="store_true",
+        help="Also write results.json, the indented JSON array of older versions."
+    )
+    parser.add_argument(
+        "--update_index",
+        action="store_true",
+        help=f"Add each finished recording to the search index <output>/{INDEX_FILE} (see search.py)."
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help=f"Record wall/CPU time, memory and throughput of every stage in <recording output>/{METRICS_FILE}."
+    )
+    parser.add_argument(
+        "--profile_stage",
+        default=None,
+        help="Profile this stage (e.g. transcribe, tone, hebrew_sentiment) and dump the profile next to "
+             "metrics.json. Implies --metrics."
+    )
+    parser.add_argument(
+        "--profiler",
+        choices=PROFILERS,
+        default="cprofile",
+        help="Profiler for --profile_stage: cprofile (profile_<stage>.prof) or pyinstrument "
+             "(HTML report, needs `pip install pyinstrument`). Default=cprofile."
+    )
+    parser.add_argument(
+        "--cache_dir",
+        default=None,
+        help="Directory of the artifact cache (processed audio, transcripts, tone). Default: <output>/.cache."
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Recompute every stage and do not store results in the artifact cache."
+    )
+    parser.add_argument(
+        "--cache_max_gb",
+        type=float,
+        default=None,
+        help="After the run, evict least recently used cache entries until the cache fits in this many GB."
+    )
+    parser.add_argument(
+        "--cache_max_age_days",
+        type=float,
+        default=None,
+        help="After the run, evict cache entries not used for this many days."
+    )
     args = parser.parse_args()
 
-    input_file = args.input
-    output_path = args.output
-    language_code = args.language_code
-    model_size = args.model_size
-    use_translation = args.use_translation
+    cache = None
+    translation_cache_path = args.translation_cache
+    if not args.no_cache:
+        cache = ArtifactCache(args.cache_dir or os.path.join(args.output, ".cache"))
+        if translation_cache_path is None:
+            translation_cache_path = os.path.join(cache.root, TRANSLATION_CACHE_FILE)
 
-    input_file_name = input_file.split('/')[-1]
-    stripped_input_file_name = input_file_name.split('/')[-1][:input_file_name.find('.')] if input_file_name.find('.') != -1 else input_file_name
-    output_path = os.path.join(output_path, stripped_input_file_name)
-    Path(output_path).mkdir(parents=True, exist_ok=True)
-    print(f"Saving files to {output_path}")
-
-    # 1) Preprocess audio (noise reduction, mono, etc.)
-    print("Preprocessing audio...")
-    processed_path = os.path.join(output_path, f"processed.wav")
-    _ = maybe_preprocess_audio(input_file, processed_path)
+    # Settings applied to every recording (see process_recording)
+    options = {
+        "language_code": args.language_code,
+        "model_size": args.model_size,
+        "transcription_engine": args.whisper_engine,
+        "transcribe_workers": args.transcribe_workers,
+        "cache": cache,
+        "toxicity_threshold": args.toxicity_threshold,
+        "batch_size": args.batch_size,
+        "pitch_backend": args.pitch_backend,
+        "text_backend": args.text_backend,
+        "use_vad": args.vad,
+        "pipeline": args.pipeline,
+        "resume": args.resume,
+        "legacy_json": args.legacy_json,
+        "cascade_policy": args.cascade,
+        "tone_baseline": args.tone_baseline,
+        "tone_baseline_path": args.tone_baseline_db,
+        "noise_profile": args.noise_profile,
+        "noise_profile_path": args.noise_profile_db,
+    }
 
-    # 2) Transcribe the processed audio with Whisper
-    print("Transcribing audio with Whisper...")
-    transcript_data = transcribe_audio_file(
-        processed_path, 
-        language_code=language_code, 
-        model_size=model_size,
-        output_path=output_path
-    )
-    # transcript_data might be a dict with {"text": "...", "segments": [...]}
-    # if you used Whisper's "transcribe()" that returns segments.
+    metrics = None
+    if args.metrics or args.profile_stage:
+        metrics = {"profile_stage": args.profile_stage, "profiler": args.profiler}
 
-    # 3) Break down transcript into segments (with timestamps)
-    segments = []
-    if isinstance(transcript_data, dict) and "segments" in transcript_data:
-        # Whisper "transcribe" in Python typically returns segments in result["segments"]
-        segments = chunk_transcript_with_timestamps(transcript_data)
-    else:
-        # Fallback: if you only got text, treat everything as one segment with no timestamps
-        segments = [{"start": 0.0, "end": 0.0, "text": transcript_data}]
-
-    # 4) Analyze TONE for the entire audio (or for each chunk)
-    #    Typically, you might do a single global tone analysis 
-    #    or chunk your audio manually. Here we'll do a single global analysis.
-    #    If you want per-segment tone, you need to chunk the audio by time and re-run.
-    print("Analyzing tone (global)...")
-    tone_result = analyze_audio_tone(processed_path)
-
-    # 5) Prepare translator if needed
-    translator = None
-    if use_translation and Translator is not None:
-        translator = Translator()
-
-    # 6) Analyze each segment's text (Hebrew, plus English if translation is used)
-    print("Analyzing segments for text-based problems...")
-    analyzed_segments = []
-    for seg in segments:
-        seg_text = seg["text"]
-        seg_analysis = analyze_segment_text(seg_text, translator=translator)
+    if args.queue:
+        if args.complete_deferred or args.reanalyze:
+            parser.error("--queue takes recordings (--input, --input-dir or --manifest)")
+        if cache is None:
+            parser.error("--queue needs the artifact cache, through which the stages hand over their results")
+        input_files = [args.input] if args.input else collect_input_files(input_dir=args.input_dir,
+                                                                          manifest=args.manifest)
+        queue = SQLiteTaskQueue(args.queue)
+        try:
+            added = enqueue_recordings(
+                queue, input_files, args.output,
+                use_translation=args.use_translation,
+                translation_backend=args.translation_backend,
+                translation_cache_path=translation_cache_path,
+                update_index=args.update_index,
+                **options
+            )
+            print(f"Added {added} tasks for {len(input_files)} recordings to '{args.queue}' "
+                  f"({format_queue_counts(queue.counts())}). Run worker.py --queue {args.queue} to process them.")
+        finally:
+            queue.close()
+        return
 
-        # Decide if the segment is "problematic"
-        # We currently use the same "tone_result" for all segments 
-        # (since we didn't chunk the audio for tone). 
-        # In a more advanced approach, you'd chunk the audio in parallel with text segments.
-        problem_flag = is_segment_problematic(seg_analysis, tone_result)
+    # Finished recordings are added to the search index as they complete
+    search_index = SearchIndex(os.path.join(args.output, INDEX_FILE)) if args.update_index else None
 
-        analyzed_segments.append({
-            "start": seg["start"],
-            "end": seg["end"],
-            "text": seg_text,
-            "text_analysis": seg_analysis,
-            "tone_analysis": tone_result,
-            "problematic": problem_flag
-        })
-
-    # 7) Gather only problematic segments
-    problematic_segments = [seg for seg in analyzed_segments if seg["problematic"]]
-    num_problems = len(problematic_segments)
-
-    # 8) Print summary
-    print(f"\nTotal segments: {len(analyzed_segments)}")
-    print(f"Problematic segments: {num_problems}")
-    if num_problems > 0:
-        print("First problematic segment example:")
-        first_problem = problematic_segments[0]
-        print(json.dumps(first_problem, indent=2, ensure_ascii=False))
+    def index_recording(summary: Dict):
+        if search_index is not None:
+            search_index.index_recording(summary["results_path"])
 
-    # 9) Save entire segment list (including analysis) to JSON
-    print(f"\nSaving results to {output_path}/results.json...")
-    with open(os.path.join(output_path, 'results.json'), "w", encoding="utf-8") as f:
-        json.dump(analyzed_segments, f, indent=2, ensure_ascii=False)
+    try:
+        if args.complete_deferred:
+            complete_deferred(args.output, batch_size=args.batch_size, translation_cache_path=translation_cache_path,
+                              on_recording_done=index_recording)
+        elif args.reanalyze:
+            reanalyze(args.output, toxicity_threshold=args.toxicity_threshold, on_recording_done=index_recording)
+        elif args.input:
+            _init_batch_worker(args.use_translation, args.translation_backend, translation_cache_path, metrics)
+            summary = _run_batch_item(args.input, args.output, options)
+            index_recording(summary)
+            print("Models loaded:")
+            print(format_model_stats())
+            if summary["translation_stats"] is not None:
+                print(f"Translation: {format_translation_stats(summary['translation_stats'])}")
+            if "metrics" in summary:
+                print(f"Stage metrics (written to {os.path.join(summary['output_path'], METRICS_FILE)}):")
+                print(format_metrics(summary["metrics"]))
+        else:
+            input_files = collect_input_files(input_dir=args.input_dir, manifest=args.manifest)
+            if not input_files:
+                print("No recordings found.")
+                return
+            print(f"Found {len(input_files)} recordings; processing with {args.workers} worker(s).")
+            run_batch(
+                input_files,
+                args.output,
+                use_translation=args.use_translation,
+                num_workers=args.workers,
+                translation_backend=args.translation_backend,
+                translation_cache_path=translation_cache_path,
+                on_recording_done=index_recording,
+                metrics=metrics,
+                **options
+            )
+    finally:
+        if search_index is not None:
+            search_index.close()
 
-    print("Done.")
+    if cache is not None and (args.cache_max_gb is not None or args.cache_max_age_days is not None):
+        removed = cache.evict(
+            max_bytes=int(args.cache_max_gb * 1024 ** 3) if args.cache_max_gb is not None else None,
+            max_age_seconds=args.cache_max_age_days * 86400 if args.cache_max_age_days is not None else None
+        )
+        print(f"Evicted {len(removed)} cache entries ({sum(e['bytes'] for e in removed) / 1024 ** 2:.1f} MB).")
 
 
 if __name__ == "__main__":
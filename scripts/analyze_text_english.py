@@ -1,22 +1,112 @@
-import re
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-
-# Example list of English keywords/phrases to flag
-from common.consts import ENGLISH_KEYWORDS
-
-# 1) Load an English sentiment pipeline
-english_sentiment_pipeline = pipeline("sentiment-analysis")
-
-# 2) Load an English toxic/abusive classification model
-TOXIC_MODEL_NAME = "unitary/toxic-bert"
-toxic_tokenizer = AutoTokenizer.from_pretrained(TOXIC_MODEL_NAME)
-toxic_model = AutoModelForSequenceClassification.from_pretrained(TOXIC_MODEL_NAME)
-english_toxic_pipeline = pipeline(
-    "text-classification",
-    model=toxic_model,
-    tokenizer=toxic_tokenizer,
-    return_all_scores=True
-)
+from typing import List, Tuple
+
+from scripts.batching import DEFAULT_BATCH_SIZE, run_pipeline_batched, top_score
+from scripts.keywords import get_english_matcher
+from scripts.metrics import get_collector
+from scripts.text_backends import DEFAULT_TEXT_BACKEND, get_text_model
+
+# The English sentiment and toxicity models are loaded on first use through the
+# model registry (scripts/models.py), so they cost nothing unless English text is analyzed.
+def get_english_sentiment_pipeline(backend: str = DEFAULT_TEXT_BACKEND):
+    return get_text_model("english_sentiment", backend)
+
+
+def get_english_toxic_pipeline(backend: str = DEFAULT_TEXT_BACKEND):
+    return get_text_model("english_toxic", backend)
+
+
+def find_english_keywords(text: str) -> List[str]:
+    """
+    Returns the ENGLISH_KEYWORDS found in `text` (case-insensitive).
+    """
+    return get_english_matcher().found_keywords(text)
+
+
+def score_english_sentiment(
+    texts: List[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    backend: str = DEFAULT_TEXT_BACKEND
+) -> List[Tuple[str, float]]:
+    """
+    Runs the sentiment model over the texts in length-grouped batches.
+
+    :return: (top label, its score) per text.
+    """
+    # Each output is the top label, e.g. {"label": "NEGATIVE", "score": 0.99}
+    with get_collector().stage("english_sentiment", items=len(texts)):
+        sentiment_outputs = run_pipeline_batched(get_english_sentiment_pipeline(backend), texts, batch_size=batch_size)
+    return [top_score(output) for output in sentiment_outputs]
+
+
+def score_english_toxicity(
+    texts: List[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    backend: str = DEFAULT_TEXT_BACKEND
+) -> List[Tuple[str, float]]:
+    """
+    Runs the toxicity classifier over the texts in length-grouped batches.
+
+    :return: (top label, its score) per text.
+    """
+    # With return_all_scores=True each output is a list of all label scores, e.g.:
+    # [{"label": "toxic", "score": 0.7}, {"label": "insult", "score": 0.3}, ...]
+    # Some models have different or more granular labels. 
+    # We'll pick the label with the highest score.
+    with get_collector().stage("english_toxic", items=len(texts)):
+        toxicity_outputs = run_pipeline_batched(get_english_toxic_pipeline(backend), texts, batch_size=batch_size)
+    return [top_score(output) for output in toxicity_outputs]
+
+
+def analyze_english_texts(
+    texts: List[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    backend: str = DEFAULT_TEXT_BACKEND,
+    run_sentiment: bool = True,
+    run_toxicity: bool = True
+) -> List[dict]:
+    """
+    Batch version of `analyze_english_text`. The sentiment and toxicity models run
+    over the texts in batches of `batch_size`, grouped by token length to minimise padding.
+    
+    :param texts: The English texts to analyze (e.g. one per transcript segment).
+    :param batch_size: Number of texts per forward pass.
+    :param backend: Inference backend of the sentiment and toxicity models (see scripts/text_backends.py).
+    :param run_sentiment: Run the sentiment model (if False, its fields are None).
+    :param run_toxicity: Run the toxicity model (if False, its fields are None).
+    :return: One result dict per text, in the same order as `texts`.
+    """
+    # --- Sentiment Analysis (batched) ---
+    if run_sentiment:
+        sentiments = score_english_sentiment(texts, batch_size=batch_size, backend=backend)
+    else:
+        sentiments = [(None, None)] * len(texts)
+
+    # --- Toxic/Abusive Classification (batched) ---
+    if run_toxicity:
+        toxicities = score_english_toxicity(texts, batch_size=batch_size, backend=backend)
+    else:
+        toxicities = [(None, None)] * len(texts)
+
+    # --- Keyword Detection (one compiled pattern for the whole list) ---
+    matcher = get_english_matcher()
+    with get_collector().stage("english_keywords", items=len(texts)):
+        all_keyword_matches = [matcher.find(text) for text in texts]
+
+    results = []
+    for text, (sentiment_label, sentiment_score), (top_toxic_label, top_toxic_score), keyword_matches in zip(
+        texts, sentiments, toxicities, all_keyword_matches
+    ):
+        results.append({
+            "text_english": text,
+            "found_keywords": matcher.keywords_from_matches(keyword_matches),
+            "keyword_matches": keyword_matches,
+            "sentiment_label": sentiment_label,
+            "sentiment_score": sentiment_score,
+            "toxicity_label": top_toxic_label,
+            "toxicity_score": top_toxic_score,
+        })
+    return results
+
 
 def analyze_english_text(text: str) -> dict:
     """
@@ -28,50 +118,7 @@ def analyze_english_text(text: str) -> dict:
     :param text: The English text to analyze
     :return: A dictionary with found keywords, sentiment, and toxicity results
     """
-    # --- 1) Keyword Detection ---
-    found_keywords = []
-    for kw in ENGLISH_KEYWORDS:
-        pattern = rf"\b{re.escape(kw.lower())}\b"
-        if re.search(pattern, text.lower()):
-            found_keywords.append(kw)
-
-    # --- 2) Sentiment Analysis ---
-    sentiment_results = english_sentiment_pipeline(text)
-    if sentiment_results:
-        sentiment_label = sentiment_results[0]["label"]
-        sentiment_score = sentiment_results[0]["score"]
-    else:
-        sentiment_label = "unknown"
-        sentiment_score = 0.0
-
-    # --- 3) Toxic/Abusive Classification ---
-    toxicity_raw = english_toxic_pipeline(text)
-    # This pipeline returns a list of dicts, e.g.:
-    # [
-    #   [
-    #     {"label": "toxic", "score": 0.7}, 
-    #     {"label": "not toxic", "score": 0.3}
-    #   ]
-    # ]
-    # Some models have different or more granular labels. 
-    # We'll pick the label with the highest score:
-    if toxicity_raw and isinstance(toxicity_raw, list) and len(toxicity_raw[0]) > 0:
-        # Sort by descending score
-        toxicity_sorted = sorted(toxicity_raw[0], key=lambda x: x["score"], reverse=True)
-        top_toxic_label = toxicity_sorted[0]["label"]
-        top_toxic_score = toxicity_sorted[0]["score"]
-    else:
-        top_toxic_label = "unknown"
-        top_toxic_score = 0.0
-
-    return {
-        "text_english": text,
-        "found_keywords": found_keywords,
-        "sentiment_label": sentiment_label,
-        "sentiment_score": sentiment_score,
-        "toxicity_label": top_toxic_label,
-        "toxicity_score": top_toxic_score,
-    }
+    return analyze_english_texts([text])[0]
 
 if __name__ == "__main__":
     # Quick test
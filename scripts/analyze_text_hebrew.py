@@ -1,25 +1,80 @@
-import re
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
+from typing import List, Tuple
 
-# Example Hebrew keywords:
-from common.consts import HEBREW_KEYWORDS
+from scripts.batching import DEFAULT_BATCH_SIZE, run_pipeline_batched, top_score
+from scripts.keywords import get_hebrew_matcher
+from scripts.metrics import get_collector
+from scripts.text_backends import DEFAULT_TEXT_BACKEND, get_text_model
 
 
-# 1) Load Hebrew sentiment model (example: heBERT)
-HEBREW_MODEL_NAME = "avichr/heBERT_sentiment_analysis"
-from transformers import pipeline
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+# The Hebrew sentiment model (XLM-R) is loaded on first use through the model
+# registry (scripts/models.py), not when this module is imported.
+def get_hebrew_sentiment_pipeline(backend: str = DEFAULT_TEXT_BACKEND):
+    return get_text_model("hebrew_sentiment", backend)
 
-tokenizer = AutoTokenizer.from_pretrained("DGurgurov/xlm-r_hebrew_sentiment")
-model = AutoModelForSequenceClassification.from_pretrained("DGurgurov/xlm-r_hebrew_sentiment")
 
-# how to use?
-hebrew_sentiment_pipeline = pipeline(
-    "sentiment-analysis",
-    model="DGurgurov/xlm-r_hebrew_sentiment",
-    tokenizer="DGurgurov/xlm-r_hebrew_sentiment",
-    return_all_scores = True
-)
+def find_hebrew_keywords(text: str) -> List[str]:
+    """
+    Returns the HEBREW_KEYWORDS found in `text`.
+    """
+    return get_hebrew_matcher().found_keywords(text)
+
+
+def score_hebrew_sentiment(
+    texts: List[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    backend: str = DEFAULT_TEXT_BACKEND
+) -> List[Tuple[str, float]]:
+    """
+    Runs the sentiment model over the texts in batches of `batch_size`, grouped by
+    token length to minimise padding.
+
+    :return: (top label, its score) per text.
+    """
+    # With return_all_scores=True each output is a list of all label scores, e.g.:
+    # [{"label": "positive", "score": 0.1}, {"label": "negative", "score": 0.9}]
+    with get_collector().stage("hebrew_sentiment", items=len(texts)):
+        sentiment_outputs = run_pipeline_batched(get_hebrew_sentiment_pipeline(backend), texts, batch_size=batch_size)
+    return [top_score(output) for output in sentiment_outputs]
+
+
+def analyze_hebrew_texts(
+    texts: List[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    backend: str = DEFAULT_TEXT_BACKEND,
+    run_sentiment: bool = True
+) -> List[dict]:
+    """
+    Batch version of `analyze_hebrew_text`. The sentiment model runs over the texts
+    in batches of `batch_size`, grouped by token length to minimise padding.
+    
+    :param texts: The Hebrew texts to analyze (e.g. one per transcript segment).
+    :param batch_size: Number of texts per forward pass.
+    :param backend: Inference backend of the sentiment model (see scripts/text_backends.py).
+    :param run_sentiment: Run the sentiment model; if False, the sentiment fields are None
+                          (keywords only, see scripts/cascade.py).
+    :return: One result dict per text, in the same order as `texts`.
+    """
+    # --- Sentiment Analysis (batched) ---
+    if run_sentiment:
+        sentiments = score_hebrew_sentiment(texts, batch_size=batch_size, backend=backend)
+    else:
+        sentiments = [(None, None)] * len(texts)
+
+    # --- Keyword Detection (one compiled pattern for the whole list) ---
+    matcher = get_hebrew_matcher()
+    with get_collector().stage("hebrew_keywords", items=len(texts)):
+        all_keyword_matches = [matcher.find(text) for text in texts]
+
+    results = []
+    for text, (sentiment_label, sentiment_score), keyword_matches in zip(texts, sentiments, all_keyword_matches):
+        results.append({
+            "text_hebrew": text,
+            "found_keywords": matcher.keywords_from_matches(keyword_matches),
+            "keyword_matches": keyword_matches,
+            "sentiment_label": sentiment_label,
+            "sentiment_score": sentiment_score,
+        })
+    return results
 
 
 def analyze_hebrew_text(text: str) -> dict:
@@ -32,40 +87,7 @@ def analyze_hebrew_text(text: str) -> dict:
     :param text: The Hebrew text to analyze
     :return: A dictionary with found keywords, sentiment, and toxicity results
     """
-    # --- 1) Keyword Detection ---
-    found_keywords = []
-    for kw in HEBREW_KEYWORDS:
-        pattern = rf"\b{re.escape(kw)}\b"
-        if re.search(pattern, text):
-            found_keywords.append(kw)
-
-    # --- 2) Sentiment Analysis ---
-    sentiment_results = hebrew_sentiment_pipeline(text)
-    if sentiment_results:
-        scores = sentiment_results[0]
-        # Sort by descending score
-        scores_sorted = sorted(scores, key=lambda x: x["score"], reverse=True)
-        sentiment_label = scores_sorted[0]["label"]
-        sentiment_score = scores_sorted[0]["score"]
-    else:
-        sentiment_label = "unknown"
-        sentiment_score = 0.0
-
-    # --- 3) Toxic/Abusive Classification ---
-    # Each pipeline run might return something like:
-    # [
-    #   [
-    #     {"label": "toxic", "score": 0.9},
-    #     {"label": "non-toxic", "score": 0.1}
-    #   ]
-    # ]
-
-    return {
-        "text_hebrew": text,
-        "found_keywords": found_keywords,
-        "sentiment_label": sentiment_label,
-        "sentiment_score": sentiment_score,
-    }
+    return analyze_hebrew_texts([text])[0]
 
 if __name__ == "__main__":
     # Quick test
@@ -1,52 +1,291 @@
+from typing import Optional
+
 import librosa
 import numpy as np
 
-def analyze_audio_tone(audio_file: str) -> dict:
+from scripts.cache import ArtifactCache, release_output
+from scripts.pitch import DEFAULT_PITCH_BACKEND, track_pitch
+from scripts.tone_flags import fixed_tone_flags
+from scripts.vad import SpeechIndex
+
+# Frame settings shared by every tone feature (librosa.pyin defaults). All features use
+# librosa's centred frame grid (center=True: frame i is centred on sample i * hop_length),
+# like every pitch backend and SpeechIndex.frame_mask, so their frames line up one to one.
+TONE_FRAME_LENGTH = 2048
+TONE_HOP_LENGTH = 512
+
+
+class ToneFeatures:
+    """
+    Frame-level tone features of a whole recording, computed once.
+
+    Frame i is centred on sample i * hop_length. RMS and pitch are computed over the
+    TONE_FRAME_LENGTH window around that centre; the amplitude is the mean |y| of the
+    frame's own hop, the samples [i * hop_length - hop_length // 2, i * hop_length + hop_length // 2),
+    so the hops tile the recording (the last one runs to its end). Stats for any time range (e.g. one transcript
+    segment) are then a slice-and-reduce over these arrays, see `stats`.
+
+    Tone flags use the fixed thresholds (scripts/tone_flags.py) unless a `baseline`
+    (scripts/tone_baseline.py) is set; then they mean louder / higher than usual for
+    this recording or room.
+    """
+
+    def __init__(self, sr: int, hop_length: int, num_samples: int,
+                 amplitude: np.ndarray, rms: np.ndarray, f0: np.ndarray, voiced: np.ndarray):
+        self.sr = sr
+        self.hop_length = hop_length
+        self.num_samples = num_samples
+        self.amplitude = amplitude    # mean |y| per frame
+        self.rms = rms                # RMS per frame (TONE_FRAME_LENGTH window)
+        self.f0 = f0                  # fundamental frequency per frame (NaN if unvoiced)
+        self.voiced = voiced          # voicing decision per frame
+        self.baseline = None          # optional ToneBaseline the flags are relative to
+
+    @property
+    def num_frames(self) -> int:
+        return len(self.amplitude)
+
+    @property
+    def duration(self) -> float:
+        return self.num_samples / float(self.sr)
+
+    def frame_slice(self, start: float = 0.0, end: Optional[float] = None) -> slice:
+        """
+        Returns the slice of frames whose hop overlaps the time range [start, end) in
+        seconds (the hop of frame i spans i +- 0.5 hops around its centre).
+        """
+        first = max(0, int(np.floor(start * self.sr / self.hop_length + 0.5)))
+        if end is None:
+            last = self.num_frames
+        else:
+            last = min(self.num_frames, int(np.ceil(end * self.sr / self.hop_length + 0.5)))
+        return slice(first, max(first, last))
+
+    def frame_sample_counts(self, frames: slice) -> np.ndarray:
+        """
+        Number of recording samples in the hop of each frame in `frames`.
+        """
+        return _hop_sample_counts(np.arange(frames.start, frames.stop), self.hop_length,
+                                  self.num_frames, self.num_samples)
+
+    def stats(self, start: float = 0.0, end: Optional[float] = None) -> dict:
+        """
+        Tone stats for the time range [start, end) (the whole recording by default),
+        in the same format as `analyze_audio_tone`. With a baseline set, the flags come
+        from the deviation of the range's RMS and pitch from it, which is also reported
+        under "tone_deviation".
+        """
+        frames = self.frame_slice(start, end)
+        amplitude = self.amplitude[frames]
+        # Weight frames by their sample count, so the full range gives exactly mean(|y|)
+        counts = self.frame_sample_counts(frames)
+        avg_amplitude = float(np.average(amplitude, weights=counts)) if counts.sum() > 0 else 0.0
+        avg_rms = float(np.mean(self.rms[frames])) if len(amplitude) else 0.0
+
+        voiced = self.voiced[frames]
+        if voiced.any():
+            avg_pitch = float(np.nanmean(self.f0[frames][voiced]))
+        else:
+            avg_pitch = 0.0
+
+        result = {
+            "average_amplitude": avg_amplitude,
+            "average_rms": avg_rms,
+            "average_pitch_hz": avg_pitch,
+            "voiced_fraction": float(voiced.mean()) if len(voiced) else 0.0,
+            "tone_flags": fixed_tone_flags(avg_amplitude, avg_pitch)
+        }
+        if self.baseline is not None:
+            deviations = self.baseline.deviations(avg_rms, avg_pitch)
+            result["tone_deviation"] = deviations
+            result["tone_flags"] = self.baseline.flags(deviations)
+        return result
+
+    def save(self, path: str) -> str:
+        # Write through a file object so numpy does not append another ".npz"
+        release_output(path)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                sr=self.sr,
+                hop_length=self.hop_length,
+                num_samples=self.num_samples,
+                amplitude=self.amplitude,
+                rms=self.rms,
+                f0=self.f0,
+                voiced=self.voiced,
+            )
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "ToneFeatures":
+        with np.load(path) as data:
+            return cls(
+                sr=int(data["sr"]),
+                hop_length=int(data["hop_length"]),
+                num_samples=int(data["num_samples"]),
+                amplitude=data["amplitude"],
+                rms=data["rms"],
+                f0=data["f0"],
+                voiced=data["voiced"],
+            )
+
+
+def compute_tone_features_from_array(
+    y: np.ndarray,
+    sr: int,
+    pitch_backend: str = DEFAULT_PITCH_BACKEND,
+    speech_index: Optional[SpeechIndex] = None
+) -> ToneFeatures:
     """
-    Analyzes an audio file to detect 'tone' using acoustic features 
+    Computes frame-level amplitude, RMS and pitch in a single pass over the signal.
+
+    :param y: Mono audio samples (float, in [-1, 1]).
+    :param sr: Sample rate of `y`.
+    :param pitch_backend: Pitch tracker to use (see scripts/pitch.py).
+    :param speech_index: Optional speech regions (scripts/vad.py); pitch is only tracked
+                         inside them and other frames are unvoiced.
+    :return: A ToneFeatures instance.
+    """
+    num_frames = 1 + len(y) // TONE_HOP_LENGTH
+
+    # 1. Mean absolute amplitude (loudness) per hop, centred on the frame like RMS and pitch
+    offset = TONE_HOP_LENGTH // 2
+    magnitude = np.abs(y).astype(np.float32)
+    padded = np.zeros(num_frames * TONE_HOP_LENGTH, dtype=np.float32)
+    padded[offset:offset + len(y)] = magnitude[:len(padded) - offset]
+    sums = padded.reshape(num_frames, TONE_HOP_LENGTH).sum(axis=1)
+    # The samples past the last hop belong to the last frame
+    sums[-1] += magnitude[len(padded) - offset:].sum()
+    # Divide by the real samples of each hop, not by the zero padding at both ends
+    counts = _hop_sample_counts(np.arange(num_frames), TONE_HOP_LENGTH, num_frames, len(y))
+    amplitude = np.divide(sums, counts, out=np.zeros(num_frames, dtype=np.float32), where=counts > 0)
+
+    # 2. RMS per frame (centred, as are the pitch frames)
+    rms = librosa.feature.rms(y=y, frame_length=TONE_FRAME_LENGTH, hop_length=TONE_HOP_LENGTH, center=True)[0]
+
+    # 3. Detect pitch (fundamental frequency); pyin by default, or a faster backend
+    f0, voiced_flag = track_pitch(
+        y, sr,
+        frame_length=TONE_FRAME_LENGTH,
+        hop_length=TONE_HOP_LENGTH,
+        rms=rms,
+        backend=pitch_backend,
+        frame_mask=speech_index.frame_mask(num_frames, TONE_HOP_LENGTH, sr) if speech_index is not None else None
+    )
+
+    return ToneFeatures(
+        sr=sr,
+        hop_length=TONE_HOP_LENGTH,
+        num_samples=len(y),
+        amplitude=amplitude.astype(np.float32),
+        rms=_fit_length(rms, num_frames, 0.0).astype(np.float32),
+        f0=_fit_length(f0, num_frames, np.nan).astype(np.float32),
+        voiced=_fit_length(voiced_flag, num_frames, False).astype(bool),
+    )
+
+
+def _hop_sample_counts(frames: np.ndarray, hop_length: int, num_frames: int, num_samples: int) -> np.ndarray:
+    """
+    Number of samples in the hop of each frame: [i * hop_length - hop_length // 2,
+    i * hop_length + hop_length // 2) clipped to the recording, with the last frame's
+    hop running to the end of the recording.
+    """
+    starts = frames * hop_length - hop_length // 2
+    ends = np.where(frames == num_frames - 1, num_samples, starts + hop_length)
+    return np.clip(np.minimum(ends, num_samples) - np.maximum(starts, 0), 0, None)
+
+
+def _fit_length(values: np.ndarray, length: int, fill) -> np.ndarray:
+    """
+    Pads (with `fill`) or trims a per-frame array to `length` frames.
+    """
+    if len(values) >= length:
+        return values[:length]
+    return np.concatenate([values, np.full(length - len(values), fill, dtype=values.dtype)])
+
+
+def compute_tone_features(
+    audio_file: str,
+    pitch_backend: str = DEFAULT_PITCH_BACKEND,
+    speech_index: Optional[SpeechIndex] = None,
+    audio_buffer=None
+) -> ToneFeatures:
+    """
+    Loads an audio file and computes its frame-level tone features.
+
+    :param audio_file: Path to the audio file (e.g., 'processed.wav').
+    :param pitch_backend: Pitch tracker to use (see scripts/pitch.py).
+    :param speech_index: Optional speech regions to restrict pitch tracking to.
+    :param audio_buffer: The file's canonical AudioBuffer (scripts/audio_buffer.py);
+                         when given, its memory-mapped 16 kHz samples are used instead of decoding the file.
+    :return: A ToneFeatures instance.
+    """
+    if audio_buffer is not None:
+        y, sr = audio_buffer.samples, audio_buffer.sample_rate
+    else:
+        y, sr = librosa.load(audio_file, sr=None)  # sr=None -> use file's native sample rate
+    return compute_tone_features_from_array(y, sr, pitch_backend=pitch_backend, speech_index=speech_index)
+
+
+def analyze_audio_tone(audio_file: str, pitch_backend: str = DEFAULT_PITCH_BACKEND) -> dict:
+    """
+    Analyzes an audio file to detect 'tone' using acoustic features
     like average amplitude (loudness) and pitch (fundamental frequency).
-    
+
     :param audio_file: Path to the audio file (e.g., 'processed.wav').
+    :param pitch_backend: Pitch tracker to use (see scripts/pitch.py).
     :return: A dictionary with amplitude and pitch stats, along with simple flags.
     """
-    # 1. Load audio
-    y, sr = librosa.load(audio_file, sr=None)  # sr=None -> use file's native sample rate
+    return compute_tone_features(audio_file, pitch_backend=pitch_backend).stats()
 
-    # 2. Compute average amplitude (loudness)
-    amplitude = np.abs(y)
-    avg_amplitude = np.mean(amplitude)
 
-    # 3. Detect pitch (fundamental frequency) using librosa's pyin
-    #    pyin requires specifying pitch range; adjust as needed
-    f0, voiced_flag, voiced_probs = librosa.pyin(
-        y, 
-        sr=sr, 
-        fmin=librosa.note_to_hz('C2'),  # ~65.4 Hz
-        fmax=librosa.note_to_hz('C6')   # ~1046.5 Hz (adjust if needed)
+def maybe_compute_tone_features(
+    audio_file: str,
+    output_file: str,
+    cache: Optional[ArtifactCache] = None,
+    pitch_backend: str = DEFAULT_PITCH_BACKEND,
+    speech_index: Optional[SpeechIndex] = None,
+    audio_buffer=None
+) -> ToneFeatures:
+    """
+    Runs `compute_tone_features`, reusing cached features for the same audio content.
+    The features are also saved to `output_file`.
+
+    :param audio_file: Path to the audio file (e.g., 'processed.wav').
+    :param output_file: Where to save the features (e.g., 'tone_features.npz').
+    :param cache: Artifact cache (None disables caching).
+    :param pitch_backend: Pitch tracker to use (see scripts/pitch.py).
+    :param speech_index: Optional speech regions to restrict pitch tracking to.
+    :param audio_buffer: The file's canonical AudioBuffer, read instead of decoding the file.
+    :return: The ToneFeatures of the recording.
+    """
+    params = {"pitch_backend": pitch_backend}
+    if audio_buffer is not None:
+        # Frames of the canonical buffer differ from those at the file's native rate
+        params["sample_rate"] = audio_buffer.sample_rate
+    if speech_index is not None:
+        params["speech_regions"] = speech_index.fingerprint()
+    input_key = None
+    if cache is not None:
+        input_key = cache.input_key(audio_file)
+        entry = cache.lookup("tone", input_key, params)
+        if entry is not None:
+            print(f"Reusing cached tone features for '{audio_file}'.")
+            cache.materialize(entry, "tone_features.npz", output_file)
+            return ToneFeatures.load(output_file)
+
+    features = compute_tone_features(
+        audio_file, pitch_backend=pitch_backend, speech_index=speech_index, audio_buffer=audio_buffer
     )
-    
-    # 4. Calculate average pitch across voiced frames
-    if voiced_flag is not None and any(voiced_flag):
-        avg_pitch = np.nanmean(f0[voiced_flag])
-    else:
-        avg_pitch = 0.0
-
-    # 5. Simple thresholds for "loud" or "high pitch" detection (adjust as needed)
-    is_loud = avg_amplitude > 0.1          # Example amplitude threshold
-    is_high_pitch = avg_pitch > 220.0      # Example pitch threshold (Hz)
-
-    # 6. Return results
-    return {
-        "average_amplitude": float(avg_amplitude),
-        "average_pitch_hz": float(avg_pitch),
-        "tone_flags": {
-            "loud": is_loud,
-            "high_pitch": is_high_pitch
-        }
-    }
+    features.save(output_file)
+    if cache is not None:
+        cache.store("tone", input_key, params, files={"tone_features.npz": output_file})
+    return features
 
 if __name__ == "__main__":
     # Example usage
     file_path = "processed.wav"
-    result = analyze_audio_tone(file_path)
-    print(result)
+    features = compute_tone_features(file_path)
+    print(features.stats())
+    print(features.stats(0.0, 5.0))
@@ -0,0 +1,165 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+# The canonical audio of a recording, written once by the preprocess stage and read by
+# every later stage: raw little-endian float32 mono samples (in [-1, 1]) at
+# CANONICAL_SAMPLE_RATE, plus a small JSON header next to it. Stages memory-map it and
+# slice it by time range without decoding, resampling or copying, and parallel workers
+# share one page-cached copy. 16 kHz is Whisper's input rate, so transcription needs no
+# resampling either.
+CANONICAL_SAMPLE_RATE = 16000
+CANONICAL_DTYPE = "<f4"
+AUDIO_BUFFER_SUFFIX = ".f32"
+AUDIO_HEADER_SUFFIX = ".json"
+# Bump when the buffer layout changes; older buffers are then ignored.
+AUDIO_BUFFER_VERSION = 1
+
+
+def buffer_path_for(audio_file: str) -> str:
+    """
+    Path of the canonical buffer that belongs to a preprocessed file
+    (e.g. 'processed.wav' -> 'processed.f32').
+    """
+    return os.path.splitext(audio_file)[0] + AUDIO_BUFFER_SUFFIX
+
+
+def header_path_for(buffer_path: str) -> str:
+    return buffer_path + AUDIO_HEADER_SUFFIX
+
+
+class AudioBufferWriter:
+    """
+    Writes a canonical buffer block by block, resampling to CANONICAL_SAMPLE_RATE with
+    a streaming soxr resampler, so memory does not depend on the length of the recording.
+
+    The header is written last (by `close`), so a buffer without one is incomplete and
+    `open_audio_buffer` ignores it.
+    """
+
+    def __init__(self, path: str, sample_rate: int, source: Optional[str] = None):
+        self.path = path
+        self.source_sample_rate = sample_rate
+        self.source = source
+        self.num_samples = 0
+        self._resampler = None
+        if sample_rate != CANONICAL_SAMPLE_RATE:
+            try:
+                import soxr
+            except ImportError as e:
+                raise ImportError("Resampling the canonical audio buffer needs: pip install soxr") from e
+            self._resampler = soxr.ResampleStream(sample_rate, CANONICAL_SAMPLE_RATE, 1, dtype="float32")
+        # A stale header must not describe the new samples while they are being written,
+        # and an old buffer may be a hard link into the artifact cache: never write through it
+        for stale in (header_path_for(path), path):
+            if os.path.lexists(stale):
+                os.remove(stale)
+        self._file = open(path, "wb")
+
+    def write(self, samples: np.ndarray):
+        """
+        Appends mono float samples in [-1, 1] at the writer's input sample rate.
+        """
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        if self._resampler is not None:
+            samples = self._resampler.resample_chunk(samples, last=False)
+        self._write(samples)
+
+    def _write(self, samples: np.ndarray):
+        self._file.write(samples.astype(CANONICAL_DTYPE).tobytes())
+        self.num_samples += len(samples)
+
+    def close(self):
+        if self._file is None:
+            return
+        if self._resampler is not None:
+            # Flush the samples still held back by the resampler's filter
+            self._write(self._resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+        self._file.close()
+        self._file = None
+        header = {
+            "version": AUDIO_BUFFER_VERSION,
+            "sample_rate": CANONICAL_SAMPLE_RATE,
+            "dtype": CANONICAL_DTYPE,
+            "channels": 1,
+            "num_samples": self.num_samples,
+            "source_sample_rate": self.source_sample_rate,
+            "source": self.source,
+        }
+        tmp_path = header_path_for(self.path) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(header, f, indent=2)
+        os.replace(tmp_path, header_path_for(self.path))
+
+    def __enter__(self) -> "AudioBufferWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class AudioBuffer:
+    """
+    A canonical buffer opened read-only as a numpy memmap.
+
+    `samples` is mapped copy-on-write, so it can be handed to code that expects a
+    writable array (e.g. torch.from_numpy) while the file itself is never modified
+    and unwritten pages stay shared between processes.
+    """
+
+    def __init__(self, path: str):
+        with open(header_path_for(path), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("version") != AUDIO_BUFFER_VERSION:
+            raise ValueError(f"'{path}' has buffer version {header.get('version')}, expected {AUDIO_BUFFER_VERSION}")
+        dtype = np.dtype(header["dtype"])
+        num_samples = int(header["num_samples"])
+        if os.path.getsize(path) != num_samples * dtype.itemsize:
+            raise ValueError(f"'{path}' does not hold the {num_samples} samples its header describes")
+        self.path = path
+        self.header = header
+        self.sample_rate = int(header["sample_rate"])
+        if num_samples:
+            self.samples = np.memmap(path, dtype=dtype, mode="c", shape=(num_samples,))
+        else:
+            # An empty file cannot be mapped
+            self.samples = np.zeros(0, dtype=dtype)
+
+    @property
+    def num_samples(self) -> int:
+        return len(self.samples)
+
+    @property
+    def duration(self) -> float:
+        return self.num_samples / float(self.sample_rate)
+
+    def slice(self, start: float = 0.0, end: Optional[float] = None) -> np.ndarray:
+        """
+        Returns the samples of [start, end) seconds as a view (no copy).
+        """
+        first = max(0, int(start * self.sample_rate))
+        last = self.num_samples if end is None else min(self.num_samples, int(end * self.sample_rate))
+        return self.samples[first:max(first, last)]
+
+
+def open_audio_buffer(audio_file: str) -> Optional[AudioBuffer]:
+    """
+    Opens the canonical buffer written next to a preprocessed file, or returns None
+    if there is none (or it is incomplete or of an older layout).
+
+    :param audio_file: The preprocessed file (e.g. 'processed.wav') or the buffer itself.
+    """
+    path = audio_file if audio_file.endswith(AUDIO_BUFFER_SUFFIX) else buffer_path_for(audio_file)
+    if not os.path.exists(path) or not os.path.exists(header_path_for(path)):
+        return None
+    try:
+        return AudioBuffer(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring the audio buffer '{path}': {e}")
+        return None
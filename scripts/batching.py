@@ -0,0 +1,48 @@
+from typing import List
+
+# Default number of segments per forward pass for the text classifiers.
+DEFAULT_BATCH_SIZE = 32
+
+
+def order_by_token_length(tokenizer, texts: List[str]) -> List[int]:
+    """
+    Returns the indices of `texts` sorted by tokenized length, so that texts of
+    similar length end up in the same batch and padding is kept to a minimum.
+    """
+    if not texts:
+        return []
+    lengths = [len(ids) for ids in tokenizer(texts, truncation=True)["input_ids"]]
+    return sorted(range(len(texts)), key=lambda i: lengths[i])
+
+
+def run_pipeline_batched(pipe, texts: List[str], batch_size: int = DEFAULT_BATCH_SIZE) -> List:
+    """
+    Runs a HuggingFace text pipeline (classification or translation) over many texts in
+    length-grouped batches and returns one output per text, in the original order.
+
+    :param pipe: A transformers pipeline (its tokenizer is used to measure lengths).
+    :param texts: The texts to process.
+    :param batch_size: Number of texts per forward pass.
+    :return: A list with the pipeline's output for each text (same order as `texts`).
+    """
+    if not texts:
+        return []
+    order = order_by_token_length(pipe.tokenizer, texts)
+    sorted_outputs = pipe([texts[i] for i in order], batch_size=batch_size, truncation=True)
+    outputs = [None] * len(texts)
+    for position, index in enumerate(order):
+        outputs[index] = sorted_outputs[position]
+    return outputs
+
+
+def top_score(output) -> tuple:
+    """
+    Returns (label, score) of the highest-scoring class in a pipeline output for one
+    text. Handles both a single {"label", "score"} dict and a list of all class scores.
+    """
+    if isinstance(output, dict):
+        return output["label"], output["score"]
+    if output:
+        best = max(output, key=lambda x: x["score"])
+        return best["label"], best["score"]
+    return "unknown", 0.0
@@ -0,0 +1,285 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional
+
+# Bump a stage's version whenever its code changes in a way that changes its output,
+# so that artifacts produced by the old code are no longer reused.
+STAGE_VERSIONS = {
+    "preprocess": 3,
+    "transcribe": 2,
+    "tone": 3,
+}
+
+META_FILE = "meta.json"
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's content, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(stage: str, input_key: str, params: Dict) -> str:
+    """
+    Builds the cache key of a stage's artifact from the hash of its input,
+    the stage's parameters and the stage's code version.
+    """
+    payload = json.dumps(
+        {
+            "stage": stage,
+            "version": STAGE_VERSIONS.get(stage, 0),
+            "input": input_key,
+            "params": params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def release_output(path: str):
+    """
+    Removes a stage's output file before the stage writes it again. The file may be a
+    hard link into the cache (see `ArtifactCache.materialize`), and writing through the
+    link would change the cached artifact of other parameters.
+    """
+    if os.path.lexists(path):
+        os.remove(path)
+
+
+def _place_file(src: str, dest: str):
+    """
+    Hard-links `src` to `dest` (falling back to a copy), replacing `dest` if it exists.
+    """
+    if os.path.abspath(src) == os.path.abspath(dest):
+        return
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+class ArtifactCache:
+    """
+    A content-addressed store for stage artifacts (processed audio, transcripts, ...).
+
+    Each entry lives in <root>/<stage>/<key[:2]>/<key>/ and holds the artifact files
+    plus a meta.json describing the stage, its parameters and the input hash. The
+    meta.json is written last, so an entry without it is incomplete and ignored.
+
+    Artifacts are hard-linked into the working output directories, so stages must
+    `release_output` a file before rewriting it. The size, mtime and hash of every file
+    are recorded in meta.json as well, and an entry whose files changed anyway is
+    ignored rather than served.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    # --- Input hashing ---
+
+    def input_key(self, path: str) -> str:
+        """
+        Returns the content hash of an input file. Hashes are remembered per
+        (path, size, mtime), so an unchanged file is not re-read on every run.
+        """
+        stat = os.stat(path)
+        abs_path = os.path.abspath(path)
+        index_dir = os.path.join(self.root, "hashes")
+        index_file = os.path.join(index_dir, hashlib.sha1(abs_path.encode("utf-8")).hexdigest() + ".json")
+        if os.path.exists(index_file):
+            try:
+                with open(index_file, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                    return entry["sha256"]
+            except (OSError, ValueError, KeyError):
+                pass
+
+        digest = hash_file(path)
+        os.makedirs(index_dir, exist_ok=True)
+        self._write_json(index_file, {
+            "path": abs_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+        })
+        return digest
+
+    # --- Lookup / store ---
+
+    def _entry_dir(self, stage: str, key: str) -> str:
+        return os.path.join(self.root, stage, key[:2], key)
+
+    def lookup(self, stage: str, input_key: str, params: Dict) -> Optional[Dict]:
+        """
+        Returns the metadata of a cached artifact (with its directory under "dir"),
+        or None if this stage has not been run on this input with these parameters.
+        """
+        key = stage_key(stage, input_key, params)
+        entry_dir = self._entry_dir(stage, key)
+        meta_path = os.path.join(entry_dir, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not self._files_intact(entry_dir, meta):
+            return None
+        # Record the access for least-recently-used eviction
+        os.utime(meta_path, None)
+        meta["dir"] = entry_dir
+        return meta
+
+    @staticmethod
+    def _files_intact(entry_dir: str, meta: Dict) -> bool:
+        """
+        Whether an entry's files are still the ones that were stored. A file whose mtime
+        changed is re-hashed, so only a changed content (e.g. a stage that wrote through
+        a hard link) invalidates the entry. Entries stored without checks are not trusted.
+        """
+        checks = meta.get("checks")
+        if checks is None or set(checks) != set(meta.get("files", {})):
+            return False
+        for name, check in checks.items():
+            path = os.path.join(entry_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+            if stat.st_size != meta["files"][name]:
+                return False
+            if stat.st_mtime_ns != check["mtime_ns"] and hash_file(path) != check["sha256"]:
+                return False
+        return True
+
+    def store(
+        self,
+        stage: str,
+        input_key: str,
+        params: Dict,
+        files: Dict[str, str],
+        metadata: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Stores a stage's artifact files with their metadata.
+
+        :param stage: Stage name (e.g. "preprocess", "transcribe").
+        :param input_key: Hash of the stage's input.
+        :param params: The stage parameters that affect its output.
+        :param files: Mapping of artifact name -> path of the file produced by the stage.
+        :param metadata: Extra information to keep with the artifact.
+        :return: The stored metadata (with the entry directory under "dir").
+        """
+        key = stage_key(stage, input_key, params)
+        entry_dir = self._entry_dir(stage, key)
+        os.makedirs(entry_dir, exist_ok=True)
+        for name, src in files.items():
+            _place_file(src, os.path.join(entry_dir, name))
+        checks = {}
+        for name in files:
+            path = os.path.join(entry_dir, name)
+            checks[name] = {"mtime_ns": os.stat(path).st_mtime_ns, "sha256": hash_file(path)}
+        meta = {
+            "stage": stage,
+            "key": key,
+            "version": STAGE_VERSIONS.get(stage, 0),
+            "input_key": input_key,
+            "params": params,
+            "files": {name: os.path.getsize(os.path.join(entry_dir, name)) for name in files},
+            "checks": checks,
+            "created_at": time.time(),
+            "metadata": metadata or {},
+        }
+        self._write_json(os.path.join(entry_dir, META_FILE), meta)
+        meta["dir"] = entry_dir
+        return meta
+
+    @staticmethod
+    def materialize(entry: Dict, name: str, dest: str) -> str:
+        """
+        Places a cached artifact file at `dest` (hard link, or copy across file systems).
+        Whoever rewrites `dest` later must `release_output` it first.
+        """
+        _place_file(os.path.join(entry["dir"], name), dest)
+        return dest
+
+    # --- Eviction ---
+
+    def entries(self) -> List[Dict]:
+        """
+        Lists all complete entries with their size in bytes and last access time.
+        """
+        found = []
+        for stage in STAGE_VERSIONS:
+            stage_dir = os.path.join(self.root, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for prefix in os.listdir(stage_dir):
+                prefix_dir = os.path.join(stage_dir, prefix)
+                for key in os.listdir(prefix_dir):
+                    entry_dir = os.path.join(prefix_dir, key)
+                    meta_path = os.path.join(entry_dir, META_FILE)
+                    if not os.path.exists(meta_path):
+                        continue
+                    size = sum(
+                        os.path.getsize(os.path.join(entry_dir, name))
+                        for name in os.listdir(entry_dir)
+                    )
+                    found.append({
+                        "stage": stage,
+                        "key": key,
+                        "dir": entry_dir,
+                        "bytes": size,
+                        "last_access": os.path.getmtime(meta_path),
+                    })
+        return found
+
+    def evict(self, max_bytes: Optional[int] = None, max_age_seconds: Optional[float] = None) -> List[Dict]:
+        """
+        Removes entries not accessed for more than `max_age_seconds`, then the
+        least recently used entries until the cache is at most `max_bytes`.
+
+        :return: The removed entries.
+        """
+        entries = sorted(self.entries(), key=lambda e: e["last_access"])
+        now = time.time()
+        removed = []
+        kept = []
+        for entry in entries:
+            if max_age_seconds is not None and now - entry["last_access"] > max_age_seconds:
+                removed.append(entry)
+            else:
+                kept.append(entry)
+        if max_bytes is not None:
+            total = sum(e["bytes"] for e in kept)
+            while kept and total > max_bytes:
+                entry = kept.pop(0)
+                total -= entry["bytes"]
+                removed.append(entry)
+        for entry in removed:
+            shutil.rmtree(entry["dir"], ignore_errors=True)
+        return removed
+
+    @staticmethod
+    def _write_json(path: str, data: Dict):
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,247 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+from scripts.analyze_text_english import analyze_english_texts, score_english_sentiment, score_english_toxicity
+from scripts.analyze_text_hebrew import analyze_hebrew_texts, score_hebrew_sentiment
+from scripts.batching import DEFAULT_BATCH_SIZE
+from scripts.results import iter_results
+from scripts.text_backends import DEFAULT_TEXT_BACKEND
+
+# What happens to the model invocations a segment does not need once a cheap check
+# (Hebrew keywords, the segment's tone) or an earlier model has already flagged it:
+#   "full"  - everything still runs on every segment (complete audit trail, no savings)
+#   "skip"  - they never run; their result fields are None
+#   "defer" - they are listed in the segment's "cascade" entry and run later by
+#             `complete_deferred_analyses` (e.g. overnight), without changing any flag
+# The sentiment models never change whether a segment is problematic, so under
+# "skip"/"defer" they are left out for every segment.
+CASCADE_POLICIES = ("full", "skip", "defer")
+DEFAULT_CASCADE_POLICY = "full"
+
+# The expensive per-segment invocations the cascade accounts for
+CASCADE_MODELS = ("hebrew_sentiment", "translation", "english_sentiment", "english_toxic")
+
+
+def new_cascade_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Counters of model invocations per model: run, skipped and deferred (segments).
+    """
+    return {model: {"run": 0, "skipped": 0, "deferred": 0} for model in CASCADE_MODELS}
+
+
+def add_cascade_stats(total: Dict, stats: Dict) -> Dict:
+    for model, counts in stats.items():
+        for key, value in counts.items():
+            total.setdefault(model, {"run": 0, "skipped": 0, "deferred": 0})[key] += value
+    return total
+
+
+def format_cascade_stats(stats: Dict) -> str:
+    """
+    E.g. "hebrew_sentiment 0/500 (500 skipped), ...; 1520 of 2000 model invocations saved (76.0%)".
+    """
+    parts = []
+    total = saved = 0
+    for model, counts in stats.items():
+        not_run = counts["skipped"] + counts["deferred"]
+        if counts["run"] + not_run == 0:
+            continue
+        total += counts["run"] + not_run
+        saved += not_run
+        detail = []
+        if counts["skipped"]:
+            detail.append(f"{counts['skipped']} skipped")
+        if counts["deferred"]:
+            detail.append(f"{counts['deferred']} deferred")
+        parts.append(f"{model} {counts['run']}/{counts['run'] + not_run}"
+                     + (f" ({', '.join(detail)})" if detail else ""))
+    if not total:
+        return "no model invocations"
+    return f"{', '.join(parts)}; {saved} of {total} model invocations saved ({saved / total:.1%})"
+
+
+def cheap_decision(hebrew_result: Dict, seg_tone: Optional[Dict]) -> Optional[str]:
+    """
+    The checks of `is_segment_problematic` (scripts/decision.py) that need no model:
+    returns the one that flags the segment ("hebrew_keywords" or "tone"), or None if
+    the segment is undecided.
+    """
+    if hebrew_result["found_keywords"]:
+        return "hebrew_keywords"
+    if seg_tone is not None and (seg_tone["tone_flags"]["loud"] or seg_tone["tone_flags"]["high_pitch"]):
+        return "tone"
+    return None
+
+
+def _count(stats: Dict, model: str, run: int, not_run: int, policy: str):
+    stats[model]["run"] += run
+    stats[model]["deferred" if policy == "defer" else "skipped"] += not_run
+
+
+def analyze_segments_cascade(
+    segments: List[Dict],
+    tone_features=None,
+    translator=None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    text_backend: str = DEFAULT_TEXT_BACKEND,
+    policy: str = DEFAULT_CASCADE_POLICY,
+    stats: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    Cascaded version of main.analyze_segments_text: cheap checks first, then only
+    the model invocations that can still change the decision of `is_segment_problematic`.
+
+      1) Hebrew keywords and the segment's tone (no model)
+      2) Translation of the segments still undecided, and English keywords on it
+      3) English toxicity of the segments still undecided
+      The sentiment models are audit-only: they run under the "full" policy only.
+
+    With policy="full" the result is exactly that of analyze_segments_text. Otherwise
+    each analysis gets a "cascade" entry: {"decided_by", "skipped", "deferred"}.
+
+    :param segments: Segments from main.chunk_transcript_with_timestamps.
+    :param tone_features: The recording's ToneFeatures, or None if not available yet
+                          (pipeline mode); then only keywords decide early.
+    :param translator: An optional TextTranslator (scripts/translate.py).
+    :param batch_size: Number of segments per model forward pass.
+    :param text_backend: Inference backend of the text models (see scripts/text_backends.py).
+    :param policy: One of CASCADE_POLICIES.
+    :param stats: Counters from `new_cascade_stats` to add this call's invocations to.
+    :return: One analysis dict per segment ({"hebrew_analysis", "english_analysis", ...}).
+    """
+    if policy not in CASCADE_POLICIES:
+        raise ValueError(f"Unknown cascade policy '{policy}'; expected one of {CASCADE_POLICIES}")
+    stats = stats if stats is not None else new_cascade_stats()
+    full = policy == "full"
+    texts = [seg["text"] for seg in segments]
+    num_texts = len(texts)
+    not_run = [[] for _ in texts]
+
+    # 1) Hebrew keywords (and sentiment, under "full") and the segment's tone
+    hebrew_results = analyze_hebrew_texts(texts, batch_size=batch_size, backend=text_backend, run_sentiment=full)
+    _count(stats, "hebrew_sentiment", num_texts if full else 0, 0 if full else num_texts, policy)
+    decided_by = []
+    for seg, hebrew_result, seg_not_run in zip(segments, hebrew_results, not_run):
+        seg_tone = None
+        if tone_features is not None:
+            seg_end = seg["end"] if seg["end"] > seg["start"] else None
+            seg_tone = tone_features.stats(seg["start"], seg_end)
+        decided_by.append(cheap_decision(hebrew_result, seg_tone))
+        if not full:
+            seg_not_run.append("hebrew_sentiment")
+
+    # 2) Translation and English keywords, for the segments still undecided
+    english_results = [{} for _ in texts]
+    if translator:
+        indices = [i for i in range(num_texts) if full or decided_by[i] is None]
+        for i in set(range(num_texts)).difference(indices):
+            not_run[i].extend(["translation", "english_sentiment", "english_toxic"])
+        english_texts = translator.translate_texts([texts[i] for i in indices], batch_size=batch_size)
+        translated = analyze_english_texts(
+            english_texts, batch_size=batch_size, backend=text_backend, run_sentiment=full, run_toxicity=False
+        )
+        _count(stats, "translation", len(indices), num_texts - len(indices), policy)
+        _count(stats, "english_sentiment", len(indices) if full else 0, num_texts - len(indices) if full else num_texts,
+               policy)
+
+        # 3) Toxicity, unless an English keyword already decided
+        toxic_positions = []
+        for position, (i, english_result) in enumerate(zip(indices, translated)):
+            english_results[i] = english_result
+            if not full:
+                not_run[i].append("english_sentiment")
+            if english_result["found_keywords"] and decided_by[i] is None:
+                decided_by[i] = "english_keywords"
+            if full or decided_by[i] is None:
+                toxic_positions.append(position)
+            else:
+                not_run[i].append("english_toxic")
+        toxicities = score_english_toxicity(
+            [english_texts[position] for position in toxic_positions], batch_size=batch_size, backend=text_backend
+        ) if toxic_positions else []
+        for position, (label, score) in zip(toxic_positions, toxicities):
+            english_results[indices[position]].update({"toxicity_label": label, "toxicity_score": score})
+        _count(stats, "english_toxic", len(toxic_positions), num_texts - len(toxic_positions), policy)
+
+    analyses = []
+    for hebrew_result, english_result, reason, seg_not_run in zip(hebrew_results, english_results, decided_by, not_run):
+        analysis = {"hebrew_analysis": hebrew_result, "english_analysis": english_result}
+        if not full:
+            analysis["cascade"] = {
+                "decided_by": reason,
+                "skipped": seg_not_run if policy == "skip" else [],
+                "deferred": seg_not_run if policy == "defer" else [],
+            }
+        analyses.append(analysis)
+    return analyses
+
+
+def complete_deferred_analyses(
+    results_path: str,
+    translator=None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    text_backend: str = DEFAULT_TEXT_BACKEND
+) -> int:
+    """
+    Runs the model invocations deferred by the "defer" policy in a complete results
+    file and rewrites the file with their results. The problematic flags are left as
+    they are: deferred invocations never change them.
+
+    :param results_path: A results.jsonl file (see scripts/results.py).
+    :param translator: The TextTranslator the recording was analyzed with. Without one,
+                       only the deferred Hebrew invocations are run.
+    :return: The number of segments whose deferred invocations were all run.
+    """
+    records = list(iter_results(results_path))
+    if not records or records[-1].get("type") != "footer":
+        raise ValueError(f"'{results_path}' is incomplete; finish (or --resume) the recording first")
+    pending = [r for r in records if r.get("type") == "segment" and r["text_analysis"].get("cascade", {}).get("deferred")]
+    if not pending:
+        return 0
+
+    def deferring(model: str) -> List[Dict]:
+        return [r for r in pending if model in r["text_analysis"]["cascade"]["deferred"]]
+
+    # Hebrew sentiment
+    needs = deferring("hebrew_sentiment")
+    for record, (label, score) in zip(needs, score_hebrew_sentiment(
+            [r["text_analysis"]["hebrew_analysis"]["text_hebrew"] for r in needs], batch_size, text_backend)):
+        record["text_analysis"]["hebrew_analysis"].update({"sentiment_label": label, "sentiment_score": score})
+
+    if translator is not None:
+        # Segments never translated get the whole English analysis
+        needs = deferring("translation")
+        english_texts = translator.translate_texts(
+            [r["text_analysis"]["hebrew_analysis"]["text_hebrew"] for r in needs], batch_size=batch_size
+        )
+        for record, english_result in zip(needs, analyze_english_texts(english_texts, batch_size, text_backend)):
+            record["text_analysis"]["english_analysis"] = english_result
+
+        # Translated segments only missing a model
+        for model, field, score_fn in (
+            ("english_sentiment", "sentiment", score_english_sentiment),
+            ("english_toxic", "toxicity", score_english_toxicity),
+        ):
+            needs = [r for r in deferring(model) if "translation" not in r["text_analysis"]["cascade"]["deferred"]]
+            scores = score_fn([r["text_analysis"]["english_analysis"]["text_english"] for r in needs],
+                              batch_size, text_backend) if needs else []
+            for record, (label, score) in zip(needs, scores):
+                record["text_analysis"]["english_analysis"].update({f"{field}_label": label, f"{field}_score": score})
+
+    done = {"hebrew_sentiment"}
+    if translator is not None:
+        done.update(["translation", "english_sentiment", "english_toxic"])
+    for record in pending:
+        cascade = record["text_analysis"]["cascade"]
+        cascade["deferred"] = [model for model in cascade["deferred"] if model not in done]
+    num_deferred = sum(1 for record in pending if record["text_analysis"]["cascade"]["deferred"])
+    records[-1]["num_deferred"] = num_deferred
+
+    # Write next to the file and swap, so a crash never leaves a half-written results file
+    tmp_path = results_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, results_path)
+    return len(pending) - num_deferred
@@ -0,0 +1,46 @@
+from typing import Dict
+
+from common.consts import TOXICITY_THRESHOLD
+
+# The rule that decides whether a segment is problematic, from its text analysis and
+# tone stats. It needs no model, so re-scoring stored results (scripts/reanalyze.py)
+# applies exactly the rule of a full run.
+
+
+def is_segment_problematic(
+    seg_analysis: Dict,
+    tone_analysis: Dict,
+    toxicity_threshold: float = TOXICITY_THRESHOLD
+) -> bool:
+    """
+    Decide if a segment is "problematic" based on text or tone features.
+    This is a simple example. You can refine your conditions/thresholds.
+    
+    :param seg_analysis: Dict from main.analyze_segment_text.
+    :param tone_analysis: Tone stats for the segment (ToneFeatures.stats over its time range).
+    :param toxicity_threshold: Minimum English toxicity score that flags a segment.
+    :return: True if flagged as problematic, else False.
+    """
+    # 1) Check Hebrew keywords
+    if seg_analysis["hebrew_analysis"]["found_keywords"]:
+        return True
+
+    # 3) Check English (if used)
+    if "english_analysis" in seg_analysis:
+        # Found keywords?
+        if seg_analysis["english_analysis"].get("found_keywords"):
+            return True
+        # Toxic?
+        if (seg_analysis["english_analysis"].get("toxicity_label") == "toxic" and
+            seg_analysis["english_analysis"].get("toxicity_score", 0) > toxicity_threshold):
+            return True
+
+    # 4) Check volume/pitch from tone analysis
+    # Example thresholds for "loud" or "high pitch"
+    if tone_analysis["tone_flags"]["loud"] or tone_analysis["tone_flags"]["high_pitch"]:
+        # This might or might not be considered problematic. 
+        # You can refine the logic as needed.
+        return True
+    
+    # If none of the above conditions are triggered, consider it not problematic
+    return False
@@ -0,0 +1,128 @@
+import re
+import unicodedata
+from typing import Dict, List, Sequence, Tuple
+
+from common.consts import ENGLISH_KEYWORDS, HEBREW_KEYWORDS
+
+# Hebrew final letters are matched as their regular forms (e.g. "מכות" / "מכותם").
+HEBREW_FINAL_LETTERS = {"ך": "כ", "ם": "מ", "ן": "נ", "ף": "פ", "ץ": "צ"}
+# Apostrophe variants (typographic quotes, modifier letters) are matched as "'".
+APOSTROPHES = {"’": "'", "‘": "'", "ʼ": "'", "`": "'", "´": "'", "׳": "'"}
+# One-letter Hebrew prefixes (ו, ה, ב, כ, ל, מ, ש) that may be attached to a keyword,
+# e.g. "והמכה" matches "מכה". At most HEBREW_MAX_PREFIX_LETTERS are stripped.
+HEBREW_PREFIX_LETTERS = "והבכלמש"
+HEBREW_MAX_PREFIX_LETTERS = 2
+
+_CHAR_MAP = {**HEBREW_FINAL_LETTERS, **APOSTROPHES}
+
+
+def normalize_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """
+    Normalises text for keyword matching: lower case, Hebrew niqqud removed, Hebrew final
+    letters and apostrophe variants unified.
+
+    :return: (normalised text, offsets) where offsets[i] is the index in `text` of the
+             character that produced normalised character i.
+    """
+    chars = []
+    offsets = []
+    for index, ch in enumerate(text):
+        # Niqqud and cantillation marks (combining marks in the Hebrew block)
+        if "֑" <= ch <= "ׇ" and unicodedata.category(ch) == "Mn":
+            continue
+        mapped = _CHAR_MAP.get(ch)
+        if mapped is None:
+            mapped = ch.lower()
+        for out in mapped:
+            chars.append(out)
+            offsets.append(index)
+    return "".join(chars), offsets
+
+
+def normalize(text: str) -> str:
+    return normalize_with_offsets(text)[0]
+
+
+class KeywordMatcher:
+    """
+    Finds every keyword of a list in a text with one compiled regular expression.
+
+    Keywords match at word boundaries after normalisation (see `normalize_with_offsets`).
+    Matching is done with a zero-width lookahead at every word start, so overlapping
+    keywords ("stupid" and "stupid kid") are all reported, like checking each keyword
+    separately. List entries that normalise alike (e.g. the same word with and without
+    niqqud) match the same text, and each of them is reported as it appears in the list.
+    """
+
+    def __init__(self, keywords: Sequence[str], hebrew_prefixes: bool = False):
+        # normalised keyword -> the list entries that normalise to it, in list order
+        self._originals: Dict[str, List[str]] = {}
+        for kw in dict.fromkeys(keywords):
+            self._originals.setdefault(normalize(kw), []).append(kw)
+        self._order = {kw: i for i, kw in enumerate(dict.fromkeys(keywords))}
+
+        # Longest first, so the alternation prefers "stupid kid" over "stupid"
+        normalized = sorted(self._originals, key=len, reverse=True)
+        alternation = "|".join(re.escape(kw) for kw in normalized)
+        prefix = f"[{HEBREW_PREFIX_LETTERS}]{{0,{HEBREW_MAX_PREFIX_LETTERS}}}?" if hebrew_prefixes else ""
+        self._pattern = re.compile(rf"(?<!\w){prefix}(?=(?P<kw>{alternation})(?!\w))")
+
+        # Shorter keywords that also match wherever a longer one starting with them matches
+        # ("stupid" inside "stupid kid"), since the alternation only reports the longest.
+        self._implied: Dict[str, List[str]] = {}
+        for kw in normalized:
+            self._implied[kw] = [
+                other for other in normalized
+                if len(other) < len(kw) and kw.startswith(other) and not re.match(r"\w", kw[len(other)])
+            ]
+
+    def find(self, text: str) -> List[Dict]:
+        """
+        Returns every keyword occurrence as
+        {"keyword": list entry, "start": int, "end": int, "text": matched text},
+        with offsets into the original `text` (one per matching list entry).
+        """
+        normalized, offsets = normalize_with_offsets(text)
+        matches = []
+        for m in self._pattern.finditer(normalized):
+            start = m.start("kw")
+            kw = m.group("kw")
+            for found in [kw] + self._implied[kw]:
+                orig_start = offsets[start]
+                orig_end = offsets[start + len(found) - 1] + 1
+                for original in self._originals[found]:
+                    matches.append({
+                        "keyword": original,
+                        "start": orig_start,
+                        "end": orig_end,
+                        "text": text[orig_start:orig_end],
+                    })
+        return matches
+
+    def keywords_from_matches(self, matches: List[Dict]) -> List[str]:
+        """
+        Returns the distinct list entries of `find` results, in keyword-list order.
+        """
+        return sorted({m["keyword"] for m in matches}, key=self._order.__getitem__)
+
+    def found_keywords(self, text: str) -> List[str]:
+        """
+        Returns the distinct keywords found in `text`, in keyword-list order.
+        """
+        return self.keywords_from_matches(self.find(text))
+
+
+# Matchers are compiled once per process, on first use
+_MATCHERS: Dict[str, KeywordMatcher] = {}
+
+
+def get_hebrew_matcher() -> KeywordMatcher:
+    if "he" not in _MATCHERS:
+        _MATCHERS["he"] = KeywordMatcher(HEBREW_KEYWORDS, hebrew_prefixes=True)
+    return _MATCHERS["he"]
+
+
+def get_english_matcher() -> KeywordMatcher:
+    if "en" not in _MATCHERS:
+        _MATCHERS["en"] = KeywordMatcher(ENGLISH_KEYWORDS)
+    return _MATCHERS["en"]
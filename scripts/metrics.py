@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from scripts.models import current_rss_bytes, peak_rss_bytes
+
+# Profilers for `MetricsCollector(profile_stage=...)`. pyinstrument is optional.
+PROFILERS = ("cprofile", "pyinstrument")
+METRICS_FILE = "metrics.json"
+
+
+def _empty_stage() -> Dict:
+    return {
+        "runs": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+        "peak_rss_mb": 0.0, "max_rss_delta_mb": 0.0, "audio_seconds": 0.0, "items": 0,
+    }
+
+
+def _with_rates(entry: Dict) -> Dict:
+    """Adds the derived x real time and items/second to a copy of a stage entry."""
+    entry = dict(entry)
+    if entry["audio_seconds"] and entry["wall_seconds"] > 0:
+        entry["x_real_time"] = entry["audio_seconds"] / entry["wall_seconds"]
+    if entry["items"] and entry["wall_seconds"] > 0:
+        entry["items_per_second"] = entry["items"] / entry["wall_seconds"]
+    return entry
+
+
+class _StageTimer:
+    """
+    Context manager measuring one run of a stage. The `with` target is a dict the
+    stage may fill in as it goes ("items", "audio_seconds").
+    """
+
+    def __init__(self, collector: "MetricsCollector", name: str, audio_seconds: Optional[float], items: Optional[int]):
+        self.collector = collector
+        self.name = name
+        self.info = {"audio_seconds": audio_seconds, "items": items}
+
+    def __enter__(self) -> Dict:
+        self._profiler = self.collector._start_profiler(self.name)
+        self._rss = current_rss_bytes()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self.info
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        self.collector._stop_profiler(self.name, self._profiler)
+        self.collector.record(
+            self.name, wall, cpu_seconds=cpu, rss_delta=current_rss_bytes() - self._rss,
+            audio_seconds=self.info.get("audio_seconds"), items=self.info.get("items")
+        )
+        return False
+
+
+class _NullStage:
+    """The stage timer of a disabled collector: does nothing."""
+
+    def __enter__(self) -> Dict:
+        return {}
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullCollector:
+    """
+    Collector used when metrics are disabled. `stage` returns a shared no-op
+    context manager, so instrumented code costs a function call per stage.
+    """
+    enabled = False
+
+    def stage(self, name: str, audio_seconds: Optional[float] = None, items: Optional[int] = None):
+        return _NULL_STAGE
+
+    def record(self, name: str, wall_seconds: float, **kwargs):
+        pass
+
+    def to_dict(self) -> Dict:
+        return {}
+
+
+class MetricsCollector:
+    """
+    Per-stage metrics of a run: for every stage name, the number of runs, wall time,
+    CPU time (of the whole process, so stages overlapping in pipeline mode share it),
+    peak RSS of the process at the end of the stage, RSS growth, and the audio seconds
+    and items processed, from which x real time and items/second are derived.
+
+    Usage:
+        with get_collector().stage("transcribe", audio_seconds=duration) as info:
+            ...
+            info["items"] = len(segments)
+    """
+    enabled = True
+
+    def __init__(
+        self,
+        profile_stage: Optional[str] = None,
+        profiler: str = "cprofile",
+        profile_dir: str = "."
+    ):
+        """
+        :param profile_stage: Name of a stage to profile every time it runs (None: no profiling).
+        :param profiler: "cprofile" (one .prof file, viewable with snakeviz/pstats) or
+                         "pyinstrument" (one HTML report per run of the stage).
+        :param profile_dir: Where profile dumps are written.
+        """
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{profiler}'; expected one of {PROFILERS}")
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self.stages: Dict[str, Dict] = {}
+        self.started_at = time.time()
+        self._cprofile = None
+        self._profile_runs = 0
+        # Stages of pipeline mode finish on different threads
+        self._lock = threading.Lock()
+
+    def stage(self, name: str, audio_seconds: Optional[float] = None, items: Optional[int] = None) -> _StageTimer:
+        return _StageTimer(self, name, audio_seconds, items)
+
+    def record(
+        self,
+        name: str,
+        wall_seconds: float,
+        cpu_seconds: float = 0.0,
+        rss_delta: int = 0,
+        audio_seconds: Optional[float] = None,
+        items: Optional[int] = None
+    ):
+        """
+        Adds one run of a stage measured elsewhere (`stage` calls this on exit).
+        """
+        peak_rss_mb = peak_rss_bytes() / 1024 ** 2
+        with self._lock:
+            entry = self.stages.setdefault(name, _empty_stage())
+            entry["runs"] += 1
+            entry["wall_seconds"] += wall_seconds
+            entry["cpu_seconds"] += cpu_seconds
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"], peak_rss_mb)
+            entry["max_rss_delta_mb"] = max(entry["max_rss_delta_mb"], rss_delta / 1024 ** 2)
+            entry["audio_seconds"] += audio_seconds or 0.0
+            entry["items"] += items or 0
+
+    # --- Profiling ---
+
+    def _start_profiler(self, name: str):
+        if name != self.profile_stage:
+            return None
+        if self.profiler == "pyinstrument":
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        import cProfile
+        if self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+        try:
+            self._cprofile.enable()
+        except ValueError:
+            # Another profiler is active (e.g. the stage runs nested or in two threads)
+            return None
+        return self._cprofile
+
+    def _stop_profiler(self, name: str, profiler):
+        if profiler is None:
+            return
+        self._profile_runs += 1
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if self.profiler == "pyinstrument":
+            profiler.stop()
+            path = os.path.join(self.profile_dir, f"profile_{name}_{self._profile_runs}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(self.profile_dir, f"profile_{name}.prof"))
+
+    # --- Reporting ---
+
+    def to_dict(self) -> Dict:
+        return {
+            "started_at": self.started_at,
+            "wall_seconds": time.time() - self.started_at,
+            "peak_rss_mb": peak_rss_bytes() / 1024 ** 2,
+            "stages": {name: _with_rates(entry) for name, entry in self.stages.items()},
+        }
+
+    def save(self, path: str, extra: Optional[Dict] = None) -> str:
+        data = self.to_dict()
+        data.update(extra or {})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        return path
+
+
+def merge_metrics(runs) -> Dict:
+    """
+    Adds up the stage metrics of several collectors (e.g. one per batch worker),
+    given as `to_dict()` outputs.
+    """
+    merged: Dict[str, Dict] = {}
+    for run in runs:
+        for name, entry in run.get("stages", {}).items():
+            total = merged.setdefault(name, _empty_stage())
+            for key in ("runs", "wall_seconds", "cpu_seconds", "audio_seconds", "items"):
+                total[key] += entry[key]
+            for key in ("peak_rss_mb", "max_rss_delta_mb"):
+                total[key] = max(total[key], entry[key])
+    return {"stages": {name: _with_rates(entry) for name, entry in merged.items()}}
+
+
+def format_metrics(metrics: Dict) -> str:
+    lines = []
+    for name, entry in sorted(metrics.get("stages", {}).items(), key=lambda item: -item[1]["wall_seconds"]):
+        line = (f"  {name}: {entry['wall_seconds']:.1f}s wall, {entry['cpu_seconds']:.1f}s CPU, "
+                f"peak RSS {entry['peak_rss_mb']:.0f} MB")
+        if "x_real_time" in entry:
+            line += f", {entry['x_real_time']:.1f}x real time"
+        if "items_per_second" in entry:
+            line += f", {entry['items_per_second']:.1f} items/s"
+        lines.append(line)
+    return "\n".join(lines) if lines else "  (no stages recorded)"
+
+
+# The process-wide collector; disabled unless `set_collector` installs a MetricsCollector.
+_COLLECTOR = NullCollector()
+
+
+def get_collector():
+    return _COLLECTOR
+
+
+def set_collector(collector):
+    global _COLLECTOR
+    _COLLECTOR = collector if collector is not None else NullCollector()
+    return _COLLECTOR
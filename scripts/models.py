@@ -0,0 +1,152 @@
+import os
+import resource
+import sys
+import threading
+import time
+from functools import partial
+from typing import Callable, Dict, Optional
+
+# Model names used by the analysis scripts.
+HEBREW_SENTIMENT_MODEL_NAME = "DGurgurov/xlm-r_hebrew_sentiment"
+# The default model of transformers' "sentiment-analysis" pipeline, pinned so it cannot change under us.
+ENGLISH_SENTIMENT_MODEL_NAME = "distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+TOXIC_MODEL_NAME = "unitary/toxic-bert"
+# Offline Hebrew -> English translation (MarianMT)
+HE_EN_TRANSLATION_MODEL_NAME = "Helsinki-NLP/opus-mt-tc-big-he-en"
+
+# name -> function that loads the model
+_LOADERS: Dict[str, Callable] = {}
+# name -> loaded model (or pipeline)
+_MODELS: Dict[str, object] = {}
+# name -> {"load_seconds": float, "rss_delta_bytes": int, "param_bytes": int}
+_STATS: Dict[str, Dict] = {}
+_LOCK = threading.RLock()
+
+
+def peak_rss_bytes() -> int:
+    """
+    Returns the peak resident memory of this process so far, in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> int:
+    """
+    Returns the resident memory of this process in bytes
+    (falls back to the peak RSS where /proc is not available).
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def _param_bytes(obj) -> int:
+    """
+    Size of a torch model's parameters (the model of a pipeline, if given a pipeline).
+    """
+    model = getattr(obj, "model", obj)
+    parameters = getattr(model, "parameters", None)
+    if parameters is None:
+        return 0
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters())
+    except Exception:
+        return 0
+
+
+def register_model(name: str, loader: Callable):
+    """
+    Registers how to load a model. Nothing is loaded until `get_model(name)` is called.
+    """
+    with _LOCK:
+        _LOADERS[name] = loader
+
+
+def get_model(name: str, loader: Optional[Callable] = None):
+    """
+    Returns the model registered under `name`, loading it on first use. Every caller
+    in the process gets the same instance.
+
+    :param name: Registered model name (see the register_model calls below).
+    :param loader: Loader to register if `name` is not registered yet
+                   (for parameterised models such as Whisper sizes).
+    :return: The loaded model.
+    """
+    with _LOCK:
+        if name in _MODELS:
+            return _MODELS[name]
+        if name not in _LOADERS:
+            if loader is None:
+                raise KeyError(f"No model registered under '{name}'")
+            _LOADERS[name] = loader
+
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        model = _LOADERS[name]()
+        _STATS[name] = {
+            "load_seconds": time.perf_counter() - start,
+            "rss_delta_bytes": current_rss_bytes() - rss_before,
+            "param_bytes": _param_bytes(model),
+        }
+        _MODELS[name] = model
+        return model
+
+
+def is_loaded(name: str) -> bool:
+    return name in _MODELS
+
+
+def model_stats() -> Dict[str, Dict]:
+    """
+    Returns load time and memory for every model loaded in this process.
+    """
+    with _LOCK:
+        return {name: dict(stats) for name, stats in _STATS.items()}
+
+
+def format_model_stats() -> str:
+    lines = []
+    for name, stats in model_stats().items():
+        lines.append(
+            f"  {name}: loaded in {stats['load_seconds']:.1f}s, "
+            f"+{stats['rss_delta_bytes'] / 1024 ** 2:.0f} MB RSS, "
+            f"{stats['param_bytes'] / 1024 ** 2:.0f} MB parameters"
+        )
+    return "\n".join(lines) if lines else "  (no models loaded)"
+
+
+# --- Text classification models ---
+# transformers is imported inside the loaders, so importing this module stays cheap.
+
+# name -> (model, pipeline task, extra pipeline arguments) of the text classifiers.
+# With return_all_scores=True a pipeline returns the scores of all labels, not just the top one.
+TEXT_CLASSIFIERS = {
+    "hebrew_sentiment": (HEBREW_SENTIMENT_MODEL_NAME, "sentiment-analysis", {"return_all_scores": True}),
+    "english_sentiment": (ENGLISH_SENTIMENT_MODEL_NAME, "sentiment-analysis", {}),
+    "english_toxic": (TOXIC_MODEL_NAME, "text-classification", {"return_all_scores": True}),
+}
+
+
+def _load_text_classifier(name: str):
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
+    model_name, task, pipeline_kwargs = TEXT_CLASSIFIERS[name]
+    # Load the weights once and hand the objects to the pipeline
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    return pipeline(task, model=model, tokenizer=tokenizer, **pipeline_kwargs)
+
+
+def _load_he_en_translation():
+    from transformers import MarianMTModel, MarianTokenizer, pipeline
+    tokenizer = MarianTokenizer.from_pretrained(HE_EN_TRANSLATION_MODEL_NAME)
+    model = MarianMTModel.from_pretrained(HE_EN_TRANSLATION_MODEL_NAME)
+    return pipeline("translation", model=model, tokenizer=tokenizer)
+
+
+for _name in TEXT_CLASSIFIERS:
+    register_model(_name, partial(_load_text_classifier, _name))
+register_model("he_en_translation", _load_he_en_translation)
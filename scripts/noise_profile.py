@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+from scipy.ndimage import uniform_filter
+
+# STFT of the stored-profile spectral gate (Hann window, 75% overlap)
+NOISE_N_FFT = 1024
+NOISE_HOP_LENGTH = 256
+# A bin is kept where it is this many standard deviations above the profile's mean
+# level (noisereduce's stationary default), and attenuated by PROP_DECREASE elsewhere.
+NOISE_N_STD_THRESH = 1.5
+NOISE_PROP_DECREASE = 1.0
+# The keep/attenuate mask is smoothed over this much frequency and time (noisereduce defaults)
+NOISE_MASK_SMOOTH_HZ = 500.0
+NOISE_MASK_SMOOTH_MS = 50.0
+# A profile is the level distribution of the quietest STFT frames of a recording:
+# this many seconds of them are kept while the recording streams by.
+NOISE_PROFILE_SECONDS = 10.0
+# A stored profile is stale after this many days, or when the noise floor of the
+# first block of a recording is on average this many dB away from it (the microphone
+# moved, the air-conditioning changed...). Then the adaptive noisereduce path is used
+# and the profile is re-estimated from that recording.
+NOISE_PROFILE_MAX_AGE_DAYS = 30.0
+NOISE_PROFILE_MAX_DRIFT_DB = 6.0
+
+NOISE_PROFILE_FILE = "noise_profiles.sqlite"
+
+
+def _stft(y: np.ndarray, n_fft: int, hop_length: int) -> np.ndarray:
+    """
+    Centered STFT of all frames at once: (num_frames, n_fft // 2 + 1) complex.
+    """
+    padded = np.pad(y.astype(np.float32, copy=False), n_fft // 2, mode="reflect" if len(y) > n_fft // 2 else "constant")
+    num_frames = 1 + (len(padded) - n_fft) // hop_length if len(padded) >= n_fft else 0
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length][:num_frames]
+    return np.fft.rfft(frames * np.hanning(n_fft).astype(np.float32), axis=1)
+
+
+def _istft(spectrum: np.ndarray, n_fft: int, hop_length: int, length: int) -> np.ndarray:
+    """
+    Inverse of `_stft` by weighted overlap-add, one shifted add per hop within a frame.
+    """
+    window = np.hanning(n_fft).astype(np.float32)
+    frames = np.fft.irfft(spectrum, n=n_fft, axis=1).astype(np.float32) * window
+    num_frames = len(frames)
+    overlap = n_fft // hop_length
+    out = np.zeros(num_frames * hop_length + n_fft, dtype=np.float32)
+    norm = np.zeros_like(out)
+    pieces = frames.reshape(num_frames, overlap, hop_length)
+    window_pieces = np.broadcast_to((window ** 2).reshape(overlap, hop_length), pieces.shape)
+    for k in range(overlap):
+        out[k * hop_length:k * hop_length + num_frames * hop_length] += pieces[:, k, :].ravel()
+        norm[k * hop_length:k * hop_length + num_frames * hop_length] += window_pieces[:, k, :].ravel()
+    start = n_fft // 2
+    out = out[start:start + length]
+    norm = norm[start:start + length]
+    return out / np.maximum(norm, 1e-8)
+
+
+def _level_db(spectrum: np.ndarray) -> np.ndarray:
+    return 20 * np.log10(np.abs(spectrum) + 1e-6)
+
+
+class NoiseProfile:
+    """
+    The stationary noise of a room's microphone: mean and standard deviation of the
+    level (dB) of every STFT bin over the quietest frames of a recording.
+    """
+
+    def __init__(self, sample_rate: int, mean_db: np.ndarray, std_db: np.ndarray,
+                 n_fft: int = NOISE_N_FFT, hop_length: int = NOISE_HOP_LENGTH,
+                 created_at: Optional[float] = None, source: Optional[str] = None):
+        self.sample_rate = sample_rate
+        self.mean_db = np.asarray(mean_db, dtype=np.float32)
+        self.std_db = np.asarray(std_db, dtype=np.float32)
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.created_at = created_at if created_at is not None else time.time()
+        self.source = source
+
+    @classmethod
+    def from_levels(cls, levels_db: np.ndarray, sample_rate: int, source: Optional[str] = None) -> "NoiseProfile":
+        """
+        The profile of noise-only frames, given as (num_frames, bins) levels in dB.
+        """
+        return cls(sample_rate, levels_db.mean(axis=0), levels_db.std(axis=0), source=source)
+
+    @property
+    def age_days(self) -> float:
+        return (time.time() - self.created_at) / 86400.0
+
+    def drift_db(self, other: "NoiseProfile") -> float:
+        """Mean absolute difference of the two noise floors, over all bins (dB)."""
+        return float(np.mean(np.abs(self.mean_db - other.mean_db)))
+
+    def fingerprint(self) -> str:
+        """A short hash of the profile, used in the cache key of the preprocess stage."""
+        payload = json.dumps(self.to_dict(), sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def to_dict(self) -> Dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "n_fft": self.n_fft,
+            "hop_length": self.hop_length,
+            "mean_db": [round(float(v), 3) for v in self.mean_db],
+            "std_db": [round(float(v), 3) for v in self.std_db],
+            "created_at": self.created_at,
+            "source": self.source,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "NoiseProfile":
+        return cls(
+            data["sample_rate"], data["mean_db"], data["std_db"],
+            n_fft=data["n_fft"], hop_length=data["hop_length"],
+            created_at=data["created_at"], source=data.get("source")
+        )
+
+
+def quietest_frame_levels(y: np.ndarray, n_fft: int = NOISE_N_FFT, hop_length: int = NOISE_HOP_LENGTH,
+                          fraction: float = 0.1) -> np.ndarray:
+    """
+    Levels (dB) of the quietest `fraction` of the STFT frames of `y`: (frames, bins).
+    """
+    levels = _level_db(_stft(y, n_fft, hop_length))
+    if not len(levels):
+        return levels
+    count = max(1, int(len(levels) * fraction))
+    return levels[np.argsort(levels.mean(axis=1))[:count]]
+
+
+def estimate_noise_profile(y: np.ndarray, sample_rate: int, source: Optional[str] = None) -> NoiseProfile:
+    """
+    Estimates a noise profile from the quietest frames of a recording (or a block of one).
+    """
+    return NoiseProfile.from_levels(quietest_frame_levels(y), sample_rate, source=source)
+
+
+def spectral_gate(y: np.ndarray, profile: NoiseProfile) -> np.ndarray:
+    """
+    Stationary spectral gating against a stored profile, vectorised over the whole
+    signal: bins that do not rise NOISE_N_STD_THRESH standard deviations above the
+    profile's level are attenuated, through a mask smoothed over frequency and time.
+
+    :param y: Mono samples at `profile.sample_rate` (any scale; the profile's scale).
+    :return: The denoised samples, same length as `y`.
+    """
+    spectrum = _stft(y, profile.n_fft, profile.hop_length)
+    if not len(spectrum):
+        return y.astype(np.float32)
+    threshold = profile.mean_db + NOISE_N_STD_THRESH * profile.std_db
+    mask = (_level_db(spectrum) > threshold).astype(np.float32)
+    smooth_bins = max(1, int(round(NOISE_MASK_SMOOTH_HZ / (profile.sample_rate / profile.n_fft))))
+    smooth_frames = max(1, int(round(NOISE_MASK_SMOOTH_MS / 1000.0 * profile.sample_rate / profile.hop_length)))
+    mask = uniform_filter(mask, size=(smooth_frames, 2 * smooth_bins + 1), mode="nearest")
+    gain = 1.0 - NOISE_PROP_DECREASE * (1.0 - mask)
+    return _istft(spectrum * gain, profile.n_fft, profile.hop_length, len(y))
+
+
+class RoomNoiseReducer:
+    """
+    The `denoiser` of scripts/preprocess.preprocess_audio_streaming for recordings of a
+    room with a stored noise profile.
+
+    The first window decides: if the profile matches this recording's noise floor,
+    every window is gated against it (`spectral_gate`); otherwise (or without a profile)
+    the adaptive noisereduce path is used. Either way the quietest frames are collected,
+    so `estimated_profile` can replace a missing or stale profile afterwards.
+    """
+
+    def __init__(self, profile: Optional[NoiseProfile] = None,
+                 max_drift_db: float = NOISE_PROFILE_MAX_DRIFT_DB,
+                 profile_seconds: float = NOISE_PROFILE_SECONDS):
+        self.profile = profile
+        self.max_drift_db = max_drift_db
+        self.profile_seconds = profile_seconds
+        self.used_profile = None      # decided on the first window
+        self.drift = None
+        self.sample_rate = None
+        self._quiet_levels = None
+
+    def _collect(self, window: np.ndarray):
+        levels = _level_db(_stft(window, NOISE_N_FFT, NOISE_HOP_LENGTH))
+        if self._quiet_levels is not None:
+            levels = np.concatenate([self._quiet_levels, levels])
+        max_frames = max(1, int(self.profile_seconds * self.sample_rate / NOISE_HOP_LENGTH))
+        self._quiet_levels = levels[np.sort(np.argsort(levels.mean(axis=1))[:max_frames])]
+
+    def __call__(self, window: np.ndarray, sample_rate: int) -> np.ndarray:
+        if self.used_profile is None:
+            self.sample_rate = sample_rate
+            self.used_profile = False
+            if self.profile is not None and self.profile.sample_rate == sample_rate:
+                self.drift = self.profile.drift_db(estimate_noise_profile(window, sample_rate))
+                self.used_profile = self.drift <= self.max_drift_db
+        self._collect(window)
+        if self.used_profile:
+            return spectral_gate(window, self.profile)
+        import noisereduce as nr
+        return nr.reduce_noise(y=window, sr=sample_rate)
+
+    def estimated_profile(self, source: Optional[str] = None) -> Optional[NoiseProfile]:
+        """
+        The noise profile of the audio seen so far (None before any window).
+        """
+        if self._quiet_levels is None or not len(self._quiet_levels):
+            return None
+        return NoiseProfile.from_levels(self._quiet_levels, self.sample_rate, source=source)
+
+
+class NoiseProfileStore:
+    """
+    A persistent SQLite store of one NoiseProfile per (room, sample rate). The database
+    may be shared by several worker processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS noise_profiles ("
+            " room TEXT NOT NULL,"
+            " sample_rate INTEGER NOT NULL,"
+            " profile TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (room, sample_rate))"
+        )
+        self._conn.commit()
+
+    def get(self, room: str, sample_rate: int) -> Optional[NoiseProfile]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT profile FROM noise_profiles WHERE room = ? AND sample_rate = ?", (room, sample_rate)
+            ).fetchone()
+        return NoiseProfile.from_dict(json.loads(row[0])) if row else None
+
+    def put(self, room: str, profile: NoiseProfile):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO noise_profiles VALUES (?, ?, ?, ?)",
+                (room, profile.sample_rate, json.dumps(profile.to_dict()), profile.created_at)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
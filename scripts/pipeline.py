@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Iterator, Optional
+
+# Items a stage may run ahead of its consumer. Bounded queues keep a fast producer
+# (e.g. cached transcription) from piling up work in memory.
+DEFAULT_QUEUE_SIZE = 4
+
+# Marks the end of a stage's output
+_END = object()
+
+
+class PipelineStage(threading.Thread):
+    """
+    One stage of a producer/consumer pipeline, running in its own thread.
+
+    The stage takes items from `inputs` (any iterable, e.g. a generator, or another
+    PipelineStage), applies `fn` to each and puts the results on a bounded queue that
+    the next stage (or the caller) reads through `results()`. An exception in a stage
+    ends its output and is re-raised by `results()`, so it propagates down the pipeline.
+
+    Heavy stage work (Whisper/torch inference, numpy/librosa) releases the GIL, so
+    stages overlap in time even though they are threads.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        inputs: Iterable,
+        fn: Optional[Callable] = None,
+        queue_size: int = DEFAULT_QUEUE_SIZE
+    ):
+        """
+        :param name: Stage name (used in timing reports).
+        :param inputs: Where the stage's items come from.
+        :param fn: Function applied to each item (None passes items through, for a
+                   stage whose work happens while producing `inputs`).
+        :param queue_size: Maximum number of results waiting for the consumer.
+        """
+        super().__init__(name=name, daemon=True)
+        self.inputs = inputs
+        self.fn = fn
+        self.output = queue.Queue(maxsize=queue_size)
+        self.error: Optional[BaseException] = None
+        self.items = 0
+        # Time spent producing and processing items (excluding time waiting on other stages)
+        self.busy_seconds = 0.0
+
+    def run(self):
+        try:
+            source = self.inputs.results() if isinstance(self.inputs, PipelineStage) else iter(self.inputs)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(source)
+                except StopIteration:
+                    break
+                # Waiting on an upstream stage is not this stage's work
+                if isinstance(self.inputs, PipelineStage):
+                    start = time.perf_counter()
+                result = self.fn(item) if self.fn is not None else item
+                self.busy_seconds += time.perf_counter() - start
+                self.items += 1
+                self.output.put(result)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.output.put(_END)
+
+    def results(self) -> Iterator:
+        """
+        Yields the stage's results in order, then re-raises the stage's error, if any.
+        """
+        while True:
+            item = self.output.get()
+            if item is _END:
+                break
+            yield item
+        self.join()
+        if self.error is not None:
+            raise self.error
+
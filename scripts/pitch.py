@@ -0,0 +1,199 @@
+from typing import List, Optional, Tuple
+
+import librosa
+import numpy as np
+
+# Pitch search range used by every backend
+PITCH_FMIN = librosa.note_to_hz('C2')   # ~65.4 Hz
+PITCH_FMAX = librosa.note_to_hz('C6')   # ~1046.5 Hz
+
+# Available pitch trackers:
+#   "pyin"       - librosa.pyin over the whole signal at its native rate (reference, slowest)
+#   "pyin_gated" - librosa.pyin only over loud regions; silent frames are unvoiced
+#   "yin"        - vectorised YIN on a signal downsampled to YIN_SAMPLE_RATE, loud frames only
+PITCH_BACKENDS = ("pyin", "pyin_gated", "yin")
+DEFAULT_PITCH_BACKEND = "pyin"
+
+# YIN settings: 8 kHz still resolves PITCH_FMAX (Nyquist 4 kHz), and a 512-sample
+# frame with a 256-sample window covers lags up to 256 samples (> one period of PITCH_FMIN).
+YIN_SAMPLE_RATE = 8000
+YIN_FRAME_LENGTH = 512
+YIN_HOP_LENGTH = 128
+YIN_THRESHOLD = 0.15
+YIN_FRAMES_PER_CHUNK = 4096     # bounds the memory of the vectorised difference function
+
+# Frames quieter than this are never voiced: max(SILENCE_RMS_FLOOR, SILENCE_GATE_FACTOR * noise floor),
+# where the noise floor is the 20th percentile of frame RMS.
+SILENCE_RMS_FLOOR = 0.005
+SILENCE_GATE_FACTOR = 2.0
+# Loud regions closer than this are merged before running pyin on them.
+GATED_REGION_MERGE_FRAMES = 8
+
+
+def loudness_gate(rms: np.ndarray) -> np.ndarray:
+    """
+    Returns a boolean mask of frames loud enough to possibly contain voice.
+    """
+    if len(rms) == 0:
+        return np.zeros(0, dtype=bool)
+    threshold = max(SILENCE_RMS_FLOOR, SILENCE_GATE_FACTOR * float(np.percentile(rms, 20)))
+    return rms > threshold
+
+
+def mask_to_regions(mask: np.ndarray, merge_gap: int = 0) -> List[Tuple[int, int]]:
+    """
+    Converts a boolean frame mask into [start, end) frame regions, merging regions
+    separated by at most `merge_gap` frames.
+    """
+    if not mask.any():
+        return []
+    padded = np.concatenate([[False], mask, [False]]).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    regions = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if regions and start - regions[-1][1] <= merge_gap:
+            regions[-1] = (regions[-1][0], int(end))
+        else:
+            regions.append((int(start), int(end)))
+    return regions
+
+
+def _pyin(y: np.ndarray, sr: int, frame_length: int, hop_length: int):
+    f0, voiced_flag, _ = librosa.pyin(
+        y,
+        sr=sr,
+        fmin=PITCH_FMIN,
+        fmax=PITCH_FMAX,
+        frame_length=frame_length,
+        hop_length=hop_length
+    )
+    return f0, voiced_flag
+
+
+def _pyin_gated(y: np.ndarray, sr: int, frame_length: int, hop_length: int, num_frames: int, loud: np.ndarray):
+    f0 = np.full(num_frames, np.nan)
+    voiced = np.zeros(num_frames, dtype=bool)
+    for start, end in mask_to_regions(loud, merge_gap=GATED_REGION_MERGE_FRAMES):
+        # Frame k of the region's pyin is centred on sample (start + k) * hop_length,
+        # i.e. it is global frame start + k.
+        first_sample = start * hop_length
+        last_sample = min(len(y), end * hop_length)
+        if last_sample - first_sample < frame_length:
+            continue
+        region_f0, region_voiced = _pyin(y[first_sample:last_sample], sr, frame_length, hop_length)
+        count = min(len(region_f0), num_frames - start)
+        f0[start:start + count] = region_f0[:count]
+        voiced[start:start + count] = region_voiced[:count]
+    return f0, voiced
+
+
+def _yin_cmndf(frames: np.ndarray, window: int) -> np.ndarray:
+    """
+    Cumulative mean normalised difference function of YIN for a block of frames.
+
+    :param frames: Array of shape (num_frames, frame_length).
+    :param window: Integration window (lags go up to frame_length - window).
+    :return: Array of shape (num_frames, frame_length - window + 1).
+    """
+    frame_length = frames.shape[1]
+    max_lag = frame_length - window
+    n_fft = 1 << int(np.ceil(np.log2(frame_length + window)))
+    # r(tau) = sum_{j < window} x_j * x_{j + tau}, for every lag at once
+    spectrum = np.fft.rfft(frames, n_fft, axis=1)
+    head_spectrum = np.fft.rfft(frames[:, :window], n_fft, axis=1)
+    acf = np.fft.irfft(spectrum * np.conj(head_spectrum), n_fft, axis=1)[:, :max_lag + 1]
+    # e(tau) = sum_{j < window} x_{j + tau}^2
+    cumulative = np.concatenate(
+        [np.zeros((frames.shape[0], 1)), np.cumsum(frames ** 2, axis=1)], axis=1
+    )
+    energy = cumulative[:, window:window + max_lag + 1] - cumulative[:, :max_lag + 1]
+    diff = np.maximum(energy[:, :1] + energy - 2 * acf, 0.0)
+    # d'(tau) = d(tau) * tau / sum_{1..tau} d, with d'(0) = 1
+    cmndf = np.ones_like(diff)
+    running = np.cumsum(diff[:, 1:], axis=1)
+    lags = np.arange(1, max_lag + 1)
+    cmndf[:, 1:] = diff[:, 1:] * lags / np.maximum(running, np.finfo(float).tiny)
+    return cmndf
+
+
+def _yin(y: np.ndarray, sr: int, hop_length: int, num_frames: int, loud: np.ndarray):
+    y_low = librosa.resample(y, orig_sr=sr, target_sr=YIN_SAMPLE_RATE)
+    padded = np.pad(y_low, YIN_FRAME_LENGTH // 2)
+    window = YIN_FRAME_LENGTH // 2
+    min_lag = max(1, int(np.floor(YIN_SAMPLE_RATE / PITCH_FMAX)))
+    max_lag = min(YIN_FRAME_LENGTH - window - 1, int(np.ceil(YIN_SAMPLE_RATE / PITCH_FMIN)))
+
+    f0 = np.full(num_frames, np.nan)
+    voiced = np.zeros(num_frames, dtype=bool)
+    # Global frame i is centred at i * hop_length / sr seconds; take the YIN frame centred there.
+    centers = np.round(np.arange(num_frames) * hop_length * YIN_SAMPLE_RATE / sr).astype(int)
+    wanted = np.flatnonzero(loud & (centers + YIN_FRAME_LENGTH <= len(padded)))
+
+    for chunk_start in range(0, len(wanted), YIN_FRAMES_PER_CHUNK):
+        indices = wanted[chunk_start:chunk_start + YIN_FRAMES_PER_CHUNK]
+        frames = padded[centers[indices][:, None] + np.arange(YIN_FRAME_LENGTH)].astype(np.float64)
+        cmndf = _yin_cmndf(frames, window)[:, min_lag:max_lag + 1]
+
+        # First local minimum below the threshold, else the global minimum (unvoiced)
+        below = cmndf < YIN_THRESHOLD
+        is_trough = np.zeros_like(below)
+        is_trough[:, :-1] = cmndf[:, :-1] <= cmndf[:, 1:]
+        candidates = below & is_trough
+        has_candidate = candidates.any(axis=1)
+        best = np.where(has_candidate, np.argmax(candidates, axis=1), np.argmin(cmndf, axis=1))
+
+        # Parabolic interpolation around the chosen lag
+        rows = np.arange(len(indices))
+        left = cmndf[rows, np.maximum(best - 1, 0)]
+        center = cmndf[rows, best]
+        right = cmndf[rows, np.minimum(best + 1, cmndf.shape[1] - 1)]
+        denominator = left - 2 * center + right
+        shift = np.where(np.abs(denominator) > 1e-12, 0.5 * (left - right) / denominator, 0.0)
+        lag = min_lag + best + np.clip(shift, -1.0, 1.0)
+
+        f0[indices] = np.where(has_candidate, YIN_SAMPLE_RATE / lag, np.nan)
+        voiced[indices] = has_candidate
+    return f0, voiced
+
+
+def track_pitch(
+    y: np.ndarray,
+    sr: int,
+    frame_length: int,
+    hop_length: int,
+    rms: np.ndarray,
+    backend: str = DEFAULT_PITCH_BACKEND,
+    frame_mask: Optional[np.ndarray] = None
+):
+    """
+    Estimates the fundamental frequency of every frame with the chosen backend.
+
+    Every backend returns frames on the same grid as librosa.pyin with center=True
+    (frame i centred on sample i * hop_length), so results are interchangeable.
+
+    :param y: Mono audio samples.
+    :param sr: Sample rate of `y`.
+    :param frame_length: Analysis frame length (used by the pyin backends).
+    :param hop_length: Hop between frames.
+    :param rms: RMS per frame on that grid (used to skip silent frames).
+    :param backend: One of PITCH_BACKENDS.
+    :param frame_mask: Optional boolean mask of the frames to analyse (e.g. speech regions
+                       from scripts/vad.py); frames outside it are reported as unvoiced.
+    :return: (f0, voiced): f0 in Hz per frame (NaN when unvoiced) and the voicing mask.
+    """
+    num_frames = 1 + len(y) // hop_length
+    if backend == "pyin":
+        if frame_mask is None:
+            return _pyin(y, sr, frame_length, hop_length)
+        # pyin over the masked regions only
+        return _pyin_gated(y, sr, frame_length, hop_length, num_frames, frame_mask[:num_frames])
+    loud = loudness_gate(rms[:num_frames])
+    if len(loud) < num_frames:
+        loud = np.concatenate([loud, np.zeros(num_frames - len(loud), dtype=bool)])
+    if frame_mask is not None:
+        loud &= frame_mask[:num_frames]
+    if backend == "pyin_gated":
+        return _pyin_gated(y, sr, frame_length, hop_length, num_frames, loud)
+    if backend == "yin":
+        return _yin(y, sr, hop_length, num_frames, loud)
+    raise ValueError(f"Unknown pitch backend '{backend}'; expected one of {PITCH_BACKENDS}")
@@ -1,13 +1,60 @@
 import os
+import subprocess
+import wave
+from typing import Callable, Optional
 from pydub import AudioSegment
+from pydub.utils import mediainfo
 import noisereduce as nr
 import numpy as np
 
+from scripts.audio_buffer import (
+    CANONICAL_SAMPLE_RATE, AudioBuffer, AudioBufferWriter, buffer_path_for, header_path_for, open_audio_buffer
+)
+from scripts.cache import ArtifactCache, release_output
+from scripts.noise_profile import NOISE_PROFILE_MAX_AGE_DAYS, NoiseProfileStore, RoomNoiseReducer
+
+# Streaming preprocessing settings.
+# Each block is denoised together with `overlap` seconds of raw audio on both sides,
+# and only the block itself is written out. noisereduce's non-stationary gate smooths
+# its noise estimate over `time_constant_s` (2 s by default), so an overlap of at least
+# that long gives every output sample the same context the whole-file path would see.
+STREAM_BLOCK_SECONDS = 30.0
+STREAM_OVERLAP_SECONDS = 2.0
+# How much of the quietest audio seen so far is kept as the noise profile
+# in stationary mode (carried from block to block).
+NOISE_PROFILE_SECONDS = 2.0
+NOISE_FRAME_SECONDS = 0.05
+# Tolerance for "equivalent output": the streamed file must match the whole-file
+# `preprocess_audio` output with a signal-to-difference ratio of at least this many dB.
+STREAMING_TOLERANCE_SNR_DB = 30.0
+
+
+def _to_pcm(samples: np.ndarray, sample_width: int) -> np.ndarray:
+    """
+    Rounds float samples on the integer scale of `sample_width` to PCM integers.
+    """
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}.get(sample_width, np.int16)
+    info = np.iinfo(dtype)
+    return np.clip(np.round(samples), info.min, info.max).astype(dtype)
+
+
+def _pcm_to_float(pcm: np.ndarray) -> np.ndarray:
+    """
+    PCM integers -> float32 in [-1, 1], scaled like librosa and whisper.load_audio
+    scale the WAV file, so the canonical buffer holds the same values they would decode.
+    """
+    return pcm.astype(np.float32) / float(-int(np.iinfo(pcm.dtype).min))
+
+
 def preprocess_audio(input_file: str, output_file: str = "processed.wav") -> str:
     """
-    Preprocess an audio file by converting to mono, 
-    reducing noise, and saving as a WAV file.
-    
+    Preprocess an audio file by converting to mono,
+    reducing noise, and saving as a WAV file. The canonical buffer of later stages
+    (scripts/audio_buffer.py) is written next to it.
+
+    This decodes the whole recording into memory; see `preprocess_audio_streaming`
+    for long recordings.
+
     :param input_file: Path to the input audio file (e.g., 'recording.mp3' or 'recording.wav').
     :param output_file: Path where the processed file will be saved.
     :return: The path to the processed audio file.
@@ -25,24 +72,373 @@ def preprocess_audio(input_file: str, output_file: str = "processed.wav") -> str
     reduced_noise = nr.reduce_noise(y=samples, sr=audio_mono.frame_rate)
 
     # 5. Convert the processed samples back to a pydub AudioSegment
+    pcm = _to_pcm(reduced_noise, audio_mono.sample_width)
     processed_audio = AudioSegment(
-        reduced_noise.tobytes(),
+        pcm.tobytes(),
         frame_rate=audio_mono.frame_rate,
         sample_width=audio_mono.sample_width,
         channels=1
     )
 
     # 6. Export the processed file as WAV
+    release_output(output_file)
     processed_audio.export(output_file, format="wav")
 
+    # 7. Write the canonical 16 kHz buffer from the same samples
+    with AudioBufferWriter(buffer_path_for(output_file), audio_mono.frame_rate, source=input_file) as writer:
+        writer.write(_pcm_to_float(pcm))
+
     return output_file
 
-def maybe_preprocess_audio(input_file: str, preprocessed_file="processed.wav"):
-    # if the preprocessed file already exists, skip
-    if os.path.exists(preprocessed_file):
-        print(f"Skipping preprocessing; '{preprocessed_file}' already exists.")
+
+def iter_pcm_blocks(input_file: str, sample_rate: int, block_samples: int):
+    """
+    Decodes an audio file with ffmpeg and yields it as mono float32 blocks
+    (on the int16 scale), without ever holding the whole recording in memory.
+
+    :param input_file: Path to the input audio file.
+    :param sample_rate: Output sample rate (use the file's native rate to avoid resampling).
+    :param block_samples: Number of samples per yielded block (the last block may be shorter).
+    """
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", input_file,
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ac", "1",                 # downmix to mono
+        "-ar", str(sample_rate),
+        "-"
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    block_bytes = block_samples * 2
+    finished = False
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        finished = True
+    finally:
+        if not finished:
+            # The consumer stopped early (an exception, or the generator was closed):
+            # stop ffmpeg without raising over the original exception or a normal close()
+            process.terminate()
+        process.stdout.close()
+        stderr = process.stderr.read().decode(errors="replace")
+        process.stderr.close()
+        returncode = process.wait()
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode '{input_file}': {stderr.strip()}")
+
+
+def _update_noise_frames(noise_frames: np.ndarray, samples: np.ndarray, frame_len: int, max_frames: int) -> np.ndarray:
+    """
+    Keeps the `max_frames` quietest frames seen so far (existing profile plus `samples`).
+    This is how the stationary noise profile is carried across block boundaries.
+    """
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return noise_frames
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    candidates = np.concatenate([noise_frames, frames]) if len(noise_frames) else frames
+    energy = np.mean(candidates ** 2, axis=1)
+    keep = np.sort(np.argsort(energy)[:max_frames])
+    return candidates[keep]
+
+
+def preprocess_audio_streaming(
+    input_file: str,
+    output_file: str = "processed.wav",
+    block_seconds: float = STREAM_BLOCK_SECONDS,
+    overlap_seconds: float = STREAM_OVERLAP_SECONDS,
+    stationary: bool = False,
+    noise_profile_seconds: float = NOISE_PROFILE_SECONDS,
+    denoiser: Optional[Callable[[np.ndarray, int], np.ndarray]] = None
+) -> str:
+    """
+    Preprocess an audio file like `preprocess_audio` (mono, noise reduction, WAV),
+    but decode, denoise and write it in fixed-size overlapping blocks so that
+    peak memory depends on `block_seconds`, not on the length of the recording.
+
+    Each block is denoised with `overlap_seconds` of raw audio before and after it,
+    and only the block itself is written. In the default (non-stationary) mode the
+    output matches `preprocess_audio` within STREAMING_TOLERANCE_SNR_DB
+    (see `compare_audio_files`). In stationary mode the noise profile is built from
+    the quietest frames seen so far and carried across blocks.
+
+    Each written block is also resampled into the canonical buffer of later stages
+    (scripts/audio_buffer.py), next to `output_file`.
+
+    :param input_file: Path to the input audio file (e.g., 'recording.mp3' or 'recording.wav').
+    :param output_file: Path where the processed 16-bit WAV file will be saved.
+    :param block_seconds: Length of each output block.
+    :param overlap_seconds: Context added on each side of a block before denoising.
+    :param stationary: Use stationary spectral gating with a carried noise profile.
+    :param noise_profile_seconds: Length of the carried noise profile (stationary mode).
+    :param denoiser: Called as denoiser(window, sample_rate) instead of noisereduce
+                     (e.g. a scripts/noise_profile.RoomNoiseReducer).
+    :return: The path to the processed audio file.
+    """
+    sample_rate = get_sample_rate(input_file)
+    block_len = max(1, int(block_seconds * sample_rate))
+    overlap_len = int(overlap_seconds * sample_rate)
+    frame_len = max(1, int(NOISE_FRAME_SECONDS * sample_rate))
+    max_noise_frames = max(1, int(noise_profile_seconds / NOISE_FRAME_SECONDS))
+
+    noise_frames = np.zeros((0, frame_len), dtype=np.float32)
+    left = np.zeros(0, dtype=np.float32)       # raw context before the current block
+    pending = np.zeros(0, dtype=np.float32)    # raw samples not yet written
+
+    def denoise(window: np.ndarray) -> np.ndarray:
+        nonlocal noise_frames
+        if denoiser is not None:
+            return denoiser(window, sample_rate)
+        if not stationary:
+            return nr.reduce_noise(y=window, sr=sample_rate)
+        noise_frames = _update_noise_frames(noise_frames, window, frame_len, max_noise_frames)
+        y_noise = noise_frames.ravel() if len(noise_frames) else None
+        return nr.reduce_noise(y=window, sr=sample_rate, y_noise=y_noise, stationary=True)
+
+    buffer_writer = AudioBufferWriter(buffer_path_for(output_file), sample_rate, source=input_file)
+    release_output(output_file)
+    with wave.open(output_file, "wb") as wf, buffer_writer:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+
+        def write(samples: np.ndarray):
+            pcm = _to_pcm(samples, 2)
+            wf.writeframes(pcm.tobytes())
+            buffer_writer.write(_pcm_to_float(pcm))
+
+        for block in iter_pcm_blocks(input_file, sample_rate, block_len):
+            pending = np.concatenate([pending, block])
+            # Only write a block once its right-hand context has been decoded
+            while len(pending) >= block_len + overlap_len:
+                window = np.concatenate([left, pending[:block_len + overlap_len]])
+                reduced = denoise(window)
+                write(reduced[len(left):len(left) + block_len])
+                left = pending[max(0, block_len - overlap_len):block_len]
+                pending = pending[block_len:]
+
+        # Flush the tail (shorter than a block plus its context)
+        if len(pending):
+            window = np.concatenate([left, pending])
+            reduced = denoise(window)
+            write(reduced[len(left):])
+
+    return output_file
+
+
+def _read_wav_as_float(wav_file: str) -> np.ndarray:
+    with wave.open(wav_file, "rb") as wf:
+        width = wf.getsampwidth()
+        data = wf.readframes(wf.getnframes())
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[width]
+    return np.frombuffer(data, dtype=dtype).astype(np.float64) / np.iinfo(dtype).max
+
+
+def compare_audio_files(reference_file: str, candidate_file: str) -> dict:
+    """
+    Compares two mono WAV files sample by sample (e.g., the whole-file and the
+    streamed preprocessing output).
+
+    :return: A dict with the max absolute difference (full scale = 1.0), the
+             signal-to-difference ratio in dB, and whether it is within
+             STREAMING_TOLERANCE_SNR_DB.
+    """
+    reference = _read_wav_as_float(reference_file)
+    candidate = _read_wav_as_float(candidate_file)
+    n = min(len(reference), len(candidate))
+    diff = reference[:n] - candidate[:n]
+    signal_power = np.mean(reference[:n] ** 2) if n else 0.0
+    diff_power = np.mean(diff ** 2) if n else 0.0
+    if diff_power == 0:
+        snr_db = float("inf")
+    elif signal_power == 0:
+        snr_db = float("-inf")
+    else:
+        snr_db = float(10 * np.log10(signal_power / diff_power))
+    return {
+        "num_samples": int(n),
+        "length_difference": int(len(reference) - len(candidate)),
+        "max_abs_diff": float(np.max(np.abs(diff))) if n else 0.0,
+        "snr_db": snr_db,
+        "within_tolerance": snr_db >= STREAMING_TOLERANCE_SNR_DB and len(reference) == len(candidate),
+    }
+
+
+def _preprocess_files(preprocessed_file: str) -> dict:
+    """
+    Cached artifact name -> path of every file the preprocess stage produces.
+    """
+    buffer_path = buffer_path_for(preprocessed_file)
+    return {
+        "processed.wav": preprocessed_file,
+        "processed.f32": buffer_path,
+        "processed.f32.json": header_path_for(buffer_path),
+    }
+
+
+def get_preprocess_params(streaming: bool = True, noise_profile=None, room_profiles: bool = False) -> dict:
+    """
+    Returns the preprocessing settings that affect the output (part of the cache key).
+
+    :param noise_profile: The stored room NoiseProfile the recording is denoised against, if any.
+    :param room_profiles: Preprocessing goes through a store of room noise profiles. Without a
+                          stored profile, the room's profile is estimated from this recording,
+                          so a result cached without the store must not be reused.
+    """
+    if not streaming:
+        return {"mode": "whole_file"}
+    params = {
+        "mode": "streaming",
+        "block_seconds": STREAM_BLOCK_SECONDS,
+        "overlap_seconds": STREAM_OVERLAP_SECONDS,
+        "stationary": False,
+    }
+    if noise_profile is not None:
+        params["noise_profile"] = noise_profile.fingerprint()
+    elif room_profiles:
+        params["noise_profile"] = "estimate"
+    return params
+
+
+def ensure_audio_buffer(audio_file: str) -> AudioBuffer:
+    """
+    Opens the canonical buffer of a preprocessed file, first writing it (decoded and
+    resampled once with ffmpeg) if the file was produced without one.
+
+    :param audio_file: The preprocessed file (e.g. 'processed.wav').
+    :return: The memory-mapped AudioBuffer.
+    """
+    audio_buffer = open_audio_buffer(audio_file)
+    if audio_buffer is not None:
+        return audio_buffer
+    buffer_path = buffer_path_for(audio_file)
+    with AudioBufferWriter(buffer_path, CANONICAL_SAMPLE_RATE, source=audio_file) as writer:
+        block_len = int(STREAM_BLOCK_SECONDS * CANONICAL_SAMPLE_RATE)
+        for block in iter_pcm_blocks(audio_file, CANONICAL_SAMPLE_RATE, block_len):
+            writer.write(block / 32768.0)
+    return AudioBuffer(buffer_path)
+
+
+def _preprocess_with_room_profile(
+    input_file: str,
+    preprocessed_file: str,
+    reducer: RoomNoiseReducer,
+    noise_profiles: NoiseProfileStore,
+    room: str
+):
+    """
+    Streams `input_file` through `reducer`, then replaces the room's profile with one
+    estimated from this recording if the stored one was missing or did not match.
+    """
+    preprocess_audio_streaming(input_file, preprocessed_file, denoiser=reducer)
+    if reducer.used_profile:
+        print(f"Denoised with the stored noise profile of room '{room}'.")
+        return
+    if reducer.drift is not None:
+        print(f"The noise floor is {reducer.drift:.1f} dB away from the stored profile of room '{room}'; "
+              f"used adaptive noise reduction.")
+    profile = reducer.estimated_profile(source=os.path.abspath(input_file))
+    if profile is not None:
+        noise_profiles.put(room, profile)
+        print(f"Stored a new noise profile for room '{room}'.")
+
+
+def maybe_preprocess_audio(
+    input_file: str,
+    preprocessed_file="processed.wav",
+    streaming: bool = True,
+    cache: Optional[ArtifactCache] = None,
+    noise_profiles: Optional[NoiseProfileStore] = None,
+    room: Optional[str] = None
+):
+    """
+    Preprocess `input_file` into `preprocessed_file`, reusing a cached result when the
+    same input audio was already preprocessed with the same settings.
+
+    :param input_file: Path to the input audio file.
+    :param preprocessed_file: Where the processed WAV file is placed (its canonical
+                              buffer, see scripts/audio_buffer.py, is placed next to it).
+    :param streaming: Use the block-by-block path (default) instead of the whole-file path.
+    :param cache: Artifact cache to look up / store the result in (None disables caching).
+    :param noise_profiles: Store of per-room noise profiles (scripts/noise_profile.py). When given,
+                           the recording is gated against its room's stored stationary profile;
+                           if that is missing, older than NOISE_PROFILE_MAX_AGE_DAYS or does not match
+                           the recording's noise floor, the adaptive path runs and the room's profile
+                           is re-estimated from this recording. Implies the streaming path.
+    :param room: The recording's room (required with `noise_profiles`; when it is unknown,
+                 pass no store, so that unrelated microphones do not share a profile).
+    :return: The path to the processed audio file.
+    """
+    reducer = None
+    profile = None
+    if noise_profiles is not None:
+        streaming = True
+        profile = noise_profiles.get(room, get_sample_rate(input_file))
+        if profile is not None and profile.age_days > NOISE_PROFILE_MAX_AGE_DAYS:
+            print(f"The noise profile of room '{room}' is {profile.age_days:.0f} days old; re-estimating it.")
+            profile = None
+        reducer = RoomNoiseReducer(profile)
+
+    def run():
+        if reducer is not None:
+            _preprocess_with_room_profile(input_file, preprocessed_file, reducer, noise_profiles, room)
+        elif streaming:
+            preprocess_audio_streaming(input_file, preprocessed_file)
+        else:
+            preprocess_audio(input_file, preprocessed_file)
+
+    if cache is None:
+        run()
+        return preprocessed_file
+
+    params = get_preprocess_params(streaming, noise_profile=profile, room_profiles=noise_profiles is not None)
+    input_key = cache.input_key(input_file)
+    entry = cache.lookup("preprocess", input_key, params)
+    if entry is not None:
+        print(f"Skipping preprocessing; reusing cached result for '{input_file}'.")
+        for name, dest in _preprocess_files(preprocessed_file).items():
+            cache.materialize(entry, name, dest)
         return preprocessed_file
-    
-    # otherwise, call your `preprocess_audio` function
-    return preprocess_audio(input_file, preprocessed_file)
 
+    run()
+    cache.store(
+        "preprocess", input_key, params,
+        files=_preprocess_files(preprocessed_file),
+        metadata={"source": os.path.abspath(input_file)}
+    )
+    return preprocessed_file
+
+
+def get_sample_rate(audio_file: str) -> int:
+    """
+    Returns the native sample rate of an audio file (ffprobe through pydub; 16 kHz if unknown).
+    """
+    return int(mediainfo(audio_file).get("sample_rate") or 16000)
+
+
+def get_audio_duration(audio_file: str) -> float:
+    """
+    Returns the duration in seconds of an audio file without decoding it
+    (uses ffprobe through pydub).
+
+    :param audio_file: Path to the audio file (e.g., 'recording.mp3').
+    :return: Duration in seconds, or 0.0 if it cannot be determined.
+    """
+    info = mediainfo(audio_file)
+    try:
+        return float(info.get("duration", 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+if __name__ == "__main__":
+    # Example usage: compare the whole-file and streamed outputs
+    import sys
+    input_path = sys.argv[1] if len(sys.argv) > 1 else "recording.wav"
+    preprocess_audio(input_path, "processed_full.wav")
+    preprocess_audio_streaming(input_path, "processed_stream.wav")
+    print(compare_audio_files("processed_full.wav", "processed_stream.wav"))
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional
+
+from common.consts import ENGLISH_KEYWORDS, HEBREW_KEYWORDS
+from scripts.cascade import cheap_decision
+from scripts.keywords import get_english_matcher, get_hebrew_matcher
+from scripts.results import iter_results, read_results_header
+from scripts.tone_flags import (
+    HIGH_PITCH_THRESHOLD_HZ, LOUD_AMPLITUDE_THRESHOLD, TONE_DEVIATION_Z, deviation_flags, fixed_tone_flags
+)
+
+# The parts of a segment's analysis that are derived from stored model outputs, and
+# what each depends on. A results header records a fingerprint of every part
+# ("analysis_fingerprints"); `reanalyze_results` recomputes only the parts whose
+# fingerprint no longer matches, then re-decides which segments are problematic:
+#   "hebrew_keywords"  - HEBREW_KEYWORDS, matched on the stored Hebrew text
+#   "english_keywords" - ENGLISH_KEYWORDS, matched on the stored translation
+#   "tone_thresholds"  - the tone flag thresholds, applied to the stored tone stats
+#   "decision"         - the toxicity threshold of is_segment_problematic
+# Bump ANALYSIS_VERSION when the matching or flag logic itself changes.
+ANALYSIS_VERSION = 2
+ANALYSIS_PARTS = ("hebrew_keywords", "english_keywords", "tone_thresholds", "decision")
+
+# Models a segment may have left out under a cascade policy, which a re-decision needs
+# once the check that flagged the segment early no longer does
+DECISION_MODELS = ("translation", "english_toxic")
+
+
+def _fingerprint(value) -> str:
+    payload = json.dumps([ANALYSIS_VERSION, value], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def analysis_fingerprints(toxicity_threshold: float) -> Dict[str, str]:
+    """
+    The current fingerprint of every part in ANALYSIS_PARTS (stored in results headers).
+    """
+    return {
+        "hebrew_keywords": _fingerprint(HEBREW_KEYWORDS),
+        "english_keywords": _fingerprint(ENGLISH_KEYWORDS),
+        "tone_thresholds": _fingerprint([LOUD_AMPLITUDE_THRESHOLD, HIGH_PITCH_THRESHOLD_HZ, TONE_DEVIATION_Z]),
+        "decision": _fingerprint(toxicity_threshold),
+    }
+
+
+def changed_parts(header: Dict, fingerprints: Dict[str, str]) -> List[str]:
+    """
+    The parts whose stored fingerprint differs from `fingerprints` (all of them for
+    files written before fingerprints were stored).
+    """
+    stored = header.get("analysis_fingerprints") or {}
+    return [part for part in ANALYSIS_PARTS if stored.get(part) != fingerprints[part]]
+
+
+def _match_keywords(analysis: Dict, text_field: str, matcher) -> bool:
+    """
+    Re-runs a keyword matcher on the stored text of a Hebrew or English analysis.
+
+    :return: True if the found keywords changed.
+    """
+    if analysis.get(text_field) is None:
+        return False
+    keyword_matches = matcher.find(analysis[text_field])
+    found_keywords = matcher.keywords_from_matches(keyword_matches)
+    changed = found_keywords != analysis.get("found_keywords")
+    analysis["keyword_matches"] = keyword_matches
+    analysis["found_keywords"] = found_keywords
+    return changed
+
+
+def _reflag_tone(tone: Optional[Dict]):
+    if not tone:
+        return
+    if "tone_deviation" in tone:
+        tone["tone_flags"] = deviation_flags(tone["tone_deviation"])
+    else:
+        tone["tone_flags"] = fixed_tone_flags(tone["average_amplitude"], tone["average_pitch_hz"])
+
+
+def reanalyze_results(
+    results_path: str,
+    is_problematic: Callable[[Dict, Dict], bool],
+    fingerprints: Dict[str, str],
+    toxicity_threshold: Optional[float] = None
+) -> Optional[Dict]:
+    """
+    Brings a complete results file up to date with the current keyword lists and
+    thresholds, from its stored texts, model outputs and tone stats: no audio is read
+    and no model runs. Only the parts whose fingerprint changed are recomputed; every
+    segment is then re-decided with `is_problematic`, and the file is rewritten.
+
+    A segment that was flagged early under the "skip" or "defer" cascade policy may lose
+    that flag and lack the translation or toxicity it now needs. Those invocations are
+    moved to the segment's deferred list, so `complete_deferred_analyses` can run them;
+    the file stays marked as pending ("reanalysis_pending" in its header) until a later
+    reanalysis re-decides the segment with them.
+
+    :param results_path: A results.jsonl file (see scripts/results.py).
+    :param is_problematic: Decides a segment from (text analysis, tone analysis),
+                           e.g. `is_segment_problematic` (scripts/decision.py) with the new threshold.
+    :param fingerprints: The current fingerprints, from `analysis_fingerprints`.
+    :param toxicity_threshold: Stored in the header's settings, if given.
+    :return: {"changed_parts", "num_segments", "newly_problematic", "no_longer_problematic",
+              "pending"}, or None if the file was already up to date.
+    """
+    header = read_results_header(results_path)
+    parts = changed_parts(header, fingerprints)
+    if not parts and not header.get("reanalysis_pending"):
+        return None
+    records = list(iter_results(results_path))
+    if not records or records[-1].get("type") != "footer":
+        raise ValueError(f"'{results_path}' is incomplete; finish (or --resume) the recording first")
+    header, footer = records[0], records[-1]
+    segments = [r for r in records if r.get("type") == "segment"]
+
+    # 1) Keywords, on the stored Hebrew text and translation
+    for part, language, text_field, matcher in (
+        ("hebrew_keywords", "hebrew_analysis", "text_hebrew", get_hebrew_matcher()),
+        ("english_keywords", "english_analysis", "text_english", get_english_matcher()),
+    ):
+        if part in parts:
+            for record in segments:
+                _match_keywords(record["text_analysis"].get(language) or {}, text_field, matcher)
+
+    # 2) Tone flags, from the stored averages (or deviations from the baseline)
+    if "tone_thresholds" in parts:
+        _reflag_tone(header.get("global_tone"))
+        for record in segments:
+            _reflag_tone(record["tone_analysis"])
+
+    # 3) Re-decide every segment
+    stats = {"changed_parts": parts, "num_segments": len(segments),
+             "newly_problematic": 0, "no_longer_problematic": 0, "pending": 0}
+    num_problematic = num_deferred = 0
+    for record in segments:
+        analysis = record["text_analysis"]
+        problematic = is_problematic(analysis, record["tone_analysis"])
+        if problematic != record["problematic"]:
+            stats["newly_problematic" if problematic else "no_longer_problematic"] += 1
+        record["problematic"] = problematic
+        num_problematic += problematic
+
+        cascade = analysis.get("cascade")
+        if cascade is not None:
+            english = analysis.get("english_analysis") or {}
+            cascade["decided_by"] = cheap_decision(analysis["hebrew_analysis"], record["tone_analysis"]) or (
+                "english_keywords" if english.get("found_keywords") else None
+            )
+            if not problematic:
+                # An early decision that no longer holds: the left-out models are needed now
+                missing = [model for model in DECISION_MODELS if model in cascade["skipped"]]
+                cascade["skipped"] = [model for model in cascade["skipped"] if model not in missing]
+                cascade["deferred"].extend(missing)
+                if any(model in cascade["deferred"] for model in DECISION_MODELS):
+                    stats["pending"] += 1
+            num_deferred += bool(cascade["deferred"])
+
+    header["analysis_fingerprints"] = fingerprints
+    header["reanalysis_pending"] = stats["pending"]
+    if toxicity_threshold is not None:
+        header.setdefault("settings", {})["toxicity_threshold"] = toxicity_threshold
+    footer["num_problematic"] = num_problematic
+    if "num_deferred" in footer or num_deferred:
+        footer["num_deferred"] = num_deferred
+
+    # Write next to the file and swap, so a crash never leaves a half-written results file
+    tmp_path = results_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, results_path)
+    return stats
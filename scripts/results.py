@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+RESULTS_FILE = "results.jsonl"
+# The single indented JSON array written by older versions (see `export_legacy_json`)
+LEGACY_RESULTS_FILE = "results.json"
+RESULTS_FORMAT_VERSION = 1
+
+# Segments analyzed between two flushes of the results file. Large enough for the
+# text models to batch well, small enough that a crash loses little work.
+ANALYSIS_CHUNK_SEGMENTS = 256
+
+
+def results_fingerprint(segments: List[Dict], settings: Dict) -> str:
+    """
+    Identifies the input of a results file (the transcript segments and the analysis
+    settings), so a partial file is only resumed for exactly the same input.
+    """
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    for seg in segments:
+        digest.update(json.dumps([round(seg["start"], 3), round(seg["end"], 3), seg["text"]],
+                                 ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _read_complete_lines(path: str) -> List[Tuple[Dict, int]]:
+    """
+    Reads the JSON lines of a results file up to the first incomplete or invalid line.
+
+    :return: (record, byte offset just after the record) for every complete record.
+    """
+    records = []
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            offset += len(line)
+            records.append((record, offset))
+    return records
+
+
+class ResultsWriter:
+    """
+    Writes a recording's results as JSON lines, one record per line:
+
+      {"type": "header", ...}            recording, settings and global tone (written once)
+      {"type": "segment", "index": i, ...}  one per analyzed segment, flushed as it is written
+      {"type": "footer", ...}            written by `close` once every segment is in
+
+    A file without a footer is partial. With resume=True, a partial file whose header has
+    the same fingerprint is kept up to its last complete segment and writing continues
+    from there (`num_written` tells the caller where to start).
+    """
+
+    def __init__(self, path: str, header: Dict, resume: bool = False):
+        """
+        :param path: Where to write (e.g. '<output>/results.jsonl').
+        :param header: Header fields; should include "fingerprint" for resuming.
+        :param resume: Continue a partial file with the same fingerprint instead of starting over.
+        """
+        self.path = path
+        self.num_written = 0
+        self.num_problematic = 0
+        self.first_problematic: Optional[Dict] = None
+
+        kept_bytes = None
+        if resume and os.path.exists(path):
+            records = _read_complete_lines(path)
+            existing_header = records[0][0] if records else {}
+            if (existing_header.get("type") == "header"
+                    and existing_header.get("fingerprint") == header.get("fingerprint")
+                    and existing_header.get("version") == RESULTS_FORMAT_VERSION
+                    and not any(record.get("type") == "footer" for record, _ in records)):
+                kept_bytes = records[0][1]
+                for record, offset in records[1:]:
+                    if record.get("type") != "segment" or record.get("index") != self.num_written:
+                        break
+                    self._count(record)
+                    kept_bytes = offset
+
+        if kept_bytes is not None:
+            # Drop anything after the last complete segment (e.g. a half-written line)
+            with open(path, "r+b") as f:
+                f.truncate(kept_bytes)
+            self._file = open(path, "a", encoding="utf-8")
+        else:
+            self._file = open(path, "w", encoding="utf-8")
+            self._write_record(dict({"type": "header", "version": RESULTS_FORMAT_VERSION}, **header))
+
+    def _count(self, segment: Dict):
+        self.num_written += 1
+        if segment.get("problematic"):
+            self.num_problematic += 1
+            if self.first_problematic is None:
+                self.first_problematic = segment
+
+    def _write_record(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def write_segment(self, segment: Dict):
+        """
+        Appends one analyzed segment (as returned by main.analyze_segment) and flushes it.
+        """
+        record = dict({"type": "segment", "index": self.num_written}, **segment)
+        self._write_record(record)
+        self._count(record)
+
+    def close(self, summary: Optional[Dict] = None):
+        """
+        Writes the footer (marking the file complete) and closes the file.
+        """
+        footer = {"type": "footer", "num_segments": self.num_written, "num_problematic": self.num_problematic}
+        footer.update(summary or {})
+        self._write_record(footer)
+        self._file.close()
+
+
+def iter_results(path: str) -> Iterator[Dict]:
+    """
+    Yields every record of a results file (header, segments, footer) without loading
+    the whole file.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_segments(path: str) -> Iterator[Dict]:
+    """
+    Yields the analyzed segments of a results file, in the legacy results.json format.
+    """
+    for record in iter_results(path):
+        if record.get("type") == "segment":
+            yield {k: v for k, v in record.items() if k not in ("type", "index")}
+
+
+def read_results_header(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.loads(f.readline())
+
+
+def export_legacy_json(results_path: str, json_path: str) -> str:
+    """
+    Writes the segments of a results.jsonl file as the indented JSON array that
+    results.json used to hold, one segment at a time.
+    """
+    with open(json_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        num_segments = 0
+        for segment in iter_segments(results_path):
+            f.write(",\n" if num_segments else "\n")
+            f.write("\n".join("  " + line for line in json.dumps(segment, indent=2, ensure_ascii=False).splitlines()))
+            num_segments += 1
+        f.write("\n]" if num_segments else "]")
+    return json_path
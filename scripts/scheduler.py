@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Sequence
+
+from scripts.task_queue import DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS, QueueBackend, Task
+
+# How often an idle worker asks the queue for work again
+DEFAULT_POLL_SECONDS = 5.0
+
+
+class StageTask:
+    """
+    One stage of main.process_recording as a schedulable unit of work.
+
+    Stages hand their results to each other as files in the recording's output
+    directory (and the artifact cache), so every machine running a worker must see the
+    same output root and cache directory under the same paths (e.g. an NFS mount).
+    `inputs` and `outputs` name the files a stage needs and is expected to leave there;
+    a worker checks both, so a stage never runs on missing input and never counts as
+    done without its output.
+    """
+
+    def __init__(self, name: str, depends_on: Sequence[str], inputs: Sequence[str], outputs: Sequence[str]):
+        self.name = name
+        self.depends_on = tuple(depends_on)
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+    def missing(self, output_path: str, files: Sequence[str]) -> List[str]:
+        return [name for name in files if not os.path.exists(os.path.join(output_path, name))]
+
+
+# The stages of a recording, in dependency order. Transcription and tone only need the
+# preprocessed audio, so they can run at the same time on different machines (e.g.
+# transcription on a GPU box). Optional files (vad.json with --vad, results.json with
+# --legacy_json) are not listed.
+STAGE_TASKS = [
+    StageTask("preprocess", depends_on=(), inputs=(),
+              outputs=("processed.wav", "processed.f32", "processed.f32.json")),
+    StageTask("transcribe", depends_on=("preprocess",), inputs=("processed.wav", "processed.f32"),
+              outputs=("transcript.txt", "segments.npz")),
+    StageTask("tone", depends_on=("preprocess",), inputs=("processed.wav", "processed.f32"),
+              outputs=("tone_features.npz",)),
+    StageTask("text", depends_on=("transcribe", "tone"),
+              inputs=("transcript.txt", "segments.npz", "tone_features.npz"), outputs=("results.jsonl",)),
+    StageTask("report", depends_on=("text",), inputs=("results.jsonl",), outputs=()),
+]
+STAGE_TASKS_BY_NAME = {stage.name: stage for stage in STAGE_TASKS}
+
+
+def recording_task_ids(payload: Dict) -> Dict[str, str]:
+    """
+    Task ids of a recording's stages, derived from the whole payload (recording, output
+    and settings): enqueueing the same batch twice adds nothing, while changed settings
+    give new tasks.
+    """
+    key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(payload["input"]))[0]
+    return {stage.name: f"{name}-{key}/{stage.name}" for stage in STAGE_TASKS}
+
+
+def enqueue_recording(
+    queue: QueueBackend,
+    payload: Dict,
+    priority: float = 0.0,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+) -> int:
+    """
+    Adds the stage tasks of one recording to the queue.
+
+    :param payload: What every stage of the recording needs: {"input", "output_root",
+                    "output_path", "options", ...}, JSON-serialisable.
+    :param priority: Higher runs first (e.g. the recording's size, for longest-first).
+    :return: The number of tasks that were not already in the queue.
+    """
+    task_ids = recording_task_ids(payload)
+    added = 0
+    for stage in STAGE_TASKS:
+        added += queue.enqueue(
+            task_ids[stage.name], stage.name, payload,
+            depends_on=[task_ids[dependency] for dependency in stage.depends_on],
+            max_attempts=max_attempts, priority=priority
+        )
+    return added
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class _Heartbeat(threading.Thread):
+    """
+    Extends a task's lease every third of the lease time while the task runs.
+    """
+
+    def __init__(self, queue: QueueBackend, task: Task, lease_seconds: float):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.task = task
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.lease_seconds / 3.0):
+            if not self.queue.heartbeat(self.task, self.lease_seconds):
+                # Someone else may be running it now; finishing is still harmless,
+                # since completion is idempotent
+                print(f"Lost the lease of {self.task.task_id}.")
+                self.lost = True
+                return
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_worker(
+    queue: QueueBackend,
+    handler: Callable[[Task], Optional[Dict]],
+    worker_id: Optional[str] = None,
+    kinds: Optional[Sequence[str]] = None,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    poll_seconds: float = DEFAULT_POLL_SECONDS,
+    exit_when_idle: bool = False,
+    max_tasks: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Leases tasks from the queue and runs them with `handler` until stopped.
+
+    A task whose handler raises is returned to the queue for a retry (after a backoff),
+    or marked failed after its last attempt. If this process dies mid-task, its lease
+    expires and another worker picks the task up.
+
+    :param handler: Runs one task; its return value is stored as the task's result.
+    :param worker_id: Recorded with each lease (default: host:pid).
+    :param kinds: Only lease tasks of these stages (e.g. ["transcribe"] on a GPU machine).
+    :param lease_seconds: Lease time, extended by heartbeats while a task runs.
+    :param poll_seconds: Wait between polls when no task is available.
+    :param exit_when_idle: Return once nothing is pending or running, instead of waiting for new tasks.
+    :param max_tasks: Return after this many tasks.
+    :return: {"done", "retried", "failed"} counts of this worker's tasks.
+    """
+    worker_id = worker_id or default_worker_id()
+    stats = {"done": 0, "retried": 0, "failed": 0}
+    while max_tasks is None or sum(stats.values()) < max_tasks:
+        task = queue.lease(worker_id, lease_seconds=lease_seconds, kinds=kinds)
+        if task is None:
+            if exit_when_idle:
+                counts = queue.counts()
+                if not counts["pending"] and not counts["leased"]:
+                    break
+            time.sleep(poll_seconds)
+            continue
+
+        print(f"[{worker_id}] Running {task.task_id} (attempt {task.attempts}/{task.max_attempts})")
+        heartbeat = _Heartbeat(queue, task, lease_seconds)
+        heartbeat.start()
+        try:
+            result = handler(task)
+        except Exception as e:
+            heartbeat.stop()
+            traceback.print_exc()
+            state = queue.fail(task, f"{type(e).__name__}: {e}")
+            stats["retried" if state == "pending" else "failed"] += 1
+            print(f"[{worker_id}] {task.task_id} failed ({state}).")
+            continue
+        heartbeat.stop()
+        if not queue.complete(task, result):
+            print(f"[{worker_id}] {task.task_id} had already been completed by another worker.")
+        stats["done"] += 1
+    return stats
+
+
+def format_queue_counts(counts: Dict[str, int]) -> str:
+    return ", ".join(f"{count} {state}" for state, count in counts.items())
@@ -0,0 +1,387 @@
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from scripts.keywords import normalize
+from scripts.results import LEGACY_RESULTS_FILE, RESULTS_FILE, iter_results
+
+INDEX_FILE = "search_index.sqlite"
+
+# Room and date of a recording are taken from its input path, e.g.
+# ".../room3/2024-05-14_0800.wav", ".../class_b/20240514.mp3" or ".../classroom_3/2024/05/14/rec.wav".
+# The room keyword must start a word ("backroom_nas" is no room) and be followed by digits
+# or by a separator and a name ("rooms" and "classrooms" are no rooms either).
+ROOM_PATTERN = re.compile(
+    r"(?<![^\W\d_])(?:classroom|room|class|חדר)(?:[ _-]?(\d+)|[ _-]([^\W_]+))(?![^\W_])", re.IGNORECASE
+)
+DATE_PATTERN = re.compile(r"(?<!\d)(20\d{2})-?(\d{2})-?(\d{2})(?!\d)")
+# A date written as directories: ".../2024/05/14/..."
+DATE_DIRS_PATTERN = re.compile(r"(?<!\d)(20\d{2})/(\d{1,2})/(\d{1,2})(?!\d)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    results_path TEXT UNIQUE NOT NULL,
+    input TEXT,
+    room TEXT,
+    recorded_date TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    num_segments INTEGER,
+    num_problematic INTEGER,
+    global_tone TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_room_date ON recordings (room, recorded_date);
+CREATE INDEX IF NOT EXISTS recordings_date ON recordings (recorded_date);
+
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    recording_id INTEGER NOT NULL REFERENCES recordings (id),
+    seg_index INTEGER NOT NULL,
+    start REAL,
+    end REAL,
+    text TEXT,
+    text_english TEXT,
+    keywords TEXT,
+    hebrew_sentiment_label TEXT,
+    hebrew_sentiment_score REAL,
+    english_sentiment_label TEXT,
+    english_sentiment_score REAL,
+    toxicity_label TEXT,
+    toxicity_score REAL,
+    average_amplitude REAL,
+    average_pitch_hz REAL,
+    loud INTEGER,
+    high_pitch INTEGER,
+    problematic INTEGER
+);
+CREATE INDEX IF NOT EXISTS segments_recording ON segments (recording_id);
+
+-- Normalised copies of the texts (see scripts/keywords.py), so that searches ignore
+-- niqqud, final letters and case the same way keyword matching does.
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, text_english, keywords, tokenize = "unicode61"
+);
+"""
+
+
+def _parse_date(match) -> Optional[str]:
+    try:
+        return datetime(*map(int, match.groups())).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def recording_room(input_path: str) -> Optional[str]:
+    """
+    Returns the room a recording's path names (lowercased), from the last path component
+    that matches ROOM_PATTERN, or None. Unlike `recording_room_and_date`, this never
+    guesses from directory names, so it is safe to key per-room state on (noise
+    profiles, tone baselines): unrelated recordings that share a directory stay apart.
+    """
+    components = [part for part in input_path.replace(os.sep, "/").split("/") if part]
+    if components:
+        components[-1] = os.path.splitext(components[-1])[0]
+    for component in reversed(components):
+        room_match = ROOM_PATTERN.search(component)
+        if room_match:
+            return (room_match.group(1) or room_match.group(2)).lower()
+    return None
+
+
+def recording_room_and_date(input_path: str, fallback_mtime: Optional[float] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns (room, 'YYYY-MM-DD') of a recording from its path, for the search index. The
+    room is `recording_room`, falling back to the (lowercased) name of the recording's
+    directory unless that is a number or a date, so recordings can still be filtered by
+    where they were filed; it is None if neither gives one. The date falls back to the
+    file's modification date.
+    """
+    path = input_path.replace(os.sep, "/")
+    room = recording_room(input_path)
+    if room is None:
+        directory = os.path.basename(os.path.dirname(os.path.abspath(input_path)))
+        if directory and not directory.isdigit() and not DATE_PATTERN.search(directory):
+            room = directory.lower()
+
+    date = None
+    for pattern, text in ((DATE_PATTERN, os.path.basename(path)), (DATE_DIRS_PATTERN, path), (DATE_PATTERN, path)):
+        date_match = pattern.search(text)
+        date = _parse_date(date_match) if date_match else None
+        if date is not None:
+            break
+    if date is None and fallback_mtime is not None:
+        date = datetime.fromtimestamp(fallback_mtime).strftime("%Y-%m-%d")
+    return room, date
+
+
+def _read_results_file(path: str) -> Optional[Tuple[Dict, List[Dict]]]:
+    """
+    Returns (header, segments) of a results.jsonl or legacy results.json file,
+    or None if a results.jsonl file is still partial (no footer yet).
+    """
+    if path.endswith(".jsonl"):
+        header, segments, complete = {}, [], False
+        for record in iter_results(path):
+            if record.get("type") == "header":
+                header = record
+            elif record.get("type") == "segment":
+                segments.append(record)
+            elif record.get("type") == "footer":
+                complete = True
+        return (header, segments) if complete else None
+    with open(path, "r", encoding="utf-8") as f:
+        return {}, json.load(f)
+
+
+def _segment_row(seg: Dict, seg_index: int) -> Dict:
+    text_analysis = seg.get("text_analysis") or {}
+    hebrew = text_analysis.get("hebrew_analysis") or {}
+    english = text_analysis.get("english_analysis") or {}
+    tone = seg.get("tone_analysis") or {}
+    flags = tone.get("tone_flags") or {}
+    keywords = list(dict.fromkeys((hebrew.get("found_keywords") or []) + (english.get("found_keywords") or [])))
+    return {
+        "seg_index": seg.get("index", seg_index),
+        "start": seg.get("start"),
+        "end": seg.get("end"),
+        "text": seg.get("text", ""),
+        "text_english": english.get("text_english", ""),
+        "keywords": "|".join(keywords),
+        "hebrew_sentiment_label": hebrew.get("sentiment_label"),
+        "hebrew_sentiment_score": hebrew.get("sentiment_score"),
+        "english_sentiment_label": english.get("sentiment_label"),
+        "english_sentiment_score": english.get("sentiment_score"),
+        "toxicity_label": english.get("toxicity_label"),
+        "toxicity_score": english.get("toxicity_score"),
+        "average_amplitude": tone.get("average_amplitude"),
+        "average_pitch_hz": tone.get("average_pitch_hz"),
+        "loud": int(bool(flags.get("loud"))),
+        "high_pitch": int(bool(flags.get("high_pitch"))),
+        "problematic": int(bool(seg.get("problematic"))),
+    }
+
+
+def _fts_query(text: str) -> str:
+    """
+    Turns free text into an FTS5 query: every term must match (as a whole token,
+    or as a prefix when it ends with '*').
+    """
+    terms = []
+    for term in normalize(text).split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """
+    A local SQLite index of analyzed segments across recordings: segment text (Hebrew
+    and English, full-text searchable), keywords found, sentiment/toxicity scores, tone
+    stats and timestamps, with each recording's room and date.
+
+    Indexing is incremental: a results file is only (re)read when its size or
+    modification time changed since it was last indexed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    # --- Indexing ---
+
+    def _remove_recording(self, recording_id: int):
+        self._conn.execute(
+            "DELETE FROM segments_fts WHERE rowid IN (SELECT id FROM segments WHERE recording_id = ?)",
+            (recording_id,)
+        )
+        self._conn.execute("DELETE FROM segments WHERE recording_id = ?", (recording_id,))
+        self._conn.execute("DELETE FROM recordings WHERE id = ?", (recording_id,))
+
+    def index_recording(self, results_path: str, room: Optional[str] = None) -> Optional[int]:
+        """
+        Adds (or refreshes) one recording's results file.
+
+        :param results_path: Path to a results.jsonl (or legacy results.json) file.
+        :param room: Room name, overriding the one derived from the recording's path.
+        :return: The number of segments indexed, or None if the file was unchanged or
+                 still partial.
+        """
+        results_path = os.path.abspath(results_path)
+        stat = os.stat(results_path)
+        existing = self._conn.execute(
+            "SELECT id, size, mtime_ns FROM recordings WHERE results_path = ?", (results_path,)
+        ).fetchone()
+        if existing is not None and existing["size"] == stat.st_size and existing["mtime_ns"] == stat.st_mtime_ns:
+            return None
+
+        loaded = _read_results_file(results_path)
+        if loaded is None:
+            return None
+        header, segments = loaded
+        input_path = header.get("input") or os.path.dirname(results_path)
+        input_mtime = os.path.getmtime(input_path) if os.path.exists(input_path) else stat.st_mtime
+        derived_room, recorded_date = recording_room_and_date(input_path, fallback_mtime=input_mtime)
+
+        with self._conn:
+            if existing is not None:
+                self._remove_recording(existing["id"])
+            recording_id = self._conn.execute(
+                "INSERT INTO recordings (results_path, input, room, recorded_date, size, mtime_ns, "
+                "num_segments, num_problematic, global_tone, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    results_path, input_path, (room or derived_room or "").lower() or None, recorded_date,
+                    stat.st_size, stat.st_mtime_ns, len(segments),
+                    sum(1 for seg in segments if seg.get("problematic")),
+                    json.dumps(header.get("global_tone")) if header.get("global_tone") else None,
+                    time.time(),
+                )
+            ).lastrowid
+            for seg_index, seg in enumerate(segments):
+                row = _segment_row(seg, seg_index)
+                columns = ", ".join(row)
+                segment_id = self._conn.execute(
+                    f"INSERT INTO segments (recording_id, {columns}) VALUES (?, {', '.join('?' * len(row))})",
+                    [recording_id] + list(row.values())
+                ).lastrowid
+                self._conn.execute(
+                    "INSERT INTO segments_fts (rowid, text, text_english, keywords) VALUES (?, ?, ?, ?)",
+                    (segment_id, normalize(row["text"]), normalize(row["text_english"] or ""),
+                     normalize(row["keywords"].replace("|", " ")))
+                )
+        return len(segments)
+
+    def index_directory(self, output_root: str, room: Optional[str] = None) -> Dict:
+        """
+        Indexes every results file under `output_root` (one directory per recording, as
+        written by main.py) and drops recordings whose results file was deleted.
+
+        :return: Counts of indexed, unchanged/partial and removed recordings, and segments.
+        """
+        stats = {"indexed": 0, "skipped": 0, "removed": 0, "segments": 0}
+        seen = set()
+        for results_path in iter_results_files(output_root):
+            seen.add(os.path.abspath(results_path))
+            count = self.index_recording(results_path, room=room)
+            if count is None:
+                stats["skipped"] += 1
+            else:
+                stats["indexed"] += 1
+                stats["segments"] += count
+
+        root = os.path.abspath(output_root) + os.sep
+        with self._conn:
+            for row in self._conn.execute("SELECT id, results_path FROM recordings").fetchall():
+                if row["results_path"].startswith(root) and row["results_path"] not in seen:
+                    self._remove_recording(row["id"])
+                    stats["removed"] += 1
+        return stats
+
+    # --- Queries ---
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        room: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        keyword: Optional[str] = None,
+        problematic: Optional[bool] = None,
+        min_toxicity: Optional[float] = None,
+        loud: Optional[bool] = None,
+        high_pitch: Optional[bool] = None,
+        limit: int = 100
+    ) -> List[Dict]:
+        """
+        Finds segments matching every given condition.
+
+        :param text: Words that must all appear in the Hebrew or English text
+                     (a trailing '*' matches any word starting with the term).
+        :param room: Room name (as derived from the recording paths or given at index time).
+        :param date_from: First recording date, 'YYYY-MM-DD' (inclusive).
+        :param date_to: Last recording date, 'YYYY-MM-DD' (inclusive).
+        :param keyword: A keyword that was found in the segment.
+        :param problematic: Only problematic (True) or only unproblematic (False) segments.
+        :param min_toxicity: Minimum English toxicity score.
+        :param loud: Filter on the segment's loud tone flag.
+        :param high_pitch: Filter on the segment's high-pitch tone flag.
+        :param limit: Maximum number of segments returned.
+        :return: Matching segments (with their recording's input, room and date),
+                 ordered by date and time.
+        """
+        conditions = []
+        params = []
+        fts_terms = []
+        if text:
+            fts_terms.append(_fts_query(text))
+        if keyword:
+            phrase = normalize(keyword).replace('"', '""')
+            fts_terms.append(f'keywords : "{phrase}"')
+        if fts_terms:
+            conditions.append("s.id IN (SELECT rowid FROM segments_fts WHERE segments_fts MATCH ?)")
+            params.append(" AND ".join(f"({term})" for term in fts_terms))
+        if room is not None:
+            conditions.append("r.room = ?")
+            params.append(room.lower())
+        if date_from:
+            conditions.append("r.recorded_date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("r.recorded_date <= ?")
+            params.append(date_to)
+        for column, value in (("problematic", problematic), ("loud", loud), ("high_pitch", high_pitch)):
+            if value is not None:
+                conditions.append(f"s.{column} = ?")
+                params.append(int(value))
+        if min_toxicity is not None:
+            conditions.append("s.toxicity_score >= ?")
+            params.append(min_toxicity)
+
+        query = (
+            "SELECT r.input, r.room, r.recorded_date, s.* FROM segments s "
+            "JOIN recordings r ON r.id = s.recording_id"
+            + (" WHERE " + " AND ".join(conditions) if conditions else "")
+            + " ORDER BY r.recorded_date, r.input, s.start LIMIT ?"
+        )
+        rows = self._conn.execute(query, params + [limit]).fetchall()
+        results = []
+        for row in rows:
+            result = dict(row)
+            result["keywords"] = [kw for kw in (result["keywords"] or "").split("|") if kw]
+            results.append(result)
+        return results
+
+    def summary(self) -> Dict:
+        row = self._conn.execute(
+            "SELECT COUNT(*) AS recordings, COALESCE(SUM(num_segments), 0) AS segments, "
+            "COALESCE(SUM(num_problematic), 0) AS problematic FROM recordings"
+        ).fetchone()
+        return dict(row)
+
+
+def iter_results_files(output_root: str) -> Iterator[str]:
+    """
+    Yields the results file of every recording under `output_root`
+    (results.jsonl, or results.json for outputs of older versions).
+    """
+    for root, dirs, files in os.walk(output_root):
+        # Skip the artifact cache
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        if RESULTS_FILE in files:
+            yield os.path.join(root, RESULTS_FILE)
+        elif LEGACY_RESULTS_FILE in files:
+            yield os.path.join(root, LEGACY_RESULTS_FILE)
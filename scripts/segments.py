@@ -0,0 +1,91 @@
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from scripts.cache import release_output
+
+# Per-segment numeric fields kept from Whisper's output (besides the text).
+SEGMENT_FIELDS = ("start", "end", "avg_logprob", "no_speech_prob")
+
+
+def save_segments(path: str, segments: List[Dict]) -> str:
+    """
+    Saves Whisper segments as a compact columnar .npz file: one float32 array per
+    field in SEGMENT_FIELDS, and all texts as a single UTF-8 buffer plus offsets.
+
+    :param path: Where to save the segment store (e.g. 'segments.npz').
+    :param segments: Segment dicts as found in Whisper's result["segments"].
+    :return: The path to the segment store.
+    """
+    encoded = [seg.get("text", "").strip().encode("utf-8") for seg in segments]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    columns = {
+        field: np.array([seg.get(field, np.nan) for seg in segments], dtype=np.float32)
+        for field in SEGMENT_FIELDS
+    }
+    # Write through a file object so numpy does not append another ".npz"
+    release_output(path)
+    with open(path, "wb") as f:
+        np.savez(
+            f,
+            text_bytes=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            text_offsets=offsets,
+            **columns
+        )
+    return path
+
+
+class SegmentStore:
+    """
+    Read-only view of a segment store written by `save_segments`.
+
+    Nothing is read until the segments are first accessed; after that, each
+    segment is returned as a dict like
+    { "start": float, "end": float, "text": str, "avg_logprob": float, "no_speech_prob": float }.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+
+    def _load(self) -> Dict[str, np.ndarray]:
+        if self._columns is None:
+            with np.load(self.path) as data:
+                self._columns = {name: data[name] for name in data.files}
+        return self._columns
+
+    def __len__(self) -> int:
+        return len(self._load()["text_offsets"]) - 1
+
+    def text_at(self, index: int) -> str:
+        columns = self._load()
+        start, end = columns["text_offsets"][index], columns["text_offsets"][index + 1]
+        return columns["text_bytes"][start:end].tobytes().decode("utf-8")
+
+    def __getitem__(self, index: int) -> Dict:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        columns = self._load()
+        segment = {field: float(columns[field][index]) for field in SEGMENT_FIELDS}
+        segment["text"] = self.text_at(index)
+        return segment
+
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def text(self) -> str:
+        """The full transcript text (all segments joined)."""
+        return " ".join(self.text_at(i) for i in range(len(self)))
+
+
+def load_segments(path: str) -> SegmentStore:
+    """
+    Opens a segment store lazily (see `SegmentStore`).
+    """
+    return SegmentStore(path)
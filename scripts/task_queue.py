@@ -0,0 +1,301 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence
+
+# A task not completed within its lease (the worker crashed, lost the network or hung)
+# becomes available to other workers again. Workers extend the lease of a running
+# task with heartbeats, so long stages only need the lease to outlive a missed beat.
+DEFAULT_LEASE_SECONDS = 300.0
+# Attempts per task before it is marked failed, and the delay before the first retry
+# (doubled for every further attempt). An expired lease counts as a failed attempt.
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 30.0
+
+TASK_STATES = ("pending", "leased", "done", "failed")
+TASK_QUEUE_FILE = "tasks.sqlite"
+
+
+class Task:
+    """
+    A leased unit of work: `kind` says which handler runs it, `payload` is its JSON input.
+    `lease_token` identifies this lease; heartbeats and failures of an older lease of
+    the same task are ignored.
+    """
+
+    def __init__(self, task_id: str, kind: str, payload: Dict, attempts: int = 0,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, lease_token: Optional[str] = None,
+                 state: str = "pending", error: Optional[str] = None, result: Optional[Dict] = None):
+        self.task_id = task_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.lease_token = lease_token
+        self.state = state
+        self.error = error
+        self.result = result
+
+    def __repr__(self) -> str:
+        return f"Task({self.task_id!r}, {self.state}, attempt {self.attempts}/{self.max_attempts})"
+
+
+class QueueBackend(ABC):
+    """
+    What the scheduler (scripts/scheduler.py) needs from a task queue. `SQLiteTaskQueue`
+    is the local implementation; a backend for several machines without a shared
+    filesystem (e.g. on a database server) implements the same methods.
+
+    Semantics every backend must keep:
+      - enqueue is idempotent: a task id that already exists is left as it is
+      - a task is leased by one worker at a time, and only once its dependencies are done
+      - an expired lease returns the task to the queue (or fails it after max_attempts)
+      - completion is idempotent: the first completion wins, later ones change nothing
+      - a task that fails for good fails its dependents with it
+    """
+
+    @abstractmethod
+    def enqueue(self, task_id: str, kind: str, payload: Dict, depends_on: Sequence[str] = (),
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS, priority: float = 0.0) -> bool:
+        """Adds a task; returns False if the task id already exists."""
+
+    @abstractmethod
+    def lease(self, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+              kinds: Optional[Sequence[str]] = None) -> Optional[Task]:
+        """Leases the highest-priority runnable task (of the given kinds), or returns None."""
+
+    @abstractmethod
+    def heartbeat(self, task: Task, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extends the task's lease; returns False if the lease was lost."""
+
+    @abstractmethod
+    def complete(self, task: Task, result: Optional[Dict] = None) -> bool:
+        """Marks the task done; returns False if it already was."""
+
+    @abstractmethod
+    def fail(self, task: Task, error: str) -> str:
+        """Records a failed attempt; returns the task's new state ("pending" to retry, or "failed")."""
+
+    @abstractmethod
+    def retry_failed(self) -> int:
+        """Returns every failed task to the queue with fresh attempts; returns their number."""
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Number of tasks per state (see TASK_STATES)."""
+
+    @abstractmethod
+    def tasks(self, state: Optional[str] = None) -> List[Task]:
+        """The tasks in a state (all tasks if None), oldest first."""
+
+    def close(self):
+        """Releases the backend's connections (nothing by default)."""
+
+
+class SQLiteTaskQueue(QueueBackend):
+    """
+    A task queue in one SQLite file, shared by worker processes on this machine (or on
+    several machines, if the file is on a filesystem with working locks). Every state
+    change is one short write transaction, so workers never see a task half-leased.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # isolation_level=None: transactions are opened explicitly (BEGIN IMMEDIATE)
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " task_id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " priority REAL NOT NULL,"
+            " attempts INTEGER NOT NULL,"
+            " max_attempts INTEGER NOT NULL,"
+            " available_at REAL NOT NULL,"
+            " lease_token TEXT,"
+            " lease_owner TEXT,"
+            " lease_expires_at REAL,"
+            " result TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS task_dependencies ("
+            " task_id TEXT NOT NULL,"
+            " depends_on TEXT NOT NULL,"
+            " PRIMARY KEY (task_id, depends_on))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_by_state ON tasks (state, priority)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS dependents ON task_dependencies (depends_on)")
+
+    def _write(self, fn):
+        """
+        Runs fn(now) in one write transaction. BEGIN IMMEDIATE takes the write lock up
+        front, so two workers cannot both read a task as free and then both lease it.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = fn(time.time())
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return value
+
+    def _fail_dependents(self, task_ids: List[str], now: float):
+        # Breadth-first over the dependency graph: nothing that waits on a failed task can run
+        while task_ids:
+            failed = []
+            for task_id in task_ids:
+                rows = self._conn.execute(
+                    "SELECT t.task_id FROM task_dependencies d JOIN tasks t ON t.task_id = d.task_id"
+                    " WHERE d.depends_on = ? AND t.state = 'pending'", (task_id,)
+                ).fetchall()
+                for (dependent,) in rows:
+                    self._conn.execute(
+                        "UPDATE tasks SET state = 'failed', error = ?, updated_at = ? WHERE task_id = ?",
+                        (f"dependency '{task_id}' failed", now, dependent)
+                    )
+                    failed.append(dependent)
+            task_ids = failed
+
+    def _expire_leases(self, now: float):
+        expired = self._conn.execute(
+            "SELECT task_id, attempts, max_attempts, lease_owner FROM tasks"
+            " WHERE state = 'leased' AND lease_expires_at < ?", (now,)
+        ).fetchall()
+        gave_up = []
+        for task_id, attempts, max_attempts, owner in expired:
+            state = "failed" if attempts >= max_attempts else "pending"
+            self._conn.execute(
+                "UPDATE tasks SET state = ?, lease_token = NULL, error = ?, updated_at = ? WHERE task_id = ?",
+                (state, f"lease of worker '{owner}' expired", now, task_id)
+            )
+            if state == "failed":
+                gave_up.append(task_id)
+        self._fail_dependents(gave_up, now)
+
+    def enqueue(self, task_id: str, kind: str, payload: Dict, depends_on: Sequence[str] = (),
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS, priority: float = 0.0) -> bool:
+        def insert(now):
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO tasks (task_id, kind, payload, state, priority, attempts, max_attempts,"
+                " available_at, created_at, updated_at) VALUES (?, ?, ?, 'pending', ?, 0, ?, ?, ?, ?)",
+                (task_id, kind, json.dumps(payload, ensure_ascii=False), priority, max_attempts, now, now, now)
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO task_dependencies VALUES (?, ?)",
+                [(task_id, dependency) for dependency in depends_on]
+            )
+            return True
+        return self._write(insert)
+
+    def lease(self, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+              kinds: Optional[Sequence[str]] = None) -> Optional[Task]:
+        def take(now):
+            self._expire_leases(now)
+            kind_filter = f" AND t.kind IN ({','.join('?' * len(kinds))})" if kinds else ""
+            row = self._conn.execute(
+                "SELECT task_id, kind, payload, attempts, max_attempts FROM tasks t"
+                " WHERE t.state = 'pending' AND t.available_at <= ?" + kind_filter +
+                " AND NOT EXISTS (SELECT 1 FROM task_dependencies d JOIN tasks u ON u.task_id = d.depends_on"
+                "                 WHERE d.task_id = t.task_id AND u.state != 'done')"
+                " ORDER BY t.priority DESC, t.created_at LIMIT 1",
+                [now] + list(kinds or [])
+            ).fetchone()
+            if row is None:
+                return None
+            task_id, kind, payload, attempts, max_attempts = row
+            token = uuid.uuid4().hex
+            self._conn.execute(
+                "UPDATE tasks SET state = 'leased', attempts = attempts + 1, lease_token = ?, lease_owner = ?,"
+                " lease_expires_at = ?, updated_at = ? WHERE task_id = ?",
+                (token, worker_id, now + lease_seconds, now, task_id)
+            )
+            return Task(task_id, kind, json.loads(payload), attempts=attempts + 1, max_attempts=max_attempts,
+                        lease_token=token, state="leased")
+        return self._write(take)
+
+    def heartbeat(self, task: Task, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        def extend(now):
+            return self._conn.execute(
+                "UPDATE tasks SET lease_expires_at = ?, updated_at = ?"
+                " WHERE task_id = ? AND lease_token = ? AND state = 'leased'",
+                (now + lease_seconds, now, task.task_id, task.lease_token)
+            ).rowcount == 1
+        return self._write(extend)
+
+    def complete(self, task: Task, result: Optional[Dict] = None) -> bool:
+        # Accepted even from a worker whose lease expired: the work is done (the stages'
+        # outputs do not depend on who produced them), so nobody needs to redo it.
+        def finish(now):
+            return self._conn.execute(
+                "UPDATE tasks SET state = 'done', result = ?, error = NULL, lease_token = NULL, updated_at = ?"
+                " WHERE task_id = ? AND state != 'done'",
+                (json.dumps(result, ensure_ascii=False) if result is not None else None, now, task.task_id)
+            ).rowcount == 1
+        return self._write(finish)
+
+    def fail(self, task: Task, error: str) -> str:
+        def record(now):
+            row = self._conn.execute(
+                "SELECT state, attempts, max_attempts, lease_token FROM tasks WHERE task_id = ?", (task.task_id,)
+            ).fetchone()
+            if row is None or row[0] != "leased" or row[3] != task.lease_token:
+                # A stale lease: the task was already retried, completed or failed
+                return row[0] if row else "failed"
+            _, attempts, max_attempts, _ = row
+            state = "failed" if attempts >= max_attempts else "pending"
+            self._conn.execute(
+                "UPDATE tasks SET state = ?, lease_token = NULL, error = ?, available_at = ?, updated_at = ?"
+                " WHERE task_id = ?",
+                (state, error, now + RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), now, task.task_id)
+            )
+            if state == "failed":
+                self._fail_dependents([task.task_id], now)
+            return state
+        return self._write(record)
+
+    def retry_failed(self) -> int:
+        def reset(now):
+            return self._conn.execute(
+                "UPDATE tasks SET state = 'pending', attempts = 0, available_at = ?, updated_at = ?"
+                " WHERE state = 'failed'", (now, now)
+            ).rowcount
+        return self._write(reset)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall()
+        counts = {state: 0 for state in TASK_STATES}
+        counts.update(dict(rows))
+        return counts
+
+    def tasks(self, state: Optional[str] = None) -> List[Task]:
+        query = "SELECT task_id, kind, payload, attempts, max_attempts, state, error, result FROM tasks"
+        with self._lock:
+            rows = self._conn.execute(
+                query + (" WHERE state = ?" if state else "") + " ORDER BY created_at", (state,) if state else ()
+            ).fetchall()
+        return [
+            Task(task_id, kind, json.loads(payload), attempts=attempts, max_attempts=max_attempts,
+                 state=task_state, error=error, result=json.loads(result) if result else None)
+            for task_id, kind, payload, attempts, max_attempts, task_state, error, result in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
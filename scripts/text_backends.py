@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+from typing import Dict, Optional
+
+from scripts.models import TEXT_CLASSIFIERS, get_model
+
+# Inference backends of the text classifiers:
+#   "torch"      - the fp32 PyTorch models (reference)
+#   "torch-int8" - PyTorch with dynamic INT8 quantisation of the Linear layers
+#   "onnx"       - the models exported to ONNX, run by ONNX Runtime (needs optimum[onnxruntime])
+#   "onnx-int8"  - the ONNX export with dynamic INT8 quantisation (needs optimum[onnxruntime])
+TEXT_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+DEFAULT_TEXT_BACKEND = "torch"
+
+# Converted models are written here once and loaded from here afterwards.
+TEXT_MODEL_CACHE_DIR = os.environ.get(
+    "DAYCARE_TEXT_MODEL_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "daycare_monitor", "text_models")
+)
+# Written into every converted model's directory; a directory with a different
+# version (or one left half-written by a crash) is converted again.
+CONVERSION_VERSION = 1
+_META_FILE = "conversion.json"
+
+
+def get_text_model(name: str, backend: str = DEFAULT_TEXT_BACKEND):
+    """
+    Returns the pipeline of a text classifier (see models.TEXT_CLASSIFIERS) on the
+    given backend, loading (and if needed converting) it on first use.
+
+    :param name: "hebrew_sentiment", "english_sentiment" or "english_toxic".
+    :param backend: One of TEXT_BACKENDS.
+    """
+    if backend not in TEXT_BACKENDS:
+        raise ValueError(f"Unknown text backend '{backend}'; expected one of {TEXT_BACKENDS}")
+    if backend == "torch":
+        return get_model(name)
+    return get_model(f"{name}/{backend}", loader=lambda: load_text_model(name, backend))
+
+
+def load_text_model(name: str, backend: str, cache_dir: Optional[str] = None):
+    """
+    Builds the pipeline of a text classifier on a backend, bypassing the model registry
+    (the benchmarks use this to load and free models one at a time).
+    """
+    from transformers import AutoTokenizer, pipeline
+    model_name, task, pipeline_kwargs = TEXT_CLASSIFIERS[name]
+    cache_dir = cache_dir or TEXT_MODEL_CACHE_DIR
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if backend == "torch":
+        from transformers import AutoModelForSequenceClassification
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    elif backend == "torch-int8":
+        model = _load_torch_int8(model_name, cache_dir)
+    elif backend == "onnx":
+        model = _load_onnx(model_name, cache_dir, quantize=False)
+    elif backend == "onnx-int8":
+        model = _load_onnx(model_name, cache_dir, quantize=True)
+    else:
+        raise ValueError(f"Unknown text backend '{backend}'; expected one of {TEXT_BACKENDS}")
+    return pipeline(task, model=model, tokenizer=tokenizer, **pipeline_kwargs)
+
+
+def converted_model_dir(model_name: str, backend: str, cache_dir: Optional[str] = None) -> str:
+    return os.path.join(cache_dir or TEXT_MODEL_CACHE_DIR, model_name.replace("/", "__"), backend)
+
+
+def _conversion_meta(backend: str) -> Dict:
+    import transformers
+    meta = {"version": CONVERSION_VERSION, "backend": backend, "transformers": transformers.__version__}
+    if backend.startswith("torch"):
+        import torch
+        meta["torch"] = torch.__version__
+    else:
+        import onnxruntime
+        meta["onnxruntime"] = onnxruntime.__version__
+    return meta
+
+
+def _is_converted(path: str, backend: str) -> bool:
+    meta_path = os.path.join(path, _META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f) == _conversion_meta(backend)
+
+
+def _mark_converted(path: str, backend: str):
+    with open(os.path.join(path, _META_FILE), "w", encoding="utf-8") as f:
+        json.dump(_conversion_meta(backend), f, indent=2)
+
+
+def _fresh_dir(path: str):
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+
+def _load_torch_int8(model_name: str, cache_dir: str):
+    """
+    The model with its Linear layers replaced by dynamically quantised INT8 ones
+    (weights stored as int8, activations quantised on the fly). The quantised weights
+    are cached, so later loads skip the fp32 checkpoint.
+    """
+    import torch
+    from transformers import AutoConfig, AutoModelForSequenceClassification
+
+    path = converted_model_dir(model_name, "torch-int8", cache_dir)
+    weights_path = os.path.join(path, "model_int8.pt")
+    if _is_converted(path, "torch-int8"):
+        model = AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(model_name))
+        model = torch.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+        # Quantised Linear layers store packed params, which are not plain tensors
+        model.load_state_dict(torch.load(weights_path, weights_only=False))
+        return model
+
+    print(f"Quantising {model_name} to INT8 (once; cached in {path})...")
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    _fresh_dir(path)
+    torch.save(model.state_dict(), weights_path)
+    _mark_converted(path, "torch-int8")
+    return model
+
+
+def _load_onnx(model_name: str, cache_dir: str, quantize: bool):
+    """
+    The model exported to ONNX (and, with quantize=True, dynamically quantised to INT8)
+    as an optimum ORTModel, which transformers pipelines accept like a torch model.
+    """
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+    except ImportError as e:
+        raise ImportError(
+            "The onnx text backends need optimum with ONNX Runtime: pip install 'optimum[onnxruntime]'"
+        ) from e
+
+    path = converted_model_dir(model_name, "onnx", cache_dir)
+    if not _is_converted(path, "onnx"):
+        print(f"Exporting {model_name} to ONNX (once; cached in {path})...")
+        _fresh_dir(path)
+        ORTModelForSequenceClassification.from_pretrained(model_name, export=True).save_pretrained(path)
+        _mark_converted(path, "onnx")
+    if not quantize:
+        return ORTModelForSequenceClassification.from_pretrained(path)
+
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    int8_path = converted_model_dir(model_name, "onnx-int8", cache_dir)
+    if not _is_converted(int8_path, "onnx-int8"):
+        print(f"Quantising the ONNX export of {model_name} to INT8 (once; cached in {int8_path})...")
+        _fresh_dir(int8_path)
+        # Dynamic quantisation needs no calibration data; avx2 kernels run on any recent x86 CPU
+        config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        ORTQuantizer.from_pretrained(path).quantize(save_dir=int8_path, quantization_config=config)
+        _mark_converted(int8_path, "onnx-int8")
+    return ORTModelForSequenceClassification.from_pretrained(int8_path, file_name="model_quantized.onnx")
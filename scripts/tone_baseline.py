@@ -0,0 +1,314 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from scripts.tone_flags import deviation_flags
+
+# How tone flags are decided (see ToneFeatures.stats):
+#   "fixed"     - LOUD_AMPLITUDE_THRESHOLD / HIGH_PITCH_THRESHOLD_HZ (scripts/tone_flags.py)
+#   "recording" - deviation from the RMS and pitch distributions of the recording itself
+#   "room"      - deviation from the room's baseline, persisted across recordings and days
+#                 (falls back to "recording" until the room has enough audio)
+TONE_BASELINE_MODES = ("fixed", "recording", "room")
+DEFAULT_TONE_BASELINE_MODE = "fixed"
+
+# Relative accuracy of the quantile sketches: a reported quantile is within 1% of the
+# true value, whatever the range of the values (log-spaced buckets, as in DDSketch).
+SKETCH_RELATIVE_ACCURACY = 0.01
+# Frames quieter than this RMS are digital silence (e.g. gated by noise reduction)
+# and would drag the loudness baseline down; they are left out of it.
+BASELINE_MIN_RMS = 1e-4
+# A baseline needs this many frames of each feature before it is trusted
+# (about 30 s of audio, or of voiced audio for pitch, at 16 kHz / 512-sample hops).
+MIN_BASELINE_FRAMES = 1000
+# Before a new recording is merged into a room baseline, the stored counts are
+# multiplied by this, so older days fade out and a change of microphone or gain is followed.
+ROOM_BASELINE_DECAY = 0.8
+
+TONE_BASELINE_FILE = "tone_baselines.sqlite"
+
+
+class QuantileSketch:
+    """
+    A mergeable quantile sketch of positive values: counts in logarithmically spaced
+    buckets, so memory depends on the range of the values, not on how many were added,
+    and sketches of different recordings (or days) merge by adding their counts.
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, float] = {}
+        self.count = 0.0
+
+    def add(self, values: np.ndarray):
+        """
+        Adds the finite positive values of an array (others are ignored).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values) & (values > 0)]
+        if not len(values):
+            return
+        keys, counts = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0.0) + count
+        self.count += len(values)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge quantile sketches of different accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0.0) + count
+        self.count += other.count
+        return self
+
+    def scale(self, factor: float) -> "QuantileSketch":
+        """
+        Multiplies every count by `factor` (exponential forgetting).
+        """
+        self.buckets = {key: count * factor for key, count in self.buckets.items()}
+        self.count *= factor
+        return self
+
+    def quantile(self, q: float) -> float:
+        """
+        The value below which a fraction `q` of the added values lie (0.0 if empty).
+        """
+        if self.count <= 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0.0
+        keys = sorted(self.buckets)
+        for key in keys:
+            cumulative += self.buckets[key]
+            if cumulative >= rank:
+                break
+        # The bucket (gamma^(key-1), gamma^key] is represented by its "middle" value
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def to_dict(self) -> Dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "buckets": {str(key): count for key, count in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QuantileSketch":
+        sketch = cls(data["relative_accuracy"])
+        sketch.buckets = {int(key): float(count) for key, count in data["buckets"].items()}
+        sketch.count = float(data["count"])
+        return sketch
+
+
+class ToneBaseline:
+    """
+    Baseline distributions of frame RMS (loudness) and voiced-frame pitch, against
+    which segments are judged: "loud" and "high pitch" mean louder or higher than
+    usual for this recording (or room), not above a fixed value.
+    """
+
+    def __init__(self, rms: Optional[QuantileSketch] = None, f0: Optional[QuantileSketch] = None):
+        self.rms = rms if rms is not None else QuantileSketch()
+        self.f0 = f0 if f0 is not None else QuantileSketch()
+
+    @classmethod
+    def from_features(cls, tone_features, frames: slice = slice(None)) -> "ToneBaseline":
+        """
+        The baseline of (a frame range of) a recording's ToneFeatures (scripts/analyze_tone.py).
+        """
+        baseline = cls()
+        baseline.update(tone_features, frames)
+        return baseline
+
+    def update(self, tone_features, frames: slice = slice(None)):
+        """
+        Adds the frames of `tone_features` in `frames`, in one vectorised pass; only
+        the sketches are kept, so a stream can be added window by window.
+        """
+        rms = tone_features.rms[frames]
+        self.rms.add(rms[rms >= BASELINE_MIN_RMS])
+        self.f0.add(tone_features.f0[frames][tone_features.voiced[frames]])
+
+    def merge(self, other: "ToneBaseline") -> "ToneBaseline":
+        self.rms.merge(other.rms)
+        self.f0.merge(other.f0)
+        return self
+
+    def scale(self, factor: float) -> "ToneBaseline":
+        self.rms.scale(factor)
+        self.f0.scale(factor)
+        return self
+
+    @property
+    def is_ready(self) -> bool:
+        return self.rms.count >= MIN_BASELINE_FRAMES
+
+    @staticmethod
+    def _deviation(sketch: QuantileSketch, value: float) -> Optional[float]:
+        """
+        Robust z-score of `value` in the log domain: (log value - log median) / (log IQR / 1.349).
+        None if the value or the sketch is not usable.
+        """
+        if value <= 0 or sketch.count < MIN_BASELINE_FRAMES:
+            return None
+        median = sketch.quantile(0.5)
+        # At least one bucket wide, so a nearly constant baseline does not flag every wobble
+        spread = max(math.log(sketch.quantile(0.75) / sketch.quantile(0.25)) / 1.349, math.log(sketch.gamma))
+        return math.log(value / median) / spread
+
+    def deviations(self, average_rms: float, average_pitch_hz: float) -> Dict[str, Optional[float]]:
+        return {
+            "rms_z": self._deviation(self.rms, average_rms),
+            "pitch_z": self._deviation(self.f0, average_pitch_hz),
+        }
+
+    def flags(self, deviations: Dict[str, Optional[float]]) -> Dict[str, bool]:
+        return deviation_flags(deviations)
+
+    def summary(self) -> Dict:
+        """
+        Frame counts and quartiles of both distributions (stored in the results header).
+        """
+        return {
+            name: {
+                "frames": sketch.count,
+                "p25": sketch.quantile(0.25),
+                "median": sketch.quantile(0.5),
+                "p75": sketch.quantile(0.75),
+            }
+            for name, sketch in (("rms", self.rms), ("pitch_hz", self.f0))
+        }
+
+    def to_dict(self) -> Dict:
+        return {"rms": self.rms.to_dict(), "f0": self.f0.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ToneBaseline":
+        return cls(QuantileSketch.from_dict(data["rms"]), QuantileSketch.from_dict(data["f0"]))
+
+
+class ToneBaselineStore:
+    """
+    A persistent SQLite store of one ToneBaseline per room. The database may be shared
+    by several worker processes; each update is a read-merge-write in one transaction.
+    The recordings merged into each room are remembered, so re-running (or resuming)
+    a recording does not count its audio twice.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tone_baselines ("
+            " room TEXT PRIMARY KEY,"
+            " baseline TEXT NOT NULL,"
+            " num_recordings INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tone_baseline_recordings ("
+            " room TEXT NOT NULL,"
+            " recording TEXT NOT NULL,"
+            " added_at REAL NOT NULL,"
+            " PRIMARY KEY (room, recording))"
+        )
+
+    def get(self, room: str) -> Optional[ToneBaseline]:
+        with self._lock:
+            row = self._conn.execute("SELECT baseline FROM tone_baselines WHERE room = ?", (room,)).fetchone()
+        return ToneBaseline.from_dict(json.loads(row[0])) if row else None
+
+    def add_recording(
+        self,
+        room: str,
+        baseline: ToneBaseline,
+        recording: str,
+        decay: float = ROOM_BASELINE_DECAY
+    ) -> ToneBaseline:
+        """
+        Merges a recording's baseline into the room's (after decaying the stored counts),
+        unless that recording was merged already.
+
+        :param room: Room name.
+        :param baseline: The recording's own baseline.
+        :param recording: Identifies the recording (e.g. its absolute path).
+        :return: The room's updated baseline.
+        """
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so concurrent workers
+            # cannot both read the old baseline and overwrite each other's update
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT baseline, num_recordings FROM tone_baselines WHERE room = ?", (room,)
+                ).fetchone()
+                seen = self._conn.execute(
+                    "SELECT 1 FROM tone_baseline_recordings WHERE room = ? AND recording = ?", (room, recording)
+                ).fetchone()
+                if seen and row:
+                    self._conn.execute("COMMIT")
+                    return ToneBaseline.from_dict(json.loads(row[0]))
+                updated = ToneBaseline.from_dict(json.loads(row[0])).scale(decay) if row else ToneBaseline()
+                updated.merge(baseline)
+                now = time.time()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO tone_baselines VALUES (?, ?, ?, ?)",
+                    (room, json.dumps(updated.to_dict()), (row[1] if row else 0) + 1, now)
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO tone_baseline_recordings VALUES (?, ?, ?)", (room, recording, now)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return updated
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def resolve_tone_baseline(
+    tone_features,
+    mode: str = DEFAULT_TONE_BASELINE_MODE,
+    room: Optional[str] = None,
+    store: Optional[ToneBaselineStore] = None,
+    recording: Optional[str] = None
+) -> Optional[ToneBaseline]:
+    """
+    Returns the baseline to judge a recording's segments against (None for "fixed"
+    thresholds, or when there is too little audio for a baseline). In "room" mode the
+    recording is also merged into the room's stored baseline.
+
+    :param tone_features: The recording's ToneFeatures.
+    :param mode: One of TONE_BASELINE_MODES.
+    :param room: The recording's room (required for "room" mode).
+    :param store: Where room baselines are persisted (required for "room" mode).
+    :param recording: Identifies the recording in the store (required for "room" mode).
+    """
+    if mode not in TONE_BASELINE_MODES:
+        raise ValueError(f"Unknown tone baseline mode '{mode}'; expected one of {TONE_BASELINE_MODES}")
+    if mode == "fixed":
+        return None
+    recording_baseline = ToneBaseline.from_features(tone_features)
+    baseline = recording_baseline
+    if mode == "room":
+        if room is None or store is None or recording is None:
+            raise ValueError("The 'room' tone baseline needs the recording, its room and a baseline store")
+        room_baseline = store.add_recording(room, recording_baseline, recording)
+        if room_baseline.is_ready:
+            baseline = room_baseline
+    return baseline if baseline.is_ready else None
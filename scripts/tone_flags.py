@@ -0,0 +1,32 @@
+from typing import Dict, Optional
+
+# The tone flag rules, kept free of audio dependencies so that --reanalyze can re-flag
+# stored tone stats without librosa or numpy.
+
+# Simple thresholds for "loud" or "high pitch" detection (adjust as needed)
+LOUD_AMPLITUDE_THRESHOLD = 0.1      # Example amplitude threshold
+HIGH_PITCH_THRESHOLD_HZ = 220.0     # Example pitch threshold (Hz)
+
+# A segment is flagged when its average RMS or pitch lies this many robust standard
+# deviations (IQR / 1.349, in the log domain) above the baseline median.
+TONE_DEVIATION_Z = 2.5
+
+
+def fixed_tone_flags(average_amplitude: float, average_pitch_hz: float) -> dict:
+    """
+    Tone flags of the fixed thresholds, for a range's average amplitude and pitch.
+    """
+    return {
+        "loud": bool(average_amplitude > LOUD_AMPLITUDE_THRESHOLD),
+        "high_pitch": bool(average_pitch_hz > HIGH_PITCH_THRESHOLD_HZ)
+    }
+
+
+def deviation_flags(deviations: Dict[str, Optional[float]]) -> Dict[str, bool]:
+    """
+    Tone flags of a range's deviations ("rms_z", "pitch_z") from a baseline.
+    """
+    return {
+        "loud": deviations["rms_z"] is not None and deviations["rms_z"] > TONE_DEVIATION_Z,
+        "high_pitch": deviations["pitch_z"] is not None and deviations["pitch_z"] > TONE_DEVIATION_Z,
+    }
@@ -1,53 +1,560 @@
 import os
-import whisper
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from scripts.audio_buffer import AudioBuffer
+from scripts.cache import ArtifactCache, release_output
+from scripts.models import get_model
+from scripts.segments import load_segments, save_segments
+from scripts.vad import SpeechIndex, detect_speech_regions_from_array
+
+# Window length of incremental (pipeline mode) transcription: Whisper's own input length.
+WHISPER_WINDOW_SECONDS = 30.0
+# Characters of the previous window's text passed as the prompt of the next window,
+# so that windowed transcription keeps the context Whisper has when given the whole file.
+PROMPT_CARRYOVER_CHARS = 200
+
+# Transcription engines. Every engine is used through openai-whisper's
+# `model.transcribe(audio, language=..., initial_prompt=...)` interface:
+#   "openai"         - openai-whisper in PyTorch (reference)
+#   "faster-whisper" - CTranslate2 with INT8 weights (needs `pip install faster-whisper`)
+#   "chunked"        - the audio is split at silences and the chunks are transcribed by
+#                      CHUNKED_BASE_ENGINE in parallel worker processes
+TRANSCRIPTION_ENGINES = ("openai", "faster-whisper", "chunked")
+DEFAULT_TRANSCRIPTION_ENGINE = "openai"
+FASTER_WHISPER_COMPUTE_TYPE = "int8"
+CHUNKED_BASE_ENGINE = "openai"
+# Chunks of the "chunked" engine are at most this long; cuts are placed in the middle
+# of silences. The cuts depend on the audio and this length only, not on the number of
+# workers, so a cached transcript is the same whichever machine (or core count) made it.
+CHUNK_MAX_SECONDS = 120.0
+
+
+def load_whisper_model(model_size: str = "medium"):
+    """
+    Loads a Whisper model through the model registry, so each size is loaded once
+    per process and shared by every caller.
+
+    :param model_size: Whisper model size (tiny, base, small, medium, large).
+    :return: The loaded Whisper model.
+    """
+    def _load():
+        import whisper
+        return whisper.load_model(model_size)
+    return get_model(f"whisper/{model_size}", loader=_load)
+
+
+class FasterWhisperModel:
+    """
+    faster-whisper (CTranslate2) behind openai-whisper's `transcribe` interface:
+    returns {"text", "segments"} with the segment fields the rest of the code reads.
+    """
+
+    def __init__(self, model_size: str, compute_type: str = FASTER_WHISPER_COMPUTE_TYPE, cpu_threads: int = 0):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise ImportError("The faster-whisper engine needs: pip install faster-whisper") from e
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+    def transcribe(self, audio, language: Optional[str] = None, initial_prompt: Optional[str] = None, **_) -> Dict:
+        # Greedy decoding, like openai-whisper's transcribe defaults
+        segments, _info = self.model.transcribe(
+            audio, language=language, initial_prompt=initial_prompt, beam_size=1
+        )
+        result_segments = [
+            {
+                "id": seg.id,
+                "start": seg.start,
+                "end": seg.end,
+                "text": seg.text,
+                "avg_logprob": seg.avg_logprob,
+                "no_speech_prob": seg.no_speech_prob,
+                "compression_ratio": seg.compression_ratio,
+                "temperature": seg.temperature,
+            }
+            for seg in segments
+        ]
+        return {"text": "".join(seg["text"] for seg in result_segments), "segments": result_segments}
+
+
+def split_at_silences(audio, sr: int, target_seconds: float, speech_index: Optional[SpeechIndex] = None) -> List[Tuple[int, int]]:
+    """
+    Splits audio into [start, end) sample ranges of at most `target_seconds`, cutting
+    in the middle of the silences between speech regions (or hard at `target_seconds`
+    inside speech longer than that). Ranges without any speech are left out.
+
+    :param audio: Mono samples.
+    :param sr: Sample rate of `audio`.
+    :param target_seconds: Maximum chunk length.
+    :param speech_index: Speech regions of `audio` (detected if not given).
+    """
+    if speech_index is None:
+        speech_index = detect_speech_regions_from_array(audio, sr)
+    regions = speech_index.regions
+    if not regions:
+        return []
+    cut_points = [(end + next_start) / 2 for (_, end), (next_start, _) in zip(regions, regions[1:])]
+    duration = len(audio) / float(sr)
+
+    bounds = []
+    start = 0.0
+    for cut in cut_points + [duration]:
+        while cut - start > target_seconds:
+            # The next silence is too far: cut at the last silence that fits, or hard
+            fitting = [c for c in cut_points if start < c <= start + target_seconds]
+            end = fitting[-1] if fitting else start + target_seconds
+            bounds.append((start, end))
+            start = end
+    if start < duration:
+        bounds.append((start, duration))
+
+    chunks = []
+    for start, end in bounds:
+        if any(region_start < end and region_end > start for region_start, region_end in regions):
+            chunks.append((int(start * sr), min(len(audio), int(end * sr))))
+    return chunks
+
+
+# Per-process state of the chunked engine's worker processes
+_CHUNK_WORKER = {}
+
+
+def _init_chunk_worker(base_engine: str, model_size: str, num_threads: int):
+    # Split the cores between the workers instead of every worker using all of them
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    if base_engine == "openai":
+        import torch
+        torch.set_num_threads(num_threads)
+    _CHUNK_WORKER["model"] = load_transcription_engine(base_engine, model_size, cpu_threads=num_threads)
+
+
+def _transcribe_chunk(chunk, language_code: str) -> Dict:
+    if isinstance(chunk, tuple):
+        # (buffer path, start, end): read the chunk from the memory-mapped canonical
+        # buffer, shared through the page cache, instead of receiving a pickled copy
+        path, start, end = chunk
+        if path not in _CHUNK_WORKER:
+            _CHUNK_WORKER[path] = AudioBuffer(path)
+        chunk = _CHUNK_WORKER[path].samples[start:end]
+    return _CHUNK_WORKER["model"].transcribe(chunk, language=language_code)
+
+
+class ChunkedTranscriber:
+    """
+    Splits the audio at silences (scripts/vad.py) and transcribes the chunks in
+    parallel worker processes, each holding its own copy of the model, then shifts
+    the segment timestamps back onto the timeline of the whole audio.
+
+    Chunks are transcribed without the previous chunk's text as prompt, so a little
+    context is lost at every cut; cuts fall in silences to keep that small.
+    """
+
+    def __init__(
+        self,
+        model_size: str,
+        base_engine: str = CHUNKED_BASE_ENGINE,
+        num_workers: Optional[int] = None,
+        max_chunk_seconds: float = CHUNK_MAX_SECONDS
+    ):
+        self.model_size = model_size
+        self.base_engine = base_engine
+        self.num_workers = num_workers or max(1, (os.cpu_count() or 1) // 2)
+        self.max_chunk_seconds = max_chunk_seconds
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Started on first use and kept, so the workers load the model once
+        if self._executor is None:
+            threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_chunk_worker,
+                initargs=(self.base_engine, self.model_size, threads)
+            )
+        return self._executor
+
+    def warm_up(self):
+        """
+        Starts every worker process (each loads its model) without transcribing anything real.
+        """
+        if self.num_workers > 1:
+            import numpy as np
+            silence = np.zeros(16000, dtype=np.float32)
+            list(self._get_executor().map(_transcribe_chunk, [silence] * self.num_workers, [None] * self.num_workers))
+
+    def iter_transcribe(self, audio, language: Optional[str] = None) -> Iterator[List[Dict]]:
+        """
+        Yields the segments of every chunk, in order, as soon as the chunk and all
+        chunks before it are done.
+
+        :param audio: 16 kHz samples, or an AudioBuffer (scripts/audio_buffer.py), whose
+                      chunks the workers then read from the shared file themselves.
+        """
+        import whisper
+        sr = whisper.audio.SAMPLE_RATE
+        audio_buffer = audio if isinstance(audio, AudioBuffer) else None
+        if audio_buffer is not None:
+            audio = audio_buffer.samples
+        chunks = split_at_silences(audio, sr, self.max_chunk_seconds)
+        if self.num_workers <= 1 or len(chunks) <= 1:
+            model = load_transcription_engine(self.base_engine, self.model_size)
+            results = (model.transcribe(audio[start:end], language=language) for start, end in chunks)
+        else:
+            if audio_buffer is not None:
+                tasks = [(audio_buffer.path, start, end) for start, end in chunks]
+            else:
+                tasks = [audio[start:end] for start, end in chunks]
+            results = self._get_executor().map(_transcribe_chunk, tasks, [language] * len(chunks))
+
+        segment_id = 0
+        for (start, _), result in zip(chunks, results):
+            offset = start / float(sr)
+            for seg in result["segments"]:
+                seg["id"] = segment_id
+                seg["start"] += offset
+                seg["end"] += offset
+                segment_id += 1
+            yield result["segments"]
+
+    def transcribe(self, audio, language: Optional[str] = None, initial_prompt: Optional[str] = None, **_) -> Dict:
+        if isinstance(audio, str):
+            import whisper
+            audio = whisper.load_audio(audio)
+        segments = [seg for chunk_segments in self.iter_transcribe(audio, language) for seg in chunk_segments]
+        return {"text": "".join(seg["text"] for seg in segments), "segments": segments}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def load_transcription_engine(
+    engine: str = DEFAULT_TRANSCRIPTION_ENGINE,
+    model_size: str = "medium",
+    num_workers: Optional[int] = None,
+    cpu_threads: int = 0
+):
+    """
+    Returns a transcription engine (see TRANSCRIPTION_ENGINES) through the model
+    registry: an object with openai-whisper's `transcribe(audio, language=..., initial_prompt=...)`.
+
+    :param engine: "openai", "faster-whisper" or "chunked".
+    :param model_size: Whisper model size (tiny, base, small, medium, large).
+    :param num_workers: Worker processes of the "chunked" engine (default: half the cores).
+    :param cpu_threads: Threads of the "faster-whisper" engine (0: its default).
+    """
+    if engine == "openai":
+        return load_whisper_model(model_size)
+    if engine == "faster-whisper":
+        return get_model(
+            f"faster-whisper/{model_size}/{FASTER_WHISPER_COMPUTE_TYPE}",
+            loader=lambda: FasterWhisperModel(model_size, cpu_threads=cpu_threads)
+        )
+    if engine == "chunked":
+        return get_model(
+            f"whisper-chunked/{CHUNKED_BASE_ENGINE}/{model_size}/{num_workers}",
+            loader=lambda: ChunkedTranscriber(model_size, num_workers=num_workers)
+        )
+    raise ValueError(f"Unknown transcription engine '{engine}'; expected one of {TRANSCRIPTION_ENGINES}")
+
+
+def _engine_params(engine: str) -> Dict:
+    """
+    Cache parameters identifying the engine. Empty for the reference engine, so
+    transcripts cached before engines existed are still found.
+    """
+    if engine == "openai":
+        return {}
+    if engine == "faster-whisper":
+        return {"engine": engine, "compute_type": FASTER_WHISPER_COMPUTE_TYPE}
+    return {"engine": engine, "base_engine": CHUNKED_BASE_ENGINE, "max_chunk_seconds": CHUNK_MAX_SECONDS}
+
+
+def _load_transcription(transcript_path: str, segments_path: str) -> Dict:
+    with open(transcript_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return {
+        "text": text,
+        "segments": load_segments(segments_path),
+        "transcript_path": transcript_path,
+        "segments_path": segments_path,
+    }
+
+
+def _load_audio(input_file: str, audio_buffer: Optional[AudioBuffer] = None):
+    """
+    16 kHz samples of `input_file`: the canonical buffer's memory-mapped samples if
+    given, otherwise decoded and resampled by Whisper (ffmpeg).
+    """
+    if audio_buffer is not None:
+        return audio_buffer.samples
+    import whisper
+    return whisper.load_audio(input_file)
+
+
+def _engine_input(model, input_file: str, audio_buffer: Optional[AudioBuffer] = None):
+    """
+    What `model.transcribe` is given for the whole file: the chunked engine takes the
+    buffer itself so its workers map it, the other engines its samples (or the path).
+    """
+    if audio_buffer is None:
+        return input_file
+    return audio_buffer if isinstance(model, ChunkedTranscriber) else audio_buffer.samples
+
+
+def _transcribe_speech_regions(
+    model,
+    input_file: str,
+    language_code: str,
+    speech_index: SpeechIndex,
+    audio_buffer: Optional[AudioBuffer] = None
+) -> Dict:
+    """
+    Transcribes only the speech regions of `input_file` (concatenated) and maps the
+    segment timestamps back to the original timeline.
+    """
+    import whisper
+    audio = _load_audio(input_file, audio_buffer)
+    speech_audio = speech_index.slice_audio(audio, whisper.audio.SAMPLE_RATE)
+    print(f"Transcribing {speech_index.speech_seconds:.1f}s of speech "
+          f"({speech_index.skipped_fraction:.1%} of the audio skipped).")
+    if len(speech_audio) == 0:
+        return {"text": "", "segments": []}
+
+    result = model.transcribe(speech_audio, language=language_code)
+    _to_original_timeline(result["segments"], speech_index)
+    return result
+
+
+def _to_original_timeline(segments: List[Dict], speech_index: SpeechIndex):
+    for seg in segments:
+        seg["start"] = speech_index.compact_to_original(seg["start"])
+        seg["end"] = speech_index.compact_to_original(seg["end"], is_end=True)
+
+
+def iter_transcription_windows(
+    model,
+    audio,
+    language_code: str = "he",
+    window_seconds: float = WHISPER_WINDOW_SECONDS
+) -> Iterator[List[Dict]]:
+    """
+    Transcribes `audio` one window at a time and yields the segments of each window
+    as soon as it is done, with timestamps relative to the start of `audio`.
+
+    The last segment of a window may be cut off at the window edge, so it is dropped
+    and the next window starts where the previous complete segment ended. The text of
+    each window is passed to the next one as Whisper's initial prompt.
+
+    :param model: A loaded Whisper model (or any engine from `load_transcription_engine`).
+    :param audio: 16 kHz mono float32 samples (as returned by whisper.load_audio).
+    :param language_code: Language code for transcription.
+    :param window_seconds: Length of each window in seconds.
+    :return: An iterator over lists of Whisper segment dicts.
+    """
+    import whisper
+    sr = whisper.audio.SAMPLE_RATE
+    window = int(window_seconds * sr)
+    position = 0
+    prompt = None
+    while position < len(audio):
+        chunk = audio[position:position + window]
+        result = model.transcribe(chunk, language=language_code, initial_prompt=prompt)
+        segments = result["segments"]
+
+        advance = len(chunk)
+        if position + window < len(audio) and len(segments) > 1:
+            # Re-transcribe the possibly cut-off last segment as part of the next window
+            segments = segments[:-1]
+            advance = int(segments[-1]["end"] * sr) or len(chunk)
+
+        offset = position / float(sr)
+        for seg in segments:
+            seg["start"] += offset
+            seg["end"] += offset
+        if segments:
+            prompt = "".join(seg["text"] for seg in segments)[-PROMPT_CARRYOVER_CHARS:]
+        position += advance
+        yield segments
+
 
 def transcribe_audio_file(
     input_file: str, 
     language_code: str = "he", 
     model_size: str = "medium", 
     output_path: str = "./",
-    force_transcription: bool = False
-) -> str:
+    force_transcription: bool = False,
+    cache: Optional[ArtifactCache] = None,
+    speech_index: Optional[SpeechIndex] = None,
+    engine: str = DEFAULT_TRANSCRIPTION_ENGINE,
+    num_workers: Optional[int] = None,
+    audio_buffer: Optional[AudioBuffer] = None
+) -> Dict:
     """
     Transcribes the given audio file using OpenAI Whisper, with support for Hebrew.
-    Optionally saves the transcription to a text file.
+    Saves the full text to 'transcript.txt' and the timed segments to 'segments.npz'
+    (see scripts/segments.py).
     
     :param input_file: Path to the audio file (e.g., "processed.wav").
     :param language_code: Language code (default 'he' for Hebrew).
     :param model_size: Whisper model size (default 'medium').
-    :param output_transcript: Where to save the transcribed text (default 'transcript.txt').
-    :param force_transcription: If True, re-run Whisper even if the transcript file exists.
-    :return: The path to the transcription file.
+    :param output_path: Directory where 'transcript.txt' and 'segments.npz' are saved.
+    :param force_transcription: If True, re-run Whisper even if a cached transcript exists.
+    :param cache: Artifact cache keyed by the audio content, model size and language
+                  (None disables caching).
+    :param speech_index: Optional speech regions from scripts/vad.py. Only these regions
+                         are transcribed; segment timestamps refer to the original audio.
+    :param engine: Transcription engine (see TRANSCRIPTION_ENGINES).
+    :param num_workers: Worker processes of the "chunked" engine (default: half the cores).
+    :param audio_buffer: The file's canonical AudioBuffer (scripts/audio_buffer.py); when
+                         given, its memory-mapped samples are transcribed instead of decoding the file.
+    :return: A dict like Whisper's result: {"text": str, "segments": SegmentStore,
+             "transcript_path": str, "segments_path": str}. The segments are read lazily.
     """
-    # If transcript already exists and we don't want to force re-transcription, skip
     output_transcript = os.path.join(output_path, 'transcript.txt')
-    if not force_transcription and os.path.exists(output_transcript):
-        print(f"Transcript file '{output_transcript}' already exists. Skipping transcription.")
-        return output_transcript
+    output_segments = os.path.join(output_path, 'segments.npz')
+
+    # Reuse a transcript of the same audio made with the same model and language
+    params = {"model_size": model_size, "language_code": language_code}
+    params.update(_engine_params(engine))
+    if speech_index is not None:
+        params["speech_regions"] = speech_index.fingerprint()
+    input_key = None
+    if cache is not None:
+        input_key = cache.input_key(input_file)
+        entry = None if force_transcription else cache.lookup("transcribe", input_key, params)
+        if entry is not None:
+            print(f"Reusing cached transcript for '{input_file}'. Skipping transcription.")
+            cache.materialize(entry, "transcript.txt", output_transcript)
+            cache.materialize(entry, "segments.npz", output_segments)
+            return _load_transcription(output_transcript, output_segments)
 
     # Load a multilingual Whisper model.
-    model = whisper.load_model(model_size)
+    model = load_transcription_engine(engine, model_size, num_workers=num_workers)
 
     # Transcribe and specify the language to help the model.
-    result = model.transcribe(input_file, language=language_code)
+    if speech_index is None:
+        result = model.transcribe(_engine_input(model, input_file, audio_buffer), language=language_code)
+    else:
+        result = _transcribe_speech_regions(model, input_file, language_code, speech_index, audio_buffer)
     transcribed_text = result["text"]
 
-    # Save the transcribed text
+    # Save the transcribed text and the timed segments
+    release_output(output_transcript)
     with open(output_transcript, "w", encoding="utf-8") as f:
         f.write(transcribed_text)
+    save_segments(output_segments, result["segments"])
+
+    if cache is not None:
+        cache.store(
+            "transcribe", input_key, params,
+            files={"transcript.txt": output_transcript, "segments.npz": output_segments},
+            metadata={"num_segments": len(result["segments"])}
+        )
+
+    print(f"Transcription saved to '{output_transcript}' ({len(result['segments'])} segments).")
+    return _load_transcription(output_transcript, output_segments)
 
-    print(f"Transcription saved to '{output_transcript}'.")
-    return output_transcript
+def iter_transcribed_segments(
+    input_file: str,
+    language_code: str = "he",
+    model_size: str = "medium",
+    output_path: str = "./",
+    cache: Optional[ArtifactCache] = None,
+    speech_index: Optional[SpeechIndex] = None,
+    window_seconds: float = WHISPER_WINDOW_SECONDS,
+    engine: str = DEFAULT_TRANSCRIPTION_ENGINE,
+    num_workers: Optional[int] = None,
+    audio_buffer: Optional[AudioBuffer] = None
+) -> Iterator[List[Dict]]:
+    """
+    Incremental version of `transcribe_audio_file` used by the pipeline mode: yields
+    the segments of every `window_seconds` window as soon as it is transcribed, so
+    later stages can start before the whole file is done. Once all windows are done,
+    'transcript.txt' and 'segments.npz' are saved (and cached) as usual.
+
+    :param input_file: Path to the audio file (e.g., "processed.wav").
+    :param language_code: Language code (default 'he' for Hebrew).
+    :param model_size: Whisper model size (default 'medium').
+    :param output_path: Directory where 'transcript.txt' and 'segments.npz' are saved.
+    :param cache: Artifact cache (None disables caching). A cached transcript is
+                  yielded as a single batch.
+    :param speech_index: Optional speech regions from scripts/vad.py. Only these regions
+                         are transcribed; segment timestamps refer to the original audio.
+    :param window_seconds: Length of each transcription window in seconds.
+    :param engine: Transcription engine (see TRANSCRIPTION_ENGINES). The "chunked" engine
+                   yields its silence-delimited chunks, in order, instead of fixed windows.
+    :param num_workers: Worker processes of the "chunked" engine (default: half the cores).
+    :param audio_buffer: The file's canonical AudioBuffer, read instead of decoding the file.
+    :return: An iterator over lists of segment dicts ({"start", "end", "text", ...}).
+    """
+    output_transcript = os.path.join(output_path, 'transcript.txt')
+    output_segments = os.path.join(output_path, 'segments.npz')
+
+    # Windowed transcription can differ slightly from whole-file transcription,
+    # so it is cached separately.
+    params = {"model_size": model_size, "language_code": language_code, "window_seconds": window_seconds}
+    params.update(_engine_params(engine))
+    if engine == "chunked":
+        # Chunks are cut at silences, not in windows
+        del params["window_seconds"]
+    if speech_index is not None:
+        params["speech_regions"] = speech_index.fingerprint()
+    input_key = None
+    if cache is not None:
+        input_key = cache.input_key(input_file)
+        entry = cache.lookup("transcribe", input_key, params)
+        if entry is not None:
+            print(f"Reusing cached transcript for '{input_file}'. Skipping transcription.")
+            cache.materialize(entry, "transcript.txt", output_transcript)
+            cache.materialize(entry, "segments.npz", output_segments)
+            yield list(load_segments(output_segments))
+            return
+
+    import whisper
+    model = load_transcription_engine(engine, model_size, num_workers=num_workers)
+    audio = _load_audio(input_file, audio_buffer)
+    if speech_index is not None:
+        audio = speech_index.slice_audio(audio, whisper.audio.SAMPLE_RATE)
+
+    if engine == "chunked":
+        # Without speech regions the workers can read their chunks from the buffer file
+        source = audio_buffer if audio_buffer is not None and speech_index is None else audio
+        windows = model.iter_transcribe(source, language_code)
+    else:
+        windows = iter_transcription_windows(model, audio, language_code, window_seconds)
+    all_segments = []
+    for segments in windows:
+        if speech_index is not None:
+            _to_original_timeline(segments, speech_index)
+        all_segments.extend(segments)
+        yield segments
+
+    release_output(output_transcript)
+    with open(output_transcript, "w", encoding="utf-8") as f:
+        f.write("".join(seg["text"] for seg in all_segments))
+    save_segments(output_segments, all_segments)
+    if cache is not None:
+        cache.store(
+            "transcribe", input_key, params,
+            files={"transcript.txt": output_transcript, "segments.npz": output_segments},
+            metadata={"num_segments": len(all_segments)}
+        )
+    print(f"Transcription saved to '{output_transcript}' ({len(all_segments)} segments).")
 
 if __name__ == "__main__":
     # Example usage
-    transcript_file = transcribe_audio_file(
+    transcription = transcribe_audio_file(
         input_file="processed.wav",
         language_code="he",
         model_size="medium",
-        output_transcript="my_transcript.txt",
+        output_path="./",
         force_transcription=False
     )
 
-    print(f"Transcript file path: {transcript_file}")
-
+    print(f"Transcript file path: {transcription['transcript_path']}")
+    print(f"Number of segments: {len(transcription['segments'])}")
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from scripts.batching import DEFAULT_BATCH_SIZE, run_pipeline_batched
+from scripts.metrics import get_collector
+from scripts.models import HE_EN_TRANSLATION_MODEL_NAME, get_model
+
+# Available translation backends:
+#   "google" - googletrans (online, one request per distinct text, with retries)
+#   "marian" - local MarianMT he->en model (offline, batched)
+TRANSLATION_BACKENDS = ("google", "marian")
+DEFAULT_TRANSLATION_BACKEND = "google"
+
+# googletrans retries: wait GOOGLE_RETRY_BASE_SECONDS, then twice as long, ...
+GOOGLE_MAX_RETRIES = 3
+GOOGLE_RETRY_BASE_SECONDS = 1.0
+
+TRANSLATION_CACHE_FILE = "translations.sqlite"
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """
+    A persistent SQLite store of translations, keyed by (backend, model, source text).
+
+    Daycare speech repeats the same short phrases all day, so most segments of a new
+    recording are already in the cache. The database may be shared by several
+    worker processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " backend TEXT NOT NULL,"
+            " source_hash TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " translation TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (backend, source_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, backend: str, texts: List[str]) -> Dict[str, str]:
+        """
+        Returns {text: translation} for the texts that are in the cache.
+        """
+        found = {}
+        hashes = {_text_hash(text): text for text in texts}
+        keys = list(hashes)
+        with self._lock:
+            # Stay well below SQLite's limit on query parameters
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT source_hash, translation FROM translations "
+                    f"WHERE backend = ? AND source_hash IN ({','.join('?' * len(chunk))})",
+                    [backend] + chunk
+                ).fetchall()
+                for source_hash, translation in rows:
+                    found[hashes[source_hash]] = translation
+        return found
+
+    def put_many(self, backend: str, translations: Dict[str, str]):
+        """
+        Stores {text: translation} pairs.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)",
+                [(backend, _text_hash(text), text, translation, now) for text, translation in translations.items()]
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _translate_google(texts: List[str], src: str, dest: str) -> List[str]:
+    from googletrans import Translator
+    translator = Translator()
+    translations = []
+    for text in texts:
+        for attempt in range(GOOGLE_MAX_RETRIES + 1):
+            try:
+                translations.append(translator.translate(text, src=src, dest=dest).text)
+                break
+            except Exception as e:
+                if attempt == GOOGLE_MAX_RETRIES:
+                    raise
+                wait = GOOGLE_RETRY_BASE_SECONDS * 2 ** attempt
+                print(f"Translation request failed ({e}); retrying in {wait:.0f}s...")
+                time.sleep(wait)
+                # A new client gets a fresh connection and token
+                translator = Translator()
+    return translations
+
+
+def _translate_marian(texts: List[str], batch_size: int) -> List[str]:
+    pipe = get_model("he_en_translation")
+    outputs = run_pipeline_batched(pipe, texts, batch_size=batch_size)
+    return [output["translation_text"] for output in outputs]
+
+
+class TextTranslator:
+    """
+    Translates Hebrew segment texts to English with the chosen backend.
+
+    Each call de-duplicates its texts, looks them up in the translation cache and
+    only sends the missing ones to the backend (in batches for "marian"). Counters
+    for the cache hit rate and translation throughput accumulate over all calls.
+    """
+
+    def __init__(
+        self,
+        backend: str = DEFAULT_TRANSLATION_BACKEND,
+        cache: Optional[TranslationCache] = None,
+        src: str = "he",
+        dest: str = "en"
+    ):
+        if backend not in TRANSLATION_BACKENDS:
+            raise ValueError(f"Unknown translation backend '{backend}'; expected one of {TRANSLATION_BACKENDS}")
+        self.backend = backend
+        self.cache = cache
+        self.src = src
+        self.dest = dest
+        self.stats = {"texts": 0, "unique_texts": 0, "cache_hits": 0, "translated": 0, "translate_seconds": 0.0}
+
+    @property
+    def cache_key(self) -> str:
+        """Backend identifier stored with each cached translation."""
+        if self.backend == "marian":
+            return f"marian:{HE_EN_TRANSLATION_MODEL_NAME}"
+        return f"google:{self.src}-{self.dest}"
+
+    def translate_texts(self, texts: List[str], batch_size: int = DEFAULT_BATCH_SIZE) -> List[str]:
+        """
+        Translates many texts at once.
+
+        :param texts: Source texts (e.g. one per transcript segment).
+        :param batch_size: Number of texts per forward pass of the "marian" backend.
+        :return: One translation per text, in the same order as `texts`.
+        """
+        unique_texts = list(dict.fromkeys(text for text in texts if text.strip()))
+        translations = {}
+        if self.cache is not None and unique_texts:
+            translations.update(self.cache.get_many(self.cache_key, unique_texts))
+        missing = [text for text in unique_texts if text not in translations]
+
+        if missing:
+            start = time.perf_counter()
+            with get_collector().stage("translation", items=len(missing)):
+                if self.backend == "marian":
+                    new_translations = _translate_marian(missing, batch_size)
+                else:
+                    new_translations = _translate_google(missing, self.src, self.dest)
+            self.stats["translate_seconds"] += time.perf_counter() - start
+            new_translations = dict(zip(missing, new_translations))
+            translations.update(new_translations)
+            if self.cache is not None:
+                self.cache.put_many(self.cache_key, new_translations)
+
+        self.stats["texts"] += len(texts)
+        self.stats["unique_texts"] += len(unique_texts)
+        self.stats["cache_hits"] += len(unique_texts) - len(missing)
+        self.stats["translated"] += len(missing)
+        return [translations[text] if text.strip() else "" for text in texts]
+
+    def translate(self, text: str) -> str:
+        return self.translate_texts([text])[0]
+
+
+def format_translation_stats(stats: Dict) -> str:
+    """
+    Formats the counters of a TextTranslator (cache hit rate and throughput).
+    """
+    hit_rate = stats["cache_hits"] / stats["unique_texts"] if stats["unique_texts"] else 0.0
+    throughput = stats["translated"] / stats["translate_seconds"] if stats["translate_seconds"] > 0 else 0.0
+    return (
+        f"{stats['texts']} texts ({stats['unique_texts']} distinct), "
+        f"cache hit rate {hit_rate:.1%}, "
+        f"{stats['translated']} translated at {throughput:.1f} texts/s"
+    )
+
+
+def create_text_translator(
+    backend: str = DEFAULT_TRANSLATION_BACKEND,
+    cache_path: Optional[str] = None
+) -> TextTranslator:
+    """
+    Returns a TextTranslator for `backend`, with a persistent cache at `cache_path`
+    (None disables the cache).
+    """
+    cache = TranslationCache(cache_path) if cache_path else None
+    return TextTranslator(backend=backend, cache=cache)
+
+
+if __name__ == "__main__":
+    # Example usage
+    translator = create_text_translator("marian", cache_path=TRANSLATION_CACHE_FILE)
+    print(translator.translate_texts(["שלום, מה שלומך?", "בוא נלך לגן", "שלום, מה שלומך?"]))
+    print(format_translation_stats(translator.stats))
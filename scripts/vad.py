@@ -0,0 +1,213 @@
+import hashlib
+import json
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Energy/spectral voice activity detection settings.
+VAD_FRAME_SECONDS = 0.032
+VAD_HOP_SECONDS = 0.016
+VAD_BLOCK_SECONDS = 60.0          # features are computed block by block to bound memory
+# A frame is speech-like when it is this much louder than the noise floor
+# (the NOISE_FLOOR_PERCENTILE of frame energies) ...
+VAD_ENERGY_MARGIN_DB = 9.0
+NOISE_FLOOR_PERCENTILE = 10
+# ... and its spectrum is not flat like noise (spectral flatness in [0, 1]).
+VAD_MAX_FLATNESS = 0.45
+# Speech band used for the flatness measure
+VAD_BAND_HZ = (100.0, 4000.0)
+# Region post-processing
+VAD_MIN_SPEECH_SECONDS = 0.25
+VAD_MIN_SILENCE_SECONDS = 0.4
+VAD_PAD_SECONDS = 0.2
+
+
+class SpeechIndex:
+    """
+    The speech regions of a recording, as sorted, non-overlapping [start, end) times in
+    seconds, plus the mapping between the original timeline and the "compact" timeline
+    obtained by concatenating only the speech regions.
+    """
+
+    def __init__(self, regions: List[Tuple[float, float]], duration: float):
+        self.regions = [(float(s), float(e)) for s, e in regions]
+        self.duration = float(duration)
+        lengths = [e - s for s, e in self.regions]
+        # compact-timeline start of each region
+        self._compact_starts = np.concatenate([[0.0], np.cumsum(lengths)]) if lengths else np.zeros(1)
+
+    @property
+    def speech_seconds(self) -> float:
+        return float(self._compact_starts[-1])
+
+    @property
+    def skipped_fraction(self) -> float:
+        """Fraction of the recording that is not speech (and is skipped by later stages)."""
+        if self.duration <= 0:
+            return 0.0
+        return max(0.0, 1.0 - self.speech_seconds / self.duration)
+
+    def compact_to_original(self, t: float, is_end: bool = False) -> float:
+        """
+        Maps a time on the compact (speech-only) timeline back to the original recording.
+
+        :param t: Time in seconds on the compact timeline.
+        :param is_end: Map a time exactly on a region boundary to the end of the earlier
+                       region (for segment end times) instead of the start of the next one.
+        """
+        if not self.regions:
+            return t
+        side = "left" if is_end else "right"
+        k = int(np.searchsorted(self._compact_starts, t, side=side)) - 1
+        k = min(max(k, 0), len(self.regions) - 1)
+        start, end = self.regions[k]
+        return min(end, start + (t - self._compact_starts[k]))
+
+    def frame_mask(self, num_frames: int, hop_length: int, sr: int) -> np.ndarray:
+        """
+        Boolean mask of the analysis frames (frame i centred on sample i * hop_length)
+        that fall inside a speech region.
+        """
+        mask = np.zeros(num_frames, dtype=bool)
+        for start, end in self.regions:
+            first = int(np.floor(start * sr / hop_length))
+            last = int(np.ceil(end * sr / hop_length))
+            mask[max(0, first):min(num_frames, last)] = True
+        return mask
+
+    def slice_audio(self, y: np.ndarray, sr: int) -> np.ndarray:
+        """
+        Returns the speech regions of `y` concatenated (the compact timeline).
+        """
+        if not self.regions:
+            return y[:0]
+        return np.concatenate([y[int(s * sr):int(e * sr)] for s, e in self.regions])
+
+    def fingerprint(self) -> str:
+        """A short hash of the regions, used in cache keys of stages that depend on them."""
+        payload = json.dumps([[round(s, 3), round(e, 3)] for s, e in self.regions])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def to_dict(self) -> dict:
+        return {
+            "duration": self.duration,
+            "speech_seconds": self.speech_seconds,
+            "skipped_fraction": self.skipped_fraction,
+            "regions": [[s, e] for s, e in self.regions],
+        }
+
+    def save(self, path: str) -> str:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "SpeechIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls([tuple(r) for r in data["regions"]], data["duration"])
+
+
+def _frame_features(y: np.ndarray, sr: int, frame_length: int, hop_length: int):
+    """
+    Log energy (dB) and in-band spectral flatness per frame, computed block by block.
+    Frame i starts at sample i * hop_length.
+    """
+    num_frames = max(0, 1 + (len(y) - frame_length) // hop_length) if len(y) >= frame_length else 0
+    energy_db = np.empty(num_frames, dtype=np.float32)
+    flatness = np.empty(num_frames, dtype=np.float32)
+    window = np.hanning(frame_length).astype(np.float32)
+    freqs = np.fft.rfftfreq(frame_length, 1.0 / sr)
+    band = (freqs >= VAD_BAND_HZ[0]) & (freqs <= VAD_BAND_HZ[1])
+
+    frames_per_block = max(1, int(VAD_BLOCK_SECONDS * sr / hop_length))
+    for first in range(0, num_frames, frames_per_block):
+        last = min(num_frames, first + frames_per_block)
+        segment = y[first * hop_length:(last - 1) * hop_length + frame_length]
+        frames = np.lib.stride_tricks.sliding_window_view(segment, frame_length)[::hop_length][:last - first]
+        energy = np.mean(frames.astype(np.float32) ** 2, axis=1)
+        energy_db[first:last] = 10 * np.log10(energy + 1e-12)
+        power = np.abs(np.fft.rfft(frames * window, axis=1))[:, band] ** 2 + 1e-12
+        flatness[first:last] = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return energy_db, flatness
+
+
+def _mask_to_regions(mask: np.ndarray, hop_seconds: float, frame_seconds: float) -> List[Tuple[float, float]]:
+    padded = np.concatenate([[False], mask, [False]]).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return [
+        (start * hop_seconds, (end - 1) * hop_seconds + frame_seconds)
+        for start, end in zip(edges[::2], edges[1::2])
+    ]
+
+
+def _clean_regions(regions: List[Tuple[float, float]], duration: float) -> List[Tuple[float, float]]:
+    # Merge regions separated by short silences
+    merged = []
+    for start, end in regions:
+        if merged and start - merged[-1][1] < VAD_MIN_SILENCE_SECONDS:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    # Drop blips, then pad what is left (and merge again where padding overlaps)
+    cleaned = []
+    for start, end in merged:
+        if end - start < VAD_MIN_SPEECH_SECONDS:
+            continue
+        start, end = max(0.0, start - VAD_PAD_SECONDS), min(duration, end + VAD_PAD_SECONDS)
+        if cleaned and start <= cleaned[-1][1]:
+            cleaned[-1] = (cleaned[-1][0], end)
+        else:
+            cleaned.append((start, end))
+    return cleaned
+
+
+def detect_speech_regions_from_array(y: np.ndarray, sr: int) -> SpeechIndex:
+    """
+    Lightweight energy + spectral-flatness voice activity detection.
+
+    :param y: Mono audio samples.
+    :param sr: Sample rate of `y`.
+    :return: A SpeechIndex with the detected speech regions.
+    """
+    duration = len(y) / float(sr)
+    frame_length = int(VAD_FRAME_SECONDS * sr)
+    hop_length = int(VAD_HOP_SECONDS * sr)
+    energy_db, flatness = _frame_features(y, sr, frame_length, hop_length)
+    if len(energy_db) == 0:
+        return SpeechIndex([], duration)
+
+    noise_floor_db = float(np.percentile(energy_db, NOISE_FLOOR_PERCENTILE))
+    speech = (energy_db > noise_floor_db + VAD_ENERGY_MARGIN_DB) & (flatness < VAD_MAX_FLATNESS)
+    regions = _mask_to_regions(speech, hop_length / float(sr), frame_length / float(sr))
+    return SpeechIndex(_clean_regions(regions, duration), duration)
+
+
+def detect_speech_regions(audio_file: str, output_file: Optional[str] = None, audio_buffer=None) -> SpeechIndex:
+    """
+    Runs voice activity detection on an audio file (e.g. 'processed.wav') and
+    optionally saves the speech-region index as JSON.
+
+    :param audio_file: Path to the audio file.
+    :param output_file: Where to save the index (e.g. 'vad.json'), or None.
+    :param audio_buffer: The file's canonical AudioBuffer (scripts/audio_buffer.py);
+                         when given, its memory-mapped samples are used instead of decoding the file.
+    :return: A SpeechIndex with the detected speech regions.
+    """
+    if audio_buffer is not None:
+        y, sr = audio_buffer.samples, audio_buffer.sample_rate
+    else:
+        import librosa
+        y, sr = librosa.load(audio_file, sr=None)
+    speech_index = detect_speech_regions_from_array(y, sr)
+    if output_file:
+        speech_index.save(output_file)
+    return speech_index
+
+
+if __name__ == "__main__":
+    # Example usage
+    index = detect_speech_regions("processed.wav")
+    print(f"{len(index.regions)} speech regions, "
+          f"{index.speech_seconds:.1f}s of {index.duration:.1f}s "
+          f"({index.skipped_fraction:.1%} skipped)")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Builds and queries a search index over the results of many recordings.
+
+Usage:
+    python search.py index --output /path/to/results/
+    python search.py query --db /path/to/results/search_index.sqlite "תסתום" --room 3 \
+                           --from 2024-05-01 --to 2024-05-31
+"""
+import argparse
+import json
+import os
+import time
+
+from scripts.search_index import INDEX_FILE, SearchIndex
+
+
+def format_result(result: dict) -> str:
+    flags = [name for name in ("problematic", "loud", "high_pitch") if result[name]]
+    line = (f"{result['recorded_date'] or '?'} room {result['room'] or '?'} "
+            f"{os.path.basename(result['input'] or '')} [{result['start']:.1f}s-{result['end']:.1f}s] "
+            f"{result['text']}")
+    details = []
+    if result["keywords"]:
+        details.append("keywords: " + ", ".join(result["keywords"]))
+    if result["toxicity_score"] is not None:
+        details.append(f"toxicity {result['toxicity_score']:.2f}")
+    if flags:
+        details.append(", ".join(flags))
+    return line + (f"  ({'; '.join(details)})" if details else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search analyzed daycare recordings.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="Add new or changed results under an output directory.")
+    index_parser.add_argument("--output", "-o", required=True, help="Output directory of main.py (one directory per recording).")
+    index_parser.add_argument("--db", default=None, help=f"Index file. Default: <output>/{INDEX_FILE}.")
+    index_parser.add_argument("--room", default=None, help="Room of all these recordings (overrides the room taken from their paths).")
+
+    query_parser = subparsers.add_parser("query", help="Find segments.")
+    query_parser.add_argument("text", nargs="?", default=None, help="Words to find in the Hebrew or English text ('word*' for prefixes).")
+    query_parser.add_argument("--db", required=True, help="Index file.")
+    query_parser.add_argument("--room", default=None)
+    query_parser.add_argument("--from", dest="date_from", default=None, help="First date, YYYY-MM-DD.")
+    query_parser.add_argument("--to", dest="date_to", default=None, help="Last date, YYYY-MM-DD.")
+    query_parser.add_argument("--keyword", default=None, help="Only segments where this keyword was found.")
+    query_parser.add_argument("--problematic", action="store_true", help="Only problematic segments.")
+    query_parser.add_argument("--min_toxicity", type=float, default=None)
+    query_parser.add_argument("--loud", action="store_true", help="Only segments flagged as loud.")
+    query_parser.add_argument("--high_pitch", action="store_true", help="Only segments flagged as high pitch.")
+    query_parser.add_argument("--limit", type=int, default=100)
+    query_parser.add_argument("--json", action="store_true", help="Print results as JSON lines.")
+    args = parser.parse_args()
+
+    if args.command == "index":
+        index = SearchIndex(args.db or os.path.join(args.output, INDEX_FILE))
+        start = time.perf_counter()
+        stats = index.index_directory(args.output, room=args.room)
+        print(f"Indexed {stats['indexed']} recordings ({stats['segments']} segments), "
+              f"{stats['skipped']} unchanged or still in progress, {stats['removed']} removed "
+              f"in {time.perf_counter() - start:.1f}s.")
+        summary = index.summary()
+        print(f"Index: {summary['recordings']} recordings, {summary['segments']} segments, "
+              f"{summary['problematic']} problematic.")
+        index.close()
+        return
+
+    index = SearchIndex(args.db)
+    start = time.perf_counter()
+    results = index.search(
+        text=args.text,
+        room=args.room,
+        date_from=args.date_from,
+        date_to=args.date_to,
+        keyword=args.keyword,
+        problematic=True if args.problematic else None,
+        min_toxicity=args.min_toxicity,
+        loud=True if args.loud else None,
+        high_pitch=True if args.high_pitch else None,
+        limit=args.limit
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False) if args.json else format_result(result))
+    print(f"{len(results)} segments in {elapsed_ms:.1f} ms.")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
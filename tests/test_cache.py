@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from scripts.cache import ArtifactCache, release_output
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _transcribe(cache, input_file, output_file, model_size):
+    # The cache pattern of the stages: materialize on a hit, else write and store
+    params = {"model_size": model_size}
+    input_key = cache.input_key(input_file)
+    entry = cache.lookup("transcribe", input_key, params)
+    if entry is not None:
+        cache.materialize(entry, "transcript.txt", output_file)
+        return "hit"
+    release_output(output_file)
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(f"transcript by {model_size}")
+    cache.store("transcribe", input_key, params, files={"transcript.txt": output_file})
+    return "miss"
+
+
+@pytest.fixture
+def setup(tmp_path):
+    input_file = tmp_path / "rec.wav"
+    input_file.write_bytes(b"RIFF audio")
+    return ArtifactCache(str(tmp_path / "cache")), str(input_file), str(tmp_path / "transcript.txt")
+
+
+def test_rerun_with_other_params_keeps_first_entry(setup):
+    cache, input_file, output_file = setup
+    assert _transcribe(cache, input_file, output_file, "small") == "miss"
+    assert _transcribe(cache, input_file, output_file, "medium") == "miss"
+    assert _read(output_file) == "transcript by medium"
+
+    # The same output directory again, after the materialized file was rewritten
+    assert _transcribe(cache, input_file, output_file, "small") == "hit"
+    assert _read(output_file) == "transcript by small"
+    assert _transcribe(cache, input_file, output_file, "medium") == "hit"
+    assert _read(output_file) == "transcript by medium"
+
+
+def test_entry_changed_through_hard_link_is_not_served(setup):
+    cache, input_file, output_file = setup
+    _transcribe(cache, input_file, output_file, "small")
+    entry = cache.lookup("transcribe", cache.input_key(input_file), {"model_size": "small"})
+    cached = os.path.join(entry["dir"], "transcript.txt")
+
+    # Same size, new content: only the recorded mtime and hash tell
+    with open(cached, "w", encoding="utf-8") as f:
+        f.write("transcript by SMALL")
+    assert cache.lookup("transcribe", cache.input_key(input_file), {"model_size": "small"}) is None
+    assert _transcribe(cache, input_file, output_file, "small") == "miss"
+    assert _read(output_file) == "transcript by small"
+
+
+def test_touched_entry_with_same_content_is_served(setup):
+    cache, input_file, output_file = setup
+    _transcribe(cache, input_file, output_file, "small")
+    entry = cache.lookup("transcribe", cache.input_key(input_file), {"model_size": "small"})
+    os.utime(os.path.join(entry["dir"], "transcript.txt"), ns=(0, 0))
+    assert cache.lookup("transcribe", cache.input_key(input_file), {"model_size": "small"}) is not None
+
+
+def test_segment_store_writer_releases_cached_file(setup, tmp_path):
+    pytest.importorskip("numpy")
+    from scripts.segments import load_segments, save_segments
+
+    cache, input_file, _ = setup
+    output_file = str(tmp_path / "segments.npz")
+    save_segments(output_file, [{"start": 0.0, "end": 1.0, "text": "small"}])
+    entry = cache.store("transcribe", cache.input_key(input_file), {"model_size": "small"},
+                        files={"segments.npz": output_file})
+    save_segments(output_file, [{"start": 0.0, "end": 2.0, "text": "medium"}])
+
+    entry = cache.lookup("transcribe", cache.input_key(input_file), {"model_size": "small"})
+    assert [seg["text"] for seg in load_segments(os.path.join(entry["dir"], "segments.npz"))] == ["small"]
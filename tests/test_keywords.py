@@ -0,0 +1,24 @@
+from scripts.keywords import KeywordMatcher
+
+
+def test_matches_normalised_forms_with_prefixes():
+    matcher = KeywordMatcher(["מכה", "stupid"], hebrew_prefixes=True)
+    assert matcher.found_keywords("והמכה הייתה חזקה") == ["מכה"]
+    assert matcher.found_keywords("מַכָּה") == ["מכה"]
+    assert matcher.found_keywords("STUPID!") == ["stupid"]
+    assert matcher.found_keywords("מכהלים") == []
+
+
+def test_overlapping_keywords_are_all_reported():
+    matcher = KeywordMatcher(["stupid", "stupid kid"])
+    matches = matcher.find("you stupid kid")
+    assert [(m["keyword"], m["text"]) for m in matches] == [("stupid kid", "stupid kid"), ("stupid", "stupid")]
+    assert matcher.keywords_from_matches(matches) == ["stupid", "stupid kid"]
+
+
+def test_spelling_variants_are_reported_as_listed():
+    # Entries that differ only by niqqud or case are each reported as they appear in the list
+    matcher = KeywordMatcher(["מַכָּה", "דחיפה", "מכה", "Idiot", "idiot"], hebrew_prefixes=True)
+    assert matcher.found_keywords("הוא נתן מכה") == ["מַכָּה", "מכה"]
+    assert matcher.found_keywords("IDIOT") == ["Idiot", "idiot"]
+    assert [m["keyword"] for m in matcher.find("מַכָּה")] == ["מַכָּה", "מכה"]
@@ -0,0 +1,56 @@
+import os
+import stat
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("noisereduce")
+pytest.importorskip("pydub")
+
+from scripts.preprocess import iter_pcm_blocks  # noqa: E402
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    # Stands in for ffmpeg: writes `samples` int16 samples to stdout, then exits with `status`
+    def install(samples, status=0):
+        script = tmp_path / "ffmpeg"
+        script.write_text(
+            "#!/bin/sh\n"
+            f"head -c {samples * 2} /dev/zero\n"
+            f"[ {status} -eq 0 ] || echo 'decode error' >&2\n"
+            f"exit {status}\n"
+        )
+        script.chmod(script.stat().st_mode | stat.S_IEXEC)
+        monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return install
+
+
+def test_reads_every_block(fake_ffmpeg):
+    fake_ffmpeg(2500)
+    blocks = list(iter_pcm_blocks("rec.wav", 16000, 1000))
+    assert [len(block) for block in blocks] == [1000, 1000, 500]
+
+
+def test_failed_decode_raises_at_end_of_stream(fake_ffmpeg):
+    fake_ffmpeg(100, status=1)
+    with pytest.raises(RuntimeError, match="decode error"):
+        list(iter_pcm_blocks("rec.wav", 16000, 1000))
+
+
+def test_closing_early_does_not_raise(fake_ffmpeg):
+    fake_ffmpeg(10_000_000, status=1)
+    blocks = iter_pcm_blocks("rec.wav", 16000, 1000)
+    next(blocks)
+    blocks.close()
+
+
+def test_consumer_exception_is_not_hidden(fake_ffmpeg):
+    fake_ffmpeg(10_000_000, status=1)
+    blocks = iter_pcm_blocks("rec.wav", 16000, 1000)
+    with pytest.raises(KeyError):
+        try:
+            for _ in blocks:
+                raise KeyError("consumer")
+        finally:
+            blocks.close()
@@ -0,0 +1,132 @@
+import pytest
+
+from common.consts import TOXICITY_THRESHOLD
+from scripts.decision import is_segment_problematic
+from scripts.reanalyze import ANALYSIS_PARTS, analysis_fingerprints, changed_parts, reanalyze_results
+from scripts.results import ResultsWriter, iter_results, iter_segments, read_results_header
+from scripts.tone_flags import HIGH_PITCH_THRESHOLD_HZ, LOUD_AMPLITUDE_THRESHOLD
+
+
+def _tone(amplitude=0.01, pitch=150.0, flags=None):
+    return {"average_amplitude": amplitude, "average_pitch_hz": pitch,
+            "tone_flags": flags or {"loud": False, "high_pitch": False}}
+
+
+def _segment(text_hebrew, problematic=False, found_keywords=(), text_english=None, toxicity_score=0.0, tone=None,
+             cascade=None):
+    # As a full run stored it, including its decision at the time
+    analysis = {"hebrew_analysis": {"text_hebrew": text_hebrew, "found_keywords": list(found_keywords)}}
+    if text_english is not None:
+        analysis["english_analysis"] = {"text_english": text_english, "found_keywords": [],
+                                        "toxicity_label": "toxic", "toxicity_score": toxicity_score}
+    if cascade is not None:
+        analysis["cascade"] = cascade
+    return {"start": 0.0, "end": 1.0, "text": text_hebrew, "text_analysis": analysis,
+            "tone_analysis": tone or _tone(), "problematic": problematic}
+
+
+def _write(path, segments, fingerprints=None, complete=True):
+    if fingerprints is None:
+        fingerprints = analysis_fingerprints(TOXICITY_THRESHOLD)
+    header = {"fingerprint": "x", "global_tone": _tone(), "analysis_fingerprints": fingerprints}
+    writer = ResultsWriter(path, header)
+    for segment in segments:
+        writer.write_segment(segment)
+    if complete:
+        writer.close()
+    else:
+        writer._file.close()
+    return path
+
+
+def test_changed_parts():
+    fingerprints = analysis_fingerprints(TOXICITY_THRESHOLD)
+    assert changed_parts({"analysis_fingerprints": fingerprints}, fingerprints) == []
+    assert changed_parts({}, fingerprints) == list(ANALYSIS_PARTS)
+    stricter = analysis_fingerprints(TOXICITY_THRESHOLD + 0.1)
+    assert changed_parts({"analysis_fingerprints": fingerprints}, stricter) == ["decision"]
+
+
+def test_up_to_date_file_is_left_alone(tmp_path):
+    path = _write(str(tmp_path / "results.jsonl"), [_segment("שלום")])
+    before = open(path, encoding="utf-8").read()
+    assert reanalyze_results(path, is_segment_problematic, analysis_fingerprints(TOXICITY_THRESHOLD)) is None
+    assert open(path, encoding="utf-8").read() == before
+
+
+def test_incomplete_file_is_refused(tmp_path):
+    path = _write(str(tmp_path / "results.jsonl"), [_segment("שלום")], fingerprints={}, complete=False)
+    with pytest.raises(ValueError):
+        reanalyze_results(path, is_segment_problematic, analysis_fingerprints(TOXICITY_THRESHOLD))
+
+
+def test_changed_keyword_list_rematches_stored_text(tmp_path):
+    # Written before "אלימות" was a keyword: the stored match list is empty
+    stale = dict(analysis_fingerprints(TOXICITY_THRESHOLD), hebrew_keywords="old")
+    path = _write(str(tmp_path / "results.jsonl"), [_segment("זו אלימות"), _segment("שלום")], fingerprints=stale)
+
+    fingerprints = analysis_fingerprints(TOXICITY_THRESHOLD)
+    stats = reanalyze_results(path, is_segment_problematic, fingerprints)
+    assert stats["changed_parts"] == ["hebrew_keywords"]
+    assert stats["newly_problematic"] == 1 and stats["no_longer_problematic"] == 0
+    segments = list(iter_segments(path))
+    assert segments[0]["text_analysis"]["hebrew_analysis"]["found_keywords"] == ["אלימות"]
+    assert [s["problematic"] for s in segments] == [True, False]
+    assert read_results_header(path)["analysis_fingerprints"] == fingerprints
+    assert list(iter_results(path))[-1]["num_problematic"] == 1
+    # Now up to date
+    assert reanalyze_results(path, is_segment_problematic, fingerprints) is None
+
+
+def test_changed_toxicity_threshold_redecides(tmp_path):
+    score = TOXICITY_THRESHOLD - 0.1
+    path = _write(str(tmp_path / "results.jsonl"),
+                  [_segment("משהו", text_english="something", toxicity_score=score)])
+    assert reanalyze_results(path, is_segment_problematic, analysis_fingerprints(TOXICITY_THRESHOLD)) is None
+
+    threshold = TOXICITY_THRESHOLD - 0.2
+    stats = reanalyze_results(path, lambda a, t: is_segment_problematic(a, t, toxicity_threshold=threshold),
+                              analysis_fingerprints(threshold), toxicity_threshold=threshold)
+    assert stats["changed_parts"] == ["decision"]
+    assert stats["newly_problematic"] == 1
+    assert next(iter_segments(path))["problematic"]
+    assert read_results_header(path)["settings"]["toxicity_threshold"] == threshold
+
+
+def test_changed_tone_thresholds_reflag_stored_stats(tmp_path):
+    stale = dict(analysis_fingerprints(TOXICITY_THRESHOLD), tone_thresholds="old")
+    loud = _tone(amplitude=LOUD_AMPLITUDE_THRESHOLD * 2, flags={"loud": False, "high_pitch": False})
+    deviating = {"tone_deviation": {"rms_z": None, "pitch_z": 10.0},
+                 "tone_flags": {"loud": False, "high_pitch": False}}
+    quiet = _tone(pitch=HIGH_PITCH_THRESHOLD_HZ / 2, flags={"loud": True, "high_pitch": False})
+    path = _write(str(tmp_path / "results.jsonl"),
+                  [_segment("א", tone=loud), _segment("ב", tone=deviating), _segment("ג", problematic=True, tone=quiet)],
+                  fingerprints=stale)
+
+    stats = reanalyze_results(path, is_segment_problematic, analysis_fingerprints(TOXICITY_THRESHOLD))
+    assert stats["changed_parts"] == ["tone_thresholds"]
+    assert stats["newly_problematic"] == 2 and stats["no_longer_problematic"] == 1
+    flags = [s["tone_analysis"]["tone_flags"] for s in iter_segments(path)]
+    assert flags == [{"loud": True, "high_pitch": False}, {"loud": False, "high_pitch": True},
+                     {"loud": False, "high_pitch": False}]
+
+
+def test_lost_early_decision_defers_skipped_models(tmp_path):
+    # Flagged by a Hebrew keyword under --cascade skip, so translation never ran
+    cascade = {"decided_by": "hebrew_keywords", "skipped": ["hebrew_sentiment", "translation", "english_toxic"],
+               "deferred": []}
+    stale = dict(analysis_fingerprints(TOXICITY_THRESHOLD), hebrew_keywords="old")
+    path = _write(str(tmp_path / "results.jsonl"),
+                  [_segment("מילה שנמחקה", problematic=True, found_keywords=["מילה שנמחקה"], cascade=cascade)],
+                  fingerprints=stale)
+
+    stats = reanalyze_results(path, is_segment_problematic, analysis_fingerprints(TOXICITY_THRESHOLD))
+    assert stats["no_longer_problematic"] == 1 and stats["pending"] == 1
+    segment = next(iter_segments(path))
+    assert segment["text_analysis"]["cascade"] == {
+        "decided_by": None, "skipped": ["hebrew_sentiment"], "deferred": ["translation", "english_toxic"]
+    }
+    assert read_results_header(path)["reanalysis_pending"] == 1
+    assert list(iter_results(path))[-1]["num_deferred"] == 1
+    # Still pending until the deferred models have run, even with unchanged fingerprints
+    assert reanalyze_results(path, is_segment_problematic, analysis_fingerprints(TOXICITY_THRESHOLD))["pending"] == 1
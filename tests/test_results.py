@@ -0,0 +1,128 @@
+import json
+
+from scripts.results import (
+    RESULTS_FORMAT_VERSION, ResultsWriter, export_legacy_json, iter_results, iter_segments, read_results_header,
+    results_fingerprint
+)
+
+SEGMENTS = [
+    {"start": 0.0, "end": 1.5, "text": "שלום"},
+    {"start": 1.5, "end": 3.0, "text": "די כבר"},
+    {"start": 3.0, "end": 4.2, "text": "בוא הנה"},
+]
+
+
+def _segment(i, problematic=False):
+    return {"start": SEGMENTS[i]["start"], "end": SEGMENTS[i]["end"], "text": SEGMENTS[i]["text"],
+            "problematic": problematic}
+
+
+def _header(settings=None):
+    return {"input": "rec.wav", "fingerprint": results_fingerprint(SEGMENTS, settings or {"threshold": 0.5})}
+
+
+def _write_partial(path, num_segments):
+    writer = ResultsWriter(path, _header())
+    for i in range(num_segments):
+        writer.write_segment(_segment(i, problematic=(i == 1)))
+    writer._file.close()
+
+
+def test_fingerprint_depends_on_segments_and_settings():
+    assert results_fingerprint(SEGMENTS, {"a": 1}) == results_fingerprint(list(SEGMENTS), {"a": 1})
+    assert results_fingerprint(SEGMENTS, {"a": 1}) != results_fingerprint(SEGMENTS, {"a": 2})
+    assert results_fingerprint(SEGMENTS, {"a": 1}) != results_fingerprint(SEGMENTS[:2], {"a": 1})
+
+
+def test_complete_file(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    writer = ResultsWriter(path, _header())
+    for i in range(3):
+        writer.write_segment(_segment(i, problematic=(i == 1)))
+    writer.close({"duration": 4.2})
+
+    records = list(iter_results(path))
+    assert [r["type"] for r in records] == ["header", "segment", "segment", "segment", "footer"]
+    assert records[0]["version"] == RESULTS_FORMAT_VERSION
+    assert [r["index"] for r in records[1:4]] == [0, 1, 2]
+    assert records[-1] == {"type": "footer", "num_segments": 3, "num_problematic": 1, "duration": 4.2}
+    assert read_results_header(path)["input"] == "rec.wav"
+    assert list(iter_segments(path)) == [_segment(i, problematic=(i == 1)) for i in range(3)]
+
+
+def test_resume_continues_partial_file(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    _write_partial(path, 2)
+
+    writer = ResultsWriter(path, _header(), resume=True)
+    assert writer.num_written == 2
+    assert writer.num_problematic == 1
+    assert writer.first_problematic["index"] == 1
+    writer.write_segment(_segment(2))
+    writer.close()
+
+    records = list(iter_results(path))
+    assert [r["type"] for r in records].count("header") == 1
+    assert [r["index"] for r in records if r["type"] == "segment"] == [0, 1, 2]
+    assert records[-1]["num_segments"] == 3 and records[-1]["num_problematic"] == 1
+
+
+def test_resume_drops_half_written_line(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    _write_partial(path, 2)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(dict({"type": "segment", "index": 2}, **_segment(2)))[:20])
+
+    writer = ResultsWriter(path, _header(), resume=True)
+    assert writer.num_written == 2
+    writer.write_segment(_segment(2))
+    writer.close()
+    assert [s["text"] for s in iter_segments(path)] == [seg["text"] for seg in SEGMENTS]
+
+
+def test_resume_restarts_on_other_fingerprint(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    _write_partial(path, 2)
+
+    writer = ResultsWriter(path, _header({"threshold": 0.7}), resume=True)
+    assert writer.num_written == 0
+    writer.close()
+    assert list(iter_segments(path)) == []
+
+
+def test_resume_restarts_complete_file(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    writer = ResultsWriter(path, _header())
+    writer.write_segment(_segment(0))
+    writer.close()
+
+    writer = ResultsWriter(path, _header(), resume=True)
+    assert writer.num_written == 0
+    writer.close()
+    assert [r["type"] for r in iter_results(path)] == ["header", "footer"]
+
+
+def test_without_resume_overwrites(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    _write_partial(path, 2)
+    writer = ResultsWriter(path, _header())
+    assert writer.num_written == 0
+    writer.close()
+    assert list(iter_segments(path)) == []
+
+
+def test_export_legacy_json(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    writer = ResultsWriter(path, _header())
+    for i in range(2):
+        writer.write_segment(_segment(i))
+    writer.close()
+
+    json_path = export_legacy_json(path, str(tmp_path / "results.json"))
+    with open(json_path, encoding="utf-8") as f:
+        assert json.load(f) == [_segment(0), _segment(1)]
+
+    empty_path = str(tmp_path / "empty.jsonl")
+    ResultsWriter(empty_path, _header()).close()
+    with open(export_legacy_json(empty_path, str(tmp_path / "empty.json")), encoding="utf-8") as f:
+        assert json.load(f) == []
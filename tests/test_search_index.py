@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from scripts.results import ResultsWriter
+from scripts.search_index import SearchIndex, recording_room, recording_room_and_date
+
+
+@pytest.mark.parametrize("path, room, date", [
+    ("/data/room3/2024-05-14_0800.wav", "3", "2024-05-14"),
+    ("/data/class_b/20240514.mp3", "b", "2024-05-14"),
+    ("/data/classroom_3/2024-05-14_0800.wav", "3", "2024-05-14"),
+    ("/data/classrooms/room3/2024-05-14.wav", "3", "2024-05-14"),
+    ("/mnt/backroom_nas/room2/2024-05-14.wav", "2", "2024-05-14"),
+    ("/data/room1/room3_2024-05-14.wav", "3", "2024-05-14"),
+    ("/data/Room 4/2024-05-14.wav", "4", "2024-05-14"),
+    ("/data/חדר_א/2024-05-14.wav", "א", "2024-05-14"),
+    ("/recordings/room2/2024/05/14/rec.wav", "2", "2024-05-14"),
+])
+def test_room_and_date_from_path(path, room, date):
+    assert recording_room_and_date(path) == (room, date)
+
+
+def test_date_directories_are_no_room():
+    # Neither the day directory nor a date-named directory is a room
+    assert recording_room_and_date("/recordings/2024/05/14/rec.wav") == (None, "2024-05-14")
+    assert recording_room_and_date("/recordings/2024-05-14/rec.wav") == (None, "2024-05-14")
+
+
+def test_index_room_falls_back_to_directory_name():
+    assert recording_room_and_date("/data/Kitchen/rec.wav")[0] == "kitchen"
+    assert recording_room_and_date("/data/ROOM3/rec.wav")[0] == "3"
+
+
+@pytest.mark.parametrize("path", ["/data/recordings/x.wav", "/tmp/rec.wav", "/home/u/Downloads/rec.wav",
+                                  "/recordings/2024/05/14/rec.wav"])
+def test_strict_room_never_guesses_from_directory(path):
+    assert recording_room(path) is None
+
+
+def test_strict_room_matches_room_names():
+    assert recording_room("/data/Room 4/2024-05-14.wav") == "4"
+    assert recording_room("/data/CLASS_B/rec.wav") == "b"
+
+
+def test_date_falls_back_to_mtime():
+    room, date = recording_room_and_date("/data/room3/rec.wav", fallback_mtime=1715673600.0)
+    assert room == "3"
+    assert date is not None and date.startswith("2024-05-1")
+
+
+def test_invalid_date_is_ignored():
+    assert recording_room_and_date("/data/room3/2024-13-45.wav")[1] is None
+
+
+def _write_results(output_dir, input_path, texts, problematic):
+    os.makedirs(output_dir, exist_ok=True)
+    writer = ResultsWriter(os.path.join(output_dir, "results.jsonl"), header={"input": input_path})
+    for i, (text, flag) in enumerate(zip(texts, problematic)):
+        writer.write_segment({
+            "start": float(i), "end": i + 1.0, "text": text,
+            "text_analysis": {"hebrew_analysis": {"text_hebrew": text, "found_keywords": []}},
+            "tone_analysis": {"average_amplitude": 0.01, "average_pitch_hz": 100.0,
+                              "tone_flags": {"loud": False, "high_pitch": False}},
+            "problematic": flag,
+        })
+    writer.close()
+    return writer.path
+
+
+def test_index_and_search(tmp_path):
+    output_root = str(tmp_path / "results")
+    _write_results(os.path.join(output_root, "a"), "/data/room3/2024-05-14.wav", ["שלום ילדים", "תסתום"], [False, True])
+    _write_results(os.path.join(output_root, "b"), "/data/room4/2024-05-15.wav", ["תסתום עכשיו"], [True])
+    index = SearchIndex(str(tmp_path / "index.sqlite"))
+    try:
+        stats = index.index_directory(output_root)
+        assert stats["indexed"] == 2 and stats["segments"] == 3
+        assert index.index_directory(output_root)["indexed"] == 0  # unchanged files are skipped
+
+        assert len(index.search("תסתום")) == 2
+        found = index.search("תסתום", room="3")
+        assert [(r["room"], r["recorded_date"], r["text"]) for r in found] == [("3", "2024-05-14", "תסתום")]
+        assert len(index.search(problematic=False)) == 1
+        assert len(index.search(date_from="2024-05-15")) == 1
+    finally:
+        index.close()
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+import scripts.task_queue as task_queue
+from scripts.scheduler import STAGE_TASKS, enqueue_recording, recording_task_ids, run_worker
+from scripts.task_queue import QueueBackend, SQLiteTaskQueue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_queue, "RETRY_BACKOFF_SECONDS", 0.0)
+    queue = SQLiteTaskQueue(str(tmp_path / "tasks.sqlite"))
+    yield queue
+    queue.close()
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        QueueBackend()
+
+
+def test_enqueue_is_idempotent(queue):
+    assert queue.enqueue("a", "preprocess", {"n": 1})
+    assert not queue.enqueue("a", "preprocess", {"n": 2})
+    assert queue.counts()["pending"] == 1
+    assert queue.tasks()[0].payload == {"n": 1}
+
+
+def test_dependencies_gate_leasing(queue):
+    queue.enqueue("b", "transcribe", {}, depends_on=["a"], priority=10.0)
+    queue.enqueue("a", "preprocess", {})
+    first = queue.lease("w")
+    assert first.task_id == "a"
+    assert queue.lease("w") is None
+    queue.complete(first)
+    assert queue.lease("w").task_id == "b"
+
+
+def test_lease_filters_by_kind(queue):
+    queue.enqueue("a", "preprocess", {})
+    assert queue.lease("w", kinds=["transcribe"]) is None
+    assert queue.lease("w", kinds=["transcribe", "preprocess"]).task_id == "a"
+
+
+def test_expired_lease_is_reclaimed(queue):
+    queue.enqueue("a", "preprocess", {})
+    lost = queue.lease("crashed", lease_seconds=0.05)
+    assert queue.lease("w") is None
+    time.sleep(0.1)
+    task = queue.lease("w")
+    assert task.task_id == "a" and task.attempts == 2
+    assert task.lease_token != lost.lease_token
+    # The crashed worker's lease is gone: its heartbeats and failures change nothing
+    assert not queue.heartbeat(lost)
+    assert queue.fail(lost, "late") == "leased"
+    assert queue.heartbeat(task)
+
+
+def test_expired_last_attempt_fails_dependents(queue):
+    queue.enqueue("a", "preprocess", {}, max_attempts=1)
+    queue.enqueue("b", "transcribe", {}, depends_on=["a"])
+    queue.enqueue("c", "text", {}, depends_on=["b"])
+    queue.lease("crashed", lease_seconds=0.05)
+    time.sleep(0.1)
+    assert queue.lease("w") is None
+    assert queue.counts()["failed"] == 3
+    errors = {task.task_id: task.error for task in queue.tasks("failed")}
+    assert "expired" in errors["a"]
+    assert errors["c"] == "dependency 'b' failed"
+
+
+def test_fail_retries_with_backoff(queue, monkeypatch):
+    monkeypatch.setattr(task_queue, "RETRY_BACKOFF_SECONDS", 0.1)
+    queue.enqueue("a", "preprocess", {}, max_attempts=2)
+    assert queue.fail(queue.lease("w"), "boom") == "pending"
+    # Not available again before the backoff has passed
+    assert queue.lease("w") is None
+    time.sleep(0.15)
+    task = queue.lease("w")
+    assert task.attempts == 2
+    assert queue.fail(task, "boom") == "failed"
+
+
+def test_completion_is_idempotent(queue):
+    queue.enqueue("a", "preprocess", {})
+    task = queue.lease("w")
+    assert queue.complete(task, {"n": 1})
+    assert not queue.complete(task, {"n": 2})
+    assert queue.tasks("done")[0].result == {"n": 1}
+
+
+def test_retry_failed_resets_attempts(queue):
+    queue.enqueue("a", "preprocess", {}, max_attempts=1)
+    queue.enqueue("b", "transcribe", {}, depends_on=["a"])
+    assert queue.fail(queue.lease("w"), "boom") == "failed"
+    assert queue.retry_failed() == 2
+    task = queue.lease("w")
+    assert task.task_id == "a" and task.attempts == 1
+
+
+def test_worker_runs_recording_stages_in_order(queue):
+    payload = {"input": "/data/room1/rec.wav", "output_root": "/out", "options": {}}
+    assert enqueue_recording(queue, payload) == len(STAGE_TASKS)
+    assert enqueue_recording(queue, payload) == 0
+
+    ran = []
+    stats = run_worker(queue, lambda task: ran.append(task.kind), worker_id="w",
+                       poll_seconds=0.01, exit_when_idle=True)
+    assert stats == {"done": len(STAGE_TASKS), "retried": 0, "failed": 0}
+    assert ran.index("preprocess") < ran.index("transcribe") < ran.index("text") < ran.index("report")
+    assert ran.index("tone") < ran.index("text")
+    assert set(recording_task_ids(payload).values()) == {task.task_id for task in queue.tasks("done")}
+
+
+def test_worker_failure_fails_later_stages(queue):
+    enqueue_recording(queue, {"input": "rec.wav", "output_root": "/out", "options": {}}, max_attempts=2)
+
+    def handler(task):
+        if task.kind == "transcribe":
+            raise RuntimeError("no GPU")
+
+    stats = run_worker(queue, handler, worker_id="w", poll_seconds=0.01, exit_when_idle=True)
+    assert stats == {"done": 2, "retried": 1, "failed": 1}
+    assert {task.kind for task in queue.tasks("failed")} == {"transcribe", "text", "report"}
@@ -0,0 +1,89 @@
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from scripts.tone_baseline import (  # noqa: E402
+    MIN_BASELINE_FRAMES, SKETCH_RELATIVE_ACCURACY, QuantileSketch, ToneBaseline, ToneBaselineStore,
+    resolve_tone_baseline
+)
+
+
+def _features(rms, f0):
+    f0 = np.asarray(f0, dtype=np.float64)
+    return types.SimpleNamespace(rms=np.asarray(rms, dtype=np.float64), f0=f0, voiced=np.isfinite(f0))
+
+
+@pytest.mark.parametrize("q", [0.05, 0.25, 0.5, 0.75, 0.95])
+def test_sketch_quantiles_within_relative_accuracy(q):
+    values = np.random.default_rng(0).lognormal(mean=-3.0, sigma=1.5, size=100_000)
+    sketch = QuantileSketch()
+    sketch.add(values)
+    exact = np.quantile(values, q)
+    assert abs(sketch.quantile(q) - exact) / exact <= 2 * SKETCH_RELATIVE_ACCURACY
+
+
+def test_sketch_ignores_non_positive_and_nan():
+    sketch = QuantileSketch()
+    sketch.add(np.array([0.0, -1.0, np.nan, np.inf, 2.0]))
+    assert sketch.count == 1
+    assert sketch.quantile(0.5) == pytest.approx(2.0, rel=SKETCH_RELATIVE_ACCURACY)
+    assert QuantileSketch().quantile(0.5) == 0.0
+
+
+def test_sketch_merge_equals_sketch_of_union():
+    rng = np.random.default_rng(1)
+    a, b = rng.uniform(100, 300, 5000), rng.uniform(200, 600, 3000)
+    merged = QuantileSketch()
+    merged.add(a)
+    other = QuantileSketch()
+    other.add(b)
+    merged.merge(other)
+    union = QuantileSketch()
+    union.add(np.concatenate([a, b]))
+    assert merged.count == union.count
+    for q in (0.1, 0.5, 0.9):
+        assert merged.quantile(q) == union.quantile(q)
+
+
+def test_sketch_round_trip_and_scale():
+    sketch = QuantileSketch()
+    sketch.add(np.arange(1, 1001, dtype=np.float64))
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+    restored.scale(0.5)
+    assert restored.count == pytest.approx(500.0)
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+
+
+def test_baseline_flags_deviations():
+    rng = np.random.default_rng(2)
+    n = 4 * MIN_BASELINE_FRAMES
+    baseline = ToneBaseline.from_features(_features(rng.lognormal(-3.0, 0.3, n), rng.lognormal(5.4, 0.1, n)))
+    assert baseline.is_ready
+    usual = baseline.deviations(np.exp(-3.0), np.exp(5.4))
+    assert baseline.flags(usual) == {"loud": False, "high_pitch": False}
+    loud = baseline.deviations(np.exp(-3.0 + 2.0), np.exp(5.4))
+    assert baseline.flags(loud) == {"loud": True, "high_pitch": False}
+
+
+def test_too_little_audio_gives_no_baseline():
+    features = _features(np.full(10, 0.05), np.full(10, 200.0))
+    assert resolve_tone_baseline(features, "recording") is None
+    assert resolve_tone_baseline(features, "fixed") is None
+
+
+def test_room_store_counts_each_recording_once(tmp_path):
+    store = ToneBaselineStore(str(tmp_path / "baselines.sqlite"))
+    try:
+        baseline = ToneBaseline.from_features(_features(np.full(100, 0.05), np.full(100, 200.0)))
+        first = store.add_recording("3", baseline, "/data/room3/a.wav", decay=0.5)
+        assert first.rms.count == 100
+        again = store.add_recording("3", baseline, "/data/room3/a.wav", decay=0.5)
+        assert again.rms.count == 100
+        second = store.add_recording("3", baseline, "/data/room3/b.wav", decay=0.5)
+        assert second.rms.count == pytest.approx(150.0)
+        assert store.get("4") is None
+    finally:
+        store.close()
@@ -0,0 +1,32 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("librosa")
+
+from scripts.analyze_tone import TONE_HOP_LENGTH, compute_tone_features_from_array  # noqa: E402
+
+SR = 16000
+
+
+@pytest.mark.parametrize("num_samples", [1, 511, 512, 513, 5375, 5377])
+def test_full_range_amplitude_is_mean_magnitude(num_samples):
+    y = np.random.default_rng(0).uniform(-0.5, 0.5, num_samples).astype(np.float32)
+    features = compute_tone_features_from_array(y, SR, pitch_backend="yin")
+    assert features.stats()["average_amplitude"] == pytest.approx(float(np.abs(y).mean()), rel=1e-5)
+    assert features.frame_sample_counts(features.frame_slice()).sum() == num_samples
+
+
+def test_amplitude_and_rms_frames_line_up():
+    # A short burst centred on frame 20 peaks in the same frame for both features
+    y = np.zeros(SR, dtype=np.float32)
+    center = 20 * TONE_HOP_LENGTH
+    y[center - 128:center + 128] = 0.8
+    features = compute_tone_features_from_array(y, SR, pitch_backend="yin")
+    assert int(np.argmax(features.amplitude)) == 20
+    assert int(np.argmax(features.rms)) == 20
+
+    t = center / SR
+    frames = features.frame_slice(t - 0.001, t + 0.001)
+    assert frames.start <= 20 < frames.stop
+    # Half of frame 20's hop is the burst
+    assert features.stats(t - 0.001, t + 0.001)["average_amplitude"] == pytest.approx(0.4)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Runs the stage tasks that `main.py --queue` added to a task queue. Start one or more
+workers per machine; every machine must see the output and cache directories under
+the same paths.
+
+Usage:
+    python main.py --input-dir /recordings/2024-05-01 --output /shared/results --queue /shared/tasks.sqlite
+    python worker.py --queue /shared/tasks.sqlite                         # any stage
+    python worker.py --queue /shared/tasks.sqlite --stages transcribe     # e.g. on the GPU machine
+    python worker.py --queue /shared/tasks.sqlite --status
+"""
+import argparse
+
+from main import run_stage_task
+from scripts.scheduler import (
+    DEFAULT_POLL_SECONDS, STAGE_TASKS_BY_NAME, default_worker_id, format_queue_counts, run_worker
+)
+from scripts.task_queue import DEFAULT_LEASE_SECONDS, SQLiteTaskQueue
+
+
+def print_status(queue: SQLiteTaskQueue):
+    print(f"Tasks: {format_queue_counts(queue.counts())}")
+    for task in queue.tasks("failed"):
+        print(f"  failed: {task.task_id} after {task.attempts} attempts: {task.error}")
+    for task in queue.tasks("leased"):
+        print(f"  running: {task.task_id} (attempt {task.attempts}/{task.max_attempts})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued stage tasks of daycare recordings.")
+    parser.add_argument("--queue", required=True, help="Task queue file written by main.py --queue.")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGE_TASKS_BY_NAME), default=None,
+                        help="Only run these stages (default: all).")
+    parser.add_argument("--worker_id", default=None, help="Name recorded with each lease. Default: host:pid.")
+    parser.add_argument("--lease_seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="A task whose worker sent no heartbeat for this long goes back to the queue. "
+                             f"Default={DEFAULT_LEASE_SECONDS:.0f}.")
+    parser.add_argument("--poll_seconds", type=float, default=DEFAULT_POLL_SECONDS,
+                        help="Wait between polls of an empty queue.")
+    parser.add_argument("--exit_when_idle", action="store_true",
+                        help="Exit once no task is pending or running, instead of waiting for new ones.")
+    parser.add_argument("--max_tasks", type=int, default=None, help="Exit after this many tasks.")
+    parser.add_argument("--status", action="store_true", help="Print the task counts and failures, then exit.")
+    parser.add_argument("--retry_failed", action="store_true",
+                        help="Return the failed tasks (and those that failed with them) to the queue, then exit.")
+    args = parser.parse_args()
+
+    queue = SQLiteTaskQueue(args.queue)
+    try:
+        if args.retry_failed:
+            print(f"Returned {queue.retry_failed()} failed tasks to the queue.")
+        if args.status or args.retry_failed:
+            print_status(queue)
+            return
+        worker_id = args.worker_id or default_worker_id()
+        stats = run_worker(
+            queue, run_stage_task, worker_id=worker_id, kinds=args.stages, lease_seconds=args.lease_seconds,
+            poll_seconds=args.poll_seconds, exit_when_idle=args.exit_when_idle, max_tasks=args.max_tasks
+        )
+        print(f"Worker {worker_id}: {stats['done']} tasks done, {stats['retried']} failed and queued for a retry, "
+              f"{stats['failed']} failed for good.")
+        print_status(queue)
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()